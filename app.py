@@ -1,36 +1,105 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory, abort, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, send_from_directory, abort, flash, jsonify, stream_with_context
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from flask_wtf.csrf import CSRFProtect
+from flask_migrate import Migrate, upgrade
+from sqlalchemy import update
 from functools import wraps
+import click
 from urllib.parse import quote
-import ffmpeg
 
 from werkzeug.utils import secure_filename
-from models import db, User, Video, VideoView, Folder  # Ajoutez Folder ici
+from werkzeug.security import safe_join
+from models import db, User, Video, VideoView, Folder, TranscodeJob, UploadSession, folder_summaries, folder_cards, video_cards  # Ajoutez Folder ici
 from datetime import datetime
-from utils import process_video
-from transcoder import process_video_with_transcode
+from utils import send_discord_log, probe_media, format_time, discord_notifier
+from tasks import init_celery, enqueue_transcode, get_transcode_watcher, resume_cloud_jobs, job_eta, queue_backlog, queue_depth, purge_file_deletions
+from backends import resolve_backend_name, plan_local_pool
+from media import send_media, DELIVERY_MODES
+from thumbnails import ThumbnailService
+from view_counter import make_view_buffer
+from pagination import keyset_page, page_size, InvalidCursor
+from chunked_upload import ChunkError, partial_path, current_offset, parse_checksum, append_chunk, discard
+from blob_store import save_stream, hash_file, ingest_blob, release_blob
+from database import init_database
+from reconciler import reconcile, schedule_deletion
+from storage_layout import absolute, thumbnail_path, video_dir, legacy_hls_path, folder_thumbnail_path, is_sharded, VIDEOS_DIR
+from storage_migration import migrate_storage
+from search import search_videos, search_folders, install_search_index, include_object
+from cache import make_cache, listing_tag, FOLDERS_TAG
+from progress import make_progress_store, progress_token, format_event, TERMINAL_STATES
+from progress_stream import ProgressStreamServer
+from metrics import init_metrics, register_collector, QueueDepthCollector, NotifierCollector, metrics_response, timed_stage, record_upload
+from markupsafe import Markup
 import os
+import shutil
+import uuid
 import sys
 import traceback
 import hashlib
 import re
 import time
-import requests
-from google.cloud import storage
-from google.cloud.video import transcoder
-from typing import Dict, Optional
-from google.protobuf import duration_pb2
 
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'votre_clé_secrète_ici'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///youtube_clone.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///youtube_clone.db')
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))  # PostgreSQL : connexions par processus
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # secondes
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # secondes
+app.config['SQLITE_WAL'] = os.environ.get('SQLITE_WAL', '1') == '1'
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # millisecondes
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 1 * 1024 * 1024 * 1024  # 1 Go
+app.config['MAX_UPLOAD_SIZE'] = 1 * 1024 * 1024 * 1024  # 1 Go, taille totale d'un upload par morceaux
+app.config['UPLOAD_CHUNK_SIZE'] = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
 app.config['WTF_CSRF_ENABLED'] = True
 app.config['GOOGLE_CLOUD_PROJECT'] = 'dogwood-actor-450221-j9'
 app.config['GOOGLE_CLOUD_BUCKET'] = 'zedfr69'  # Nom correct du bucket
+app.config['TRANSCODE_BACKEND'] = os.environ.get('TRANSCODE_BACKEND', 'auto')  # 'auto', 'cloud' ou 'local'
+app.config['LOCAL_TRANSCODE_CONCURRENCY'] = int(os.environ['LOCAL_TRANSCODE_CONCURRENCY']) if os.environ.get('LOCAL_TRANSCODE_CONCURRENCY') else None
+app.config['LOCAL_TRANSCODE_THREADS'] = int(os.environ['LOCAL_TRANSCODE_THREADS']) if os.environ.get('LOCAL_TRANSCODE_THREADS') else None
+app.config['TRANSCODE_POLL_INITIAL_DELAY'] = float(os.environ.get('TRANSCODE_POLL_INITIAL_DELAY', 5))  # secondes
+app.config['TRANSCODE_POLL_MAX_DELAY'] = float(os.environ.get('TRANSCODE_POLL_MAX_DELAY', 60))
+app.config['TRANSCODE_WATCHER_RESCAN'] = float(os.environ.get('TRANSCODE_WATCHER_RESCAN', 15))  # secondes entre deux recherches de nouveaux jobs cloud
+app.config['TRANSCODE_QUEUE'] = os.environ.get('TRANSCODE_QUEUE', 'transcode')  # file Celery des encodages (voir `flask transcode-worker`)
+app.config['TRANSCODE_WORKERS'] = int(os.environ['TRANSCODE_WORKERS']) if os.environ.get('TRANSCODE_WORKERS') else \
+    plan_local_pool(app.config['LOCAL_TRANSCODE_CONCURRENCY'], app.config['LOCAL_TRANSCODE_THREADS'])[0]  # workers de la file, pour l'ETA
+app.config['TRANSCODE_MAX_BACKLOG'] = int(os.environ.get('TRANSCODE_MAX_BACKLOG', 0))  # secondes de file locale au-delà desquelles les conversions sont refusées (0 = sans limite)
+app.config['SEGMENTED_TRANSCODE_MIN_DURATION'] = int(os.environ.get('SEGMENTED_TRANSCODE_MIN_DURATION', 600))  # secondes
+app.config['SEGMENTED_TRANSCODE_MIN_SIZE'] = int(os.environ.get('SEGMENTED_TRANSCODE_MIN_SIZE', 512 * 1024 * 1024))
+app.config['HLS_ENABLED'] = os.environ.get('HLS_ENABLED', '1') == '1'
+app.config['HLS_SEGMENT_DURATION'] = int(os.environ.get('HLS_SEGMENT_DURATION', 6))
+app.config['THUMBNAIL_WORKERS'] = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+app.config['THUMBNAIL_FAILURE_TTL'] = int(os.environ.get('THUMBNAIL_FAILURE_TTL', 3600))  # secondes
+app.config['THUMBNAIL_MAX_FAILURES'] = int(os.environ.get('THUMBNAIL_MAX_FAILURES', 10000))  # échecs retenus au plus
+app.config['REDIS_URL'] = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+app.config['VIEW_BUFFER_BACKEND'] = os.environ.get('VIEW_BUFFER_BACKEND', 'memory')  # 'memory' ou 'redis' (plusieurs processus)
+app.config['VIEW_FLUSH_INTERVAL'] = float(os.environ.get('VIEW_FLUSH_INTERVAL', 5))  # secondes
+app.config['VIEW_FLUSH_MAX_PENDING'] = int(os.environ.get('VIEW_FLUSH_MAX_PENDING', 1000))
+app.config['VIEW_BUFFER_MAX'] = int(os.environ.get('VIEW_BUFFER_MAX', 100000))  # vues en attente au plus (base indisponible)
+app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memory')  # 'memory', 'redis' (partagé entre processus) ou 'none'
+app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 30))  # secondes
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+app.config['CACHE_MAX_BYTES'] = int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+app.config['PROGRESS_BACKEND'] = os.environ.get('PROGRESS_BACKEND', 'memory')  # 'memory' ou 'redis' (workers Celery, serveur progress-stream)
+app.config['PROGRESS_STREAM_URL'] = os.environ.get('PROGRESS_STREAM_URL', '')  # URL publique de `flask progress-stream` (vide = route /jobs/<id>/events)
+app.config['PROGRESS_HEARTBEAT'] = int(os.environ.get('PROGRESS_HEARTBEAT', 15))  # secondes entre deux commentaires SSE de maintien
+app.config['RECONCILE_INTERVAL'] = int(os.environ.get('RECONCILE_INTERVAL', 6 * 3600))  # secondes entre deux passages (celery beat, 0 = désactivé)
+app.config['RECONCILE_GRACE_PERIOD'] = int(os.environ.get('RECONCILE_GRACE_PERIOD', 3600))  # âge minimal d'un fichier orphelin
+app.config['RECONCILE_BATCH_SIZE'] = int(os.environ.get('RECONCILE_BATCH_SIZE', 500))
+app.config['RECONCILE_DELETE_ORPHANS'] = os.environ.get('RECONCILE_DELETE_ORPHANS') == '1'  # sinon le passage périodique signale seulement
+app.config['MEDIA_DELIVERY'] = os.environ.get('MEDIA_DELIVERY', 'direct')  # 'direct', 'x-accel' (nginx) ou 'x-sendfile' (Apache, lighttpd)
+app.config['MEDIA_ACCEL_PREFIX'] = os.environ.get('MEDIA_ACCEL_PREFIX', '/_media/')  # location nginx `internal` qui pointe sur UPLOAD_FOLDER
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # si défini, /metrics exige Authorization: Bearer <token>
+app.config['CELERY_BROKER_URL'] = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+app.config['CELERY_RESULT_BACKEND'] = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
+app.config['CELERY_TASK_ALWAYS_EAGER'] = os.environ.get('CELERY_TASK_ALWAYS_EAGER') == '1'
+
+if app.config['MEDIA_DELIVERY'] not in DELIVERY_MODES:
+    raise ValueError(f"Mode de livraison des médias inconnu: {app.config['MEDIA_DELIVERY']}")
 
 # Ensure uploads directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -43,8 +112,19 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-db.init_app(app)
+init_database(app, db)
+migrate = Migrate(app, db, render_as_batch=True,  # render_as_batch : ALTER TABLE compatibles SQLite
+                  include_object=include_object)  # index plein texte (search.py) hors autogenerate
 csrf = CSRFProtect(app)
+celery = init_celery(app)
+view_buffer = make_view_buffer(app)
+cache = make_cache(app)
+progress_store = make_progress_store(app)
+init_metrics(app)
+register_collector(QueueDepthCollector(queue_depth))
+register_collector(NotifierCollector(discord_notifier))
+thumbnail_service = ThumbnailService(app.config['THUMBNAIL_WORKERS'], app.config['THUMBNAIL_FAILURE_TTL'],
+                                     app.config['THUMBNAIL_MAX_FAILURES'])
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -56,16 +136,111 @@ def load_user(user_id):
 
 @app.route('/')
 def home():
+    if not current_user.is_authenticated and not request.args:
+        # Même page pour tous les visiteurs anonymes : le fragment rendu est mis en cache
+        # (les dossiers ne sont affichés qu'aux utilisateurs connectés)
+        listing = cache.get_or_set('fragment:home:anonymous', render_anonymous_listing, tags=[listing_tag(None)])
+        return render_template('home.html', listing=Markup(listing))
+    
     if current_user.is_authenticated:
-        folders = Folder.query.filter(
-            (Folder.user_id == current_user.id) | 
-            (Folder.is_public == True)
-        ).order_by(Folder.name).all()
+        folders = cache.get_or_set(
+            f"folders:user:{current_user.id}",
+            lambda: folder_cards(folder_summaries(Folder.query.filter(
+                (Folder.user_id == current_user.id) | 
+                (Folder.is_public == True)
+            ).order_by(Folder.name))),
+            tags=[FOLDERS_TAG]
+        )
     else:
-        folders = Folder.query.filter_by(is_public=True).order_by(Folder.name).all()
+        folders = []
     
-    videos = Video.query.filter_by(folder_id=None).order_by(Video.upload_date.desc()).all()
-    return render_template('home.html', folders=folders, videos=videos)
+    videos, next_cursor = cached_video_page(None)
+    return render_template('home.html', folders=folders, videos=videos, next_cursor=next_cursor)
+
+def render_anonymous_listing():
+    videos, next_cursor = cached_video_page(None)
+    return render_template('home_listing.html', folders=[], videos=videos, next_cursor=next_cursor)
+
+def paginate_videos(query):
+    """Page de vidéos selon ?cursor= et ?limit= (pagination par clé)"""
+    try:
+        return keyset_page(query, request.args.get('cursor'), page_size(request.args.get('limit')))
+    except InvalidCursor:
+        abort(400)
+
+def cached_video_page(folder_id):
+    """paginate_videos pour un dossier (ou la racine), résultat mis en cache jusqu'à invalidation"""
+    cursor = request.args.get('cursor') or ''
+    limit = page_size(request.args.get('limit'))
+    
+    def load():
+        videos, next_cursor = paginate_videos(Video.query.filter_by(folder_id=folder_id))
+        return video_cards(videos), next_cursor
+    
+    return cache.get_or_set(f"videos:{folder_id or 'root'}:{limit}:{cursor}", load, tags=[listing_tag(folder_id)])
+
+def invalidate_listings(*folder_ids):
+    """Invalide les listes de vidéos des dossiers touchés et les résumés de dossiers"""
+    cache.invalidate(FOLDERS_TAG, *{listing_tag(folder_id) for folder_id in folder_ids})
+
+def serialize_video(video):
+    """Représentation JSON d'une carte vidéo pour le défilement infini"""
+    return {
+        'id': video.id,
+        'title': video.title or '',
+        'url': url_for('video_page', video_id=video.id),
+        'thumbnail_url': url_for('serve_thumbnail', filename=video.filename),
+        'upload_date': video.upload_date.strftime('%d/%m/%Y'),
+        'views': video.views,
+        'delete_url': url_for('delete_video', video_id=video.id),
+        'can_delete': current_user.is_authenticated and (video.user_id == current_user.id or current_user.is_admin),
+    }
+
+@app.route('/api/videos')
+def api_videos():
+    folder_id = request.args.get('folder_id', type=int)
+    if folder_id is not None and not current_user.is_authenticated:
+        abort(401)
+    
+    videos, next_cursor = cached_video_page(folder_id)
+    return jsonify({
+        'videos': [serialize_video(video) for video in videos],
+        'next_cursor': next_cursor
+    })
+
+MAX_SEARCH_PAGES = 50
+
+def search_page():
+    """Résultats de ?q= pour la page ?cursor= (numéro de page, comme next_cursor de /api/videos)"""
+    query = request.args.get('q', '').strip()
+    try:
+        page = int(request.args.get('cursor') or 1)
+    except ValueError:
+        abort(400)
+    if not 1 <= page <= MAX_SEARCH_PAGES:
+        abort(400)
+    videos, next_page = search_videos(query, current_user, page, page_size(request.args.get('limit')))
+    if next_page is not None and next_page > MAX_SEARCH_PAGES:
+        next_page = None
+    return query, page, videos, str(next_page) if next_page else None
+
+@app.route('/search')
+def search():
+    query, page, videos, next_cursor = search_page()
+    # Les dossiers correspondants ne sont affichés qu'en tête de la première page
+    folders = search_folders(query, current_user) if page == 1 else []
+    return render_template('search.html', query=query, folders=folders, videos=videos, next_cursor=next_cursor)
+
+@app.route('/api/search')
+def api_search():
+    query, page, videos, next_cursor = search_page()
+    folders = search_folders(query, current_user) if page == 1 else []
+    return jsonify({
+        'videos': [serialize_video(video) for video in videos],
+        'folders': [{'id': folder.id, 'name': folder.name, 'is_public': folder.is_public,
+                     'url': url_for('folder_view', folder_id=folder.id)} for folder in folders],
+        'next_cursor': next_cursor
+    })
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -124,18 +299,11 @@ def create_folder():
     )
     db.session.add(new_folder)
     db.session.commit()
+    cache.invalidate(FOLDERS_TAG)
     
     flash(f'Dossier "{name}" créé avec succès', 'success')
     return redirect(url_for('home'))
 
-def send_discord_log(message: str):
-    """Envoie un log sur Discord via webhook."""
-    webhook_url = "https://canary.discord.com/api/webhooks/1355243140058976306/ixNTypUGOctGnWocxATNxM1SUzfet2pCYc3rATM8Aj-JgoJTEzl96ncoVdyczMwokYju"
-    try:
-        requests.post(webhook_url, json={"content": message})
-    except Exception as e:
-        print(f"Erreur lors de l'envoi du log Discord: {str(e)}")
-
 # Suppression de dossier
 @app.route('/delete_folder/<int:folder_id>', methods=['POST'])
 @login_required
@@ -149,29 +317,20 @@ def delete_folder(folder_id):
     try:
         # Suppression des vidéos associées
         for video in folder.videos:
-            # Suppression du fichier vidéo
-            video_path = os.path.join(app.config['UPLOAD_FOLDER'], video.filename)
-            if os.path.exists(video_path):
-                os.remove(video_path)
-            
-            # Suppression de la thumbnail
-            thumb_path = os.path.join(app.config['UPLOAD_FOLDER'], 
-                                    f"{os.path.splitext(video.filename)[0]}_thumb.jpg")
-            if os.path.exists(thumb_path):
-                os.remove(thumb_path)
+            # Suppression des fichiers (vidéo, miniature, HLS) s'ils ne sont plus partagés
+            delete_video_files(video)
             
             # Suppression de la vidéo de la base de données
             db.session.delete(video)
         
         # Suppression de la thumbnail du dossier si elle existe
-        if folder.custom_thumbnail:
-            thumb_path = os.path.join(app.config['UPLOAD_FOLDER'], folder.custom_thumbnail)
-            if os.path.exists(thumb_path):
-                os.remove(thumb_path)
+        schedule_deletion(folder.custom_thumbnail)
         
         # Suppression du dossier de la base de données
         db.session.delete(folder)
         db.session.commit()
+        invalidate_listings(folder_id)
+        purge_deleted_files()
         
         flash('Dossier et son contenu supprimés avec succès', 'success')
         send_discord_log(f"🗑️ Dossier supprimé : {folder.name} par {current_user.username}")
@@ -183,13 +342,41 @@ def delete_folder(folder_id):
     
     return redirect(url_for('home'))
 
+def delete_video_files(video):
+    """
+    Programme la suppression des fichiers d'une vidéo, effective après le
+    commit (voir reconciler.schedule_deletion). Pour une vidéo adossée à un
+    blob, seule la dernière référence efface réellement les fichiers.
+    """
+    if video.blob is not None and not release_blob(video.blob):
+        return
+    
+    paths = [video.filename]
+    # Version convertie si elle existe
+    if video.processed_path and video.processed_path != video.filename:
+        paths.append(video.processed_path)
+    paths.append(thumbnail_path(video.filename))
+    # Segments HLS (ancien emplacement à plat compris), puis dossier de la vidéo (voir storage_layout)
+    if video.hls_playlist:
+        paths.append(os.path.dirname(video.hls_playlist))
+    paths.append(legacy_hls_path(video.storage_key))
+    paths.append(video_dir(video.storage_key))
+    schedule_deletion(*paths)
+
+def purge_deleted_files():
+    """Efface en arrière-plan les fichiers programmés ; sinon, au prochain passage du réconciliateur."""
+    try:
+        purge_file_deletions.delay()
+    except Exception as e:
+        app.logger.error(f"Erreur lors de la mise en file des suppressions de fichiers: {str(e)}")
+
 # Vue d'un dossier spécifique
 @app.route('/folder/<int:folder_id>')
 @login_required
 def folder_view(folder_id):
     folder = Folder.query.get_or_404(folder_id)
-    videos = Video.query.filter_by(folder_id=folder.id).order_by(Video.upload_date.desc()).all()
-    return render_template('home.html', videos=videos, selected_folder=folder)
+    videos, next_cursor = cached_video_page(folder.id)
+    return render_template('home.html', videos=videos, selected_folder=folder, next_cursor=next_cursor)
 # Déplacer une vidéo
 @app.route('/move_video/<int:video_id>', methods=['POST'])
 @login_required
@@ -199,8 +386,10 @@ def move_video(video_id):
         abort(403)
     
     folder_id = request.form.get('folder_id')
+    previous_folder_id = video.folder_id
     video.folder_id = folder_id if folder_id else None
     db.session.commit()
+    invalidate_listings(previous_folder_id, video.folder_id)
     
     flash('Vidéo déplacée avec succès', 'success')
     return redirect(request.referrer or url_for('home'))
@@ -209,22 +398,14 @@ def move_video(video_id):
 @app.route('/video/<int:video_id>')
 def video_page(video_id):
     video = Video.query.get_or_404(video_id)
-    fingerprint = get_client_fingerprint()
-    
-    existing_view = VideoView.query.filter_by(
-        video_id=video_id,
-        fingerprint=fingerprint
-    ).first()
-
-    if not existing_view:
-        video.views += 1
-        new_view = VideoView(
-            video_id=video_id,
-            fingerprint=fingerprint,
-            user_id=current_user.id if current_user.is_authenticated else None
-        )
-        db.session.add(new_view)
-        db.session.commit()
+    
+    # Vue mise en tampon, écrite en base par lots (view_counter.ViewBuffer)
+    view_buffer.record(
+        video_id,
+        get_client_fingerprint(),
+        current_user.id if current_user.is_authenticated else None
+    )
+    views = video.views + view_buffer.pending_count(video_id)
 
     # Récupérer tous les dossiers pour le menu de déplacement
     folders = []
@@ -234,7 +415,7 @@ def video_page(video_id):
             (Folder.is_public == True)
         ).order_by(Folder.name).all()
 
-    return render_template('video_player.html', video=video, folders=folders)
+    return render_template('video_player.html', video=video, folders=folders, views=views)
 
 
 @app.route('/register', methods=['GET', 'POST'])
@@ -430,9 +611,9 @@ def admin_panel():
     if not current_user.is_admin:
         abort(403)  # Forbidden
     
-    videos = Video.query.order_by(Video.upload_date.desc()).all()
+    videos, next_cursor = paginate_videos(Video.query)
     users = User.query.all()
-    return render_template('admin_panel.html', videos=videos, users=users)
+    return render_template('admin_panel.html', videos=videos, users=users, next_cursor=next_cursor)
 
 @app.route('/delete_video/<int:video_id>', methods=['POST'])
 @login_required
@@ -444,22 +625,8 @@ def delete_video(video_id):
         abort(403)
 
     try:
-        # Suppression du fichier vidéo principal
-        video_path = os.path.join(app.config['UPLOAD_FOLDER'], video.filename)
-        if os.path.exists(video_path):
-            os.remove(video_path)
-        
-        # Suppression de la version convertie si elle existe
-        if video.processed_path and video.processed_path != video.filename:
-            processed_path = os.path.join(app.config['UPLOAD_FOLDER'], video.processed_path)
-            if os.path.exists(processed_path):
-                os.remove(processed_path)
-        
-        # Suppression de la thumbnail
-        thumb_path = os.path.join(app.config['UPLOAD_FOLDER'], 
-                                f"{os.path.splitext(video.filename)[0]}_thumb.jpg")
-        if os.path.exists(thumb_path):
-            os.remove(thumb_path)
+        # Suppression des fichiers (vidéo, miniature, HLS) s'ils ne sont plus partagés
+        delete_video_files(video)
         
         # Suppression des entrées de visualisation associées
         VideoView.query.filter_by(video_id=video.id).delete()
@@ -467,6 +634,8 @@ def delete_video(video_id):
         # Suppression de la vidéo de la base de données
         db.session.delete(video)
         db.session.commit()
+        invalidate_listings(video.folder_id)
+        purge_deleted_files()
         
         flash('Vidéo et tous ses fichiers associés supprimés avec succès', 'success')
         send_discord_log(f"🗑️ Vidéo supprimée : {video.title or video.filename} par {current_user.username}")
@@ -501,68 +670,27 @@ def upload_video():
             return redirect(request.url)
         
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
-            
-            new_video = Video(
-                filename=filename,
-                original_filename=file.filename,
-                title=request.form.get('title', ''),
-                user_id=current_user.id,
-                folder_id=request.form.get('folder_id') or None
-            )
-            
-            db.session.add(new_video)
-            db.session.commit()
-            
-            send_discord_log(f"📤 Nouvelle vidéo uploadée : {new_video.title or new_video.filename} par {current_user.username}")
+            wants_json = request.accept_mimetypes.best == 'application/json'
+            if request.form.get('convert') == 'true':
+                rejected = check_transcode_backlog(wants_json)
+                if rejected is not None:
+                    return rejected
             
-            # Vérifier si la conversion est demandée
-            should_convert = request.form.get('convert') == 'true'
+            # Hash calculé pendant l'écriture : le fichier est ensuite rangé sous son contenu
+            started = time.perf_counter()
+            with timed_stage('save'):
+                tmp_path, digest, size = save_stream(file.stream, app.config['UPLOAD_FOLDER'])
+            record_upload('form', size, time.perf_counter() - started)
             
-            if should_convert:
-                try:
-                    # Utiliser Google Cloud Transcode pour la conversion
-                    output_filename = f"converted_{filename}"
-                    output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-                    
-                    # Démarrer le transcodage
-                    if process_video_with_transcode(
-                        file_path,
-                        output_path,
-                        app.config['GOOGLE_CLOUD_PROJECT'],
-                        app.config['GOOGLE_CLOUD_BUCKET']
-                    ):
-                        # Vérifier que le fichier converti existe
-                        if os.path.exists(output_path):
-                            # Supprimer le fichier original
-                            try:
-                                os.remove(file_path)
-                            except Exception as e:
-                                app.logger.error(f"Erreur lors de la suppression du fichier original: {e}")
-                            
-                            # Mettre à jour le nom du fichier dans la base de données
-                            new_video.filename = output_filename
-                            new_video.is_converted = True
-                            db.session.commit()
-                            flash('Vidéo convertie avec succès', 'success')
-                            send_discord_log(f"✅ Vidéo convertie avec succès : {new_video.title or new_video.filename}")
-                        else:
-                            flash('Erreur : Le fichier converti n\'a pas été généré', 'error')
-                            send_discord_log(f"❌ Erreur : Fichier converti non généré pour {new_video.title or new_video.filename}")
-                    else:
-                        flash('Erreur lors de la conversion de la vidéo', 'error')
-                        send_discord_log(f"❌ Erreur lors de la conversion de la vidéo : {new_video.title or new_video.filename}")
-                except Exception as e:
-                    app.logger.error(f"Erreur lors du transcodage: {str(e)}")
-                    flash(f'Erreur lors de la conversion : {str(e)}', 'error')
-                    send_discord_log(f"❌ Erreur lors du transcodage : {str(e)}")
-            else:
-                flash('Vidéo uploadée sans conversion', 'success')
-                send_discord_log(f"📤 Vidéo uploadée sans conversion : {new_video.title or new_video.filename}")
-            
-            return redirect(url_for('home'))
+            return finish_upload(
+                tmp_path,
+                digest,
+                file.filename,
+                request.form.get('title', ''),
+                request.form.get('folder_id') or None,
+                request.form.get('convert') == 'true',
+                wants_json
+            )
         
         flash('Type de fichier non autorisé', 'error')
         return redirect(request.url)
@@ -570,17 +698,331 @@ def upload_video():
     return render_template('upload.html')
 
 
+def check_transcode_backlog(wants_json):
+    """
+    Refuse une nouvelle conversion quand la file locale dépasse TRANSCODE_MAX_BACKLOG
+    secondes de travail estimé (None si elle est acceptée).
+    """
+    limit = app.config['TRANSCODE_MAX_BACKLOG']
+    if not limit:
+        return None
+    backlog = queue_backlog(resolve_backend_name(app.config))
+    if backlog <= limit:
+        return None
+    
+    message = f"File de conversion saturée, réessayez dans {format_time(round(backlog - limit))}"
+    if wants_json:
+        response = jsonify({'status': 'error', 'message': message, 'backlog_seconds': round(backlog)})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(round(backlog - limit))
+        return response
+    flash(message, 'error')
+    return redirect(request.url)
+
+def finish_upload(tmp_path, digest, original_filename, title, folder_id, should_convert, wants_json):
+    """
+    Crée la vidéo d'un fichier uploadé (tmp_path, de hash digest) et met sa conversion en file.
+    Un contenu déjà connu réutilise le blob existant : ni copie sur disque ni nouveau transcodage.
+    """
+    extension = original_filename.rsplit('.', 1)[1]
+    blob, created = ingest_blob(app.config['UPLOAD_FOLDER'], tmp_path, digest, extension)
+    sibling = None if created else Video.query.filter(Video.blob_id == blob.id).first()
+    new_video = Video(
+        filename=blob.filename,
+        original_filename=original_filename,
+        title=title,
+        user_id=current_user.id,
+        folder_id=folder_id,
+        blob_id=blob.id
+    )
+    
+    if sibling is not None:
+        # Doublon : métadonnées, chemin de conversion et HLS déjà calculés pour ce contenu
+        new_video.apply_metadata(sibling.stored_metadata())
+        new_video.conversion_path = sibling.conversion_path
+        new_video.hls_playlist = sibling.hls_playlist
+    else:
+        new_video.apply_metadata(probe_media(absolute(app.config['UPLOAD_FOLDER'], blob.filename)))
+    
+    db.session.add(new_video)
+    db.session.commit()
+    invalidate_listings(folder_id)
+    
+    send_discord_log(f"📤 Nouvelle vidéo uploadée : {new_video.title or new_video.filename} par {current_user.username}")
+    
+    if not created and (blob.transcoded or not should_convert):
+        flash('Vidéo uploadée (fichier déjà présent, aucune conversion nécessaire)', 'success')
+        if wants_json:
+            return jsonify({'status': 'uploaded', 'video_id': new_video.id, 'deduplicated': True}), 201
+        return redirect(url_for('home'))
+    
+    if should_convert:
+        # La conversion tourne dans un worker Celery, la requête rend la main tout de suite
+        new_video.is_converted = False
+        db.session.commit()
+        job = None if created else pending_blob_job(blob)
+        if job is None:
+            try:
+                job = enqueue_transcode(new_video)
+            except Exception as e:
+                app.logger.error(f"Erreur lors de la mise en file du transcodage: {str(e)}")
+                send_discord_log(f"❌ Erreur lors de la mise en file du transcodage : {str(e)}")
+                if wants_json:
+                    return jsonify({'status': 'error', 'message': str(e)}), 503
+                flash(f'Erreur lors de la conversion : {str(e)}', 'error')
+                return redirect(url_for('home'))
+        
+        if wants_json:
+            return jsonify({
+                'status': 'queued',
+                'job_id': job.id,
+                'video_id': new_video.id,
+                'status_url': url_for('job_status', job_id=job.id),
+                'events_url': events_url(job),
+                'eta_seconds': job_eta(job)['eta_seconds']
+            }), 202
+        flash('Vidéo uploadée, conversion en cours', 'success')
+    else:
+        flash('Vidéo uploadée sans conversion', 'success')
+        send_discord_log(f"📤 Vidéo uploadée sans conversion : {new_video.title or new_video.filename}")
+        if wants_json:
+            return jsonify({'status': 'uploaded', 'video_id': new_video.id}), 201
+    
+    return redirect(url_for('home'))
+
+def pending_blob_job(blob):
+    """Job de conversion en cours pour ce contenu : le doublon en profitera à la fin du job"""
+    return (
+        TranscodeJob.query
+        .join(Video, TranscodeJob.video_id == Video.id)
+        .filter(Video.blob_id == blob.id,
+                TranscodeJob.state.in_((TranscodeJob.PENDING, TranscodeJob.RUNNING, TranscodeJob.RETRYING)))
+        .first()
+    )
+
+
+## Upload par morceaux avec reprise (protocole inspiré de tus)
+def get_upload_session(upload_id):
+    upload = UploadSession.query.get_or_404(upload_id)
+    if upload.user_id != current_user.id or upload.completed_at is not None:
+        abort(404)
+    return upload
+
+def chunk_error_response(error):
+    response = jsonify({'status': 'error', 'message': str(error), 'offset': error.offset})
+    response.status_code = error.status
+    if error.offset is not None:
+        response.headers['Upload-Offset'] = str(error.offset)
+    return response
+
+@app.route('/uploads', methods=['POST'])
+@login_required
+def create_upload():
+    if not current_user.can_upload:
+        abort(403)
+    
+    data = request.get_json(silent=True) or {}
+    original_filename = data.get('filename', '')
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Taille de fichier invalide'}), 400
+    
+    if not allowed_file(original_filename) or not secure_filename(original_filename):
+        return jsonify({'status': 'error', 'message': 'Type de fichier non autorisé'}), 400
+    if size <= 0 or size > app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({'status': 'error', 'message': 'Taille de fichier non autorisée'}), 413
+    if data.get('convert'):
+        # Décision avant l'envoi des octets, plutôt qu'après un upload complet
+        rejected = check_transcode_backlog(wants_json=True)
+        if rejected is not None:
+            return rejected
+    
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        original_filename=original_filename,
+        size=size,
+        title=data.get('title', ''),
+        folder_id=data.get('folder_id') or None,
+        convert=bool(data.get('convert'))
+    )
+    db.session.add(upload)
+    db.session.commit()
+    
+    response = jsonify({
+        'upload_id': upload.id,
+        'offset': 0,
+        'chunk_size': app.config['UPLOAD_CHUNK_SIZE'],
+        'url': url_for('upload_chunk', upload_id=upload.id)
+    })
+    response.status_code = 201
+    response.headers['Location'] = url_for('upload_chunk', upload_id=upload.id)
+    return response
+
+@app.route('/uploads/<upload_id>', methods=['HEAD', 'GET'])
+@login_required
+def upload_offset(upload_id):
+    upload = get_upload_session(upload_id)
+    offset = current_offset(partial_path(app.config['UPLOAD_FOLDER'], upload.id))
+    response = jsonify({'upload_id': upload.id, 'offset': offset, 'size': upload.size})
+    response.headers['Upload-Offset'] = str(offset)
+    response.headers['Upload-Length'] = str(upload.size)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/uploads/<upload_id>', methods=['PATCH'])
+@login_required
+def upload_chunk(upload_id):
+    upload = get_upload_session(upload_id)
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return jsonify({'status': 'error', 'message': 'En-tête Upload-Offset requis'}), 400
+    if request.content_length and request.content_length > app.config['UPLOAD_CHUNK_SIZE']:
+        return jsonify({'status': 'error', 'message': 'Morceau trop volumineux'}), 413
+    
+    try:
+        checksum = parse_checksum(request.headers.get('Upload-Checksum'))
+        # Lecture directe du flux : le morceau n'est jamais mis en mémoire ni en fichier temporaire
+        started = time.perf_counter()
+        with timed_stage('save'):
+            new_offset = append_chunk(
+                partial_path(app.config['UPLOAD_FOLDER'], upload.id),
+                offset,
+                request.stream,
+                upload.size,
+                checksum
+            )
+    except ChunkError as e:
+        return chunk_error_response(e)
+    record_upload('chunk', new_offset - offset, time.perf_counter() - started)
+    
+    response = app.response_class(status=204)
+    response.headers['Upload-Offset'] = str(new_offset)
+    return response
+
+@app.route('/uploads/<upload_id>/commit', methods=['POST'])
+@login_required
+def commit_upload(upload_id):
+    upload = get_upload_session(upload_id)
+    path = partial_path(app.config['UPLOAD_FOLDER'], upload.id)
+    offset = current_offset(path)
+    if offset != upload.size:
+        return chunk_error_response(ChunkError('Upload incomplet', 409, offset=offset))
+    
+    # Réservation atomique : de deux validations simultanées, une seule crée la vidéo
+    claimed = db.session.execute(
+        update(UploadSession)
+        .where(UploadSession.id == upload.id, UploadSession.completed_at.is_(None))
+        .values(completed_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    if claimed != 1:
+        return chunk_error_response(ChunkError('Validation déjà en cours', 409, offset=offset))
+    
+    try:
+        # Les morceaux arrivent dans des requêtes séparées : le hash est calculé une fois le fichier complet
+        with timed_stage('hash'):
+            digest = hash_file(path)
+        return finish_upload(path, digest, upload.original_filename, upload.title,
+                             upload.folder_id, upload.convert, wants_json=True)
+    except Exception:
+        # Échec avant la création de la vidéo : la session redevient validable (nouvel essai du client)
+        db.session.rollback()
+        db.session.execute(update(UploadSession).where(UploadSession.id == upload.id).values(completed_at=None))
+        db.session.commit()
+        raise
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def cancel_upload(upload_id):
+    upload = get_upload_session(upload_id)
+    discard(partial_path(app.config['UPLOAD_FOLDER'], upload.id))
+    db.session.delete(upload)
+    db.session.commit()
+    return app.response_class(status=204)
+
+
+@app.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    job = TranscodeJob.query.get_or_404(job_id)
+    if job.video.user_id != current_user.id and not current_user.is_admin:
+        abort(403)
+    return jsonify(dict(job.to_dict(), **job_eta(job), progress=progress_store.latest(job.id), events_url=events_url(job)))
+
+
+def events_url(job):
+    """URL du flux SSE de progression : serveur dédié (jeton signé) ou route de repli."""
+    stream_url = app.config['PROGRESS_STREAM_URL']
+    if stream_url:
+        return f"{stream_url.rstrip('/')}/jobs/{job.id}/events?token={progress_token(app.config['SECRET_KEY'], job.id)}"
+    return url_for('job_events', job_id=job.id)
+
+
+@app.route('/jobs/<int:job_id>/events')
+@login_required
+def job_events(job_id):
+    """
+    Progression du job en Server-Sent Events, sans serveur dédié. Occupe un
+    worker WSGI pendant toute la conversion : en production, préférer
+    `flask progress-stream` avec PROGRESS_STREAM_URL.
+    """
+    job = TranscodeJob.query.get_or_404(job_id)
+    if job.video.user_id != current_user.id and not current_user.is_admin:
+        abort(403)
+    db.session.remove()  # ne pas garder de connexion pendant le flux
+
+    def finished_update():
+        # Job terminé sans progression visible (publiée avant le flux, expirée, autre processus)
+        job = db.session.get(TranscodeJob, job_id)
+        update = None
+        if job is not None and job.is_finished:
+            update = {'job_id': job_id, 'state': job.state, 'stage': None,
+                      'percent': 100 if job.state == TranscodeJob.SUCCEEDED else None, 'error': job.error}
+        db.session.remove()
+        return update
+
+    def generate():
+        yield "retry: 3000\n\n"
+        last, idle = None, 0.0
+        update = progress_store.latest(job_id) or finished_update()
+        while True:
+            if update is not None and update != last:
+                last, idle = update, 0.0
+                yield format_event(update)
+                if update['state'] in TERMINAL_STATES:
+                    return
+            elif idle >= app.config['PROGRESS_HEARTBEAT']:
+                idle = 0.0
+                yield ": ping\n\n"
+                update = finished_update()
+                continue
+            time.sleep(0.5)
+            idle += 0.5
+            update = progress_store.latest(job_id)
+
+    return app.response_class(stream_with_context(generate()), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/metrics')
+def metrics():
+    if not app.config['METRICS_ENABLED']:
+        abort(404)
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        abort(401)
+    return metrics_response()
+
 @app.route('/embed/<int:video_id>')
 def discord_embed(video_id):
     video = Video.query.get_or_404(video_id)
     
-    try:
-        probe = ffmpeg.probe(os.path.join(app.config['UPLOAD_FOLDER'], video.filename))
-        video_stream = next(s for s in probe['streams'] if s['codec_type'] == 'video')
-        width = int(video_stream.get('width', 1920))
-        height = int(video_stream.get('height', 1080))
-    except:
-        width, height = 1920, 1080
+    # Dimensions enregistrées à l'ingestion, aucun ffprobe par requête
+    width = video.width or 1920
+    height = video.height or 1080
     
     return render_template('discord_embed.html',
         video=video,
@@ -592,9 +1034,23 @@ def discord_embed(video_id):
     )
 
 
-@app.route('/video/<filename>')
-def serve_video(filename):
+def find_video_by_filename(filename):
+    """
+    Vidéo servie sous ce chemin. Les liens antérieurs à `flask migrate-storage`
+    (nom à plat) restent valides : le nom de fichier est unique (hash ou uuid).
+    """
     video = Video.query.filter_by(filename=filename).first()
+    if video is None and not is_sharded(filename) and '/' not in filename:
+        video = Video.query.filter(
+            Video.filename.startswith(f"{VIDEOS_DIR}/"),
+            Video.filename.endswith(f"/{filename}", autoescape=True),
+        ).first()
+    return video
+
+
+@app.route('/video/<path:filename>')
+def serve_video(filename):
+    video = find_video_by_filename(filename)
     if not video:
         abort(404)
     
@@ -603,33 +1059,72 @@ def serve_video(filename):
     if 'discord' in user_agent:
         return redirect(url_for('discord_embed', video_id=video.id))
     
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
-@app.route('/thumbnail/<filename>')
+    path = safe_join(app.config['UPLOAD_FOLDER'], video.filename)
+    if path is None:
+        abort(404)
+    return send_media(path)
+@app.route('/hls/<int:video_id>/<filename>')
+def serve_hls(video_id, filename):
+    video = Video.query.get_or_404(video_id)
+    if not video.hls_playlist:
+        abort(404)
+    
+    if filename.endswith('.m3u8'):
+        mimetype = 'application/vnd.apple.mpegurl'
+        # Les playlists peuvent être régénérées, les segments jamais
+        cache_control = 'public, max-age=300'
+    elif filename.endswith('.ts'):
+        mimetype = 'video/mp2t'
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        abort(404)
+    
+    path = safe_join(absolute(app.config['UPLOAD_FOLDER'], os.path.dirname(video.hls_playlist)), filename)
+    if path is None:
+        abort(404)
+    return send_media(path, mimetype=mimetype, cache_control=cache_control)
+
+@app.route('/thumbnail/<path:filename>')
 def serve_thumbnail(filename):
     try:
-        base_filename = os.path.splitext(filename)[0]
-        thumbnail_filename = f"{base_filename}_thumb.jpg"
-        thumbnail_path = os.path.join(app.config['UPLOAD_FOLDER'], thumbnail_filename)
+        thumbnail_file = safe_join(app.config['UPLOAD_FOLDER'], thumbnail_path(filename))
+        if thumbnail_file is None:
+            return default_thumbnail()
         
-        if not os.path.exists(thumbnail_path):
-            # Regénérer la thumbnail si manquante
-            video_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            try:
-                (
-                    ffmpeg
-                    .input(video_path, ss='00:00:01')
-                    .output(thumbnail_path, vframes=1)
-                    .overwrite_output()
-                    .run(capture_stdout=True, capture_stderr=True)
-                )
-            except Exception as e:
-                print(f"Erreur regénération thumbnail: {e}")
-                return send_from_directory('static', 'default_thumb.jpg')
+        if not os.path.exists(thumbnail_file):
+            # Seules les vidéos en base sont régénérées (pas n'importe quel fichier du dossier d'upload)
+            video = find_video_by_filename(filename)
+            if video is None:
+                return default_thumbnail()
+            if video.filename != filename:
+                # Ancien lien à plat : vidéo déplacée par migrate-storage
+                return redirect(url_for('serve_thumbnail', filename=video.filename), code=301)
+            video_path = safe_join(app.config['UPLOAD_FOLDER'], video.filename)
+            if video_path is None or not os.path.exists(video_path):
+                return default_thumbnail()
+            # Regénération en arrière-plan, la miniature par défaut est servie en attendant
+            thumbnail_service.request(video_path, thumbnail_file)
+            return default_thumbnail()
         
-        return send_from_directory(app.config['UPLOAD_FOLDER'], thumbnail_filename)
+        return send_media(thumbnail_file, mimetype='image/jpeg', cache_control='public, max-age=86400')
     except Exception as e:
         print(f"Erreur thumbnail: {e}")
-        return send_from_directory('static', 'default_thumb.jpg')
+        return default_thumbnail()
+
+def default_thumbnail():
+    response = send_from_directory('static', 'default_thumb.jpg')
+    # Pas de cache : le navigateur redemandera la vraie miniature une fois générée
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Miniature personnalisée d'un dossier (Folder.thumbnail_url)
+@app.route('/folder_thumbnail/<path:filename>')
+def serve_uploaded_file(filename):
+    Folder.query.filter_by(custom_thumbnail=filename).first_or_404()
+    path = safe_join(app.config['UPLOAD_FOLDER'], filename)
+    if path is None:
+        abort(404)
+    return send_media(path, cache_control='public, max-age=3600')
 
 # Upload thumbnail de dossier
 @app.route('/upload_folder_thumbnail/<int:folder_id>', methods=['POST'])
@@ -649,16 +1144,17 @@ def upload_folder_thumbnail(folder_id):
         return redirect(request.referrer)
     
     if file and allowed_file(file.filename):
-        filename = f"folder_{folder_id}_thumb.{file.filename.rsplit('.', 1)[1].lower()}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        filename = folder_thumbnail_path(folder_id, file.filename.rsplit('.', 1)[1])
+        file.save(absolute(app.config['UPLOAD_FOLDER'], filename, create=True))
         
         # Supprime l'ancienne thumbnail si elle existe
-        if folder.custom_thumbnail and os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], folder.custom_thumbnail)):
-            os.remove(os.path.join(app.config['UPLOAD_FOLDER'], folder.custom_thumbnail))
+        if folder.custom_thumbnail != filename:
+            schedule_deletion(folder.custom_thumbnail)
         
         folder.custom_thumbnail = filename
         db.session.commit()
+        cache.invalidate(FOLDERS_TAG)
+        purge_deleted_files()
         flash('Miniature du dossier mise à jour!', 'success')
     
     return redirect(request.referrer)
@@ -684,6 +1180,7 @@ def toggle_folder_privacy(folder_id):
     
     folder.is_public = not folder.is_public
     db.session.commit()
+    cache.invalidate(FOLDERS_TAG)
     return jsonify({'status': 'success', 'is_public': folder.is_public})
 
 @app.route('/change_password', methods=['POST'])
@@ -714,17 +1211,119 @@ def change_password():
     
     return redirect(url_for('profile'))
 
+@app.cli.command('backfill-metadata')
+@click.option('--batch-size', default=100, show_default=True, help='Vidéos analysées par transaction')
+@click.option('--all', 'reprobe_all', is_flag=True, help='Réanalyser aussi les vidéos déjà renseignées')
+def backfill_metadata(batch_size, reprobe_all):
+    """Renseigne les métadonnées média des vidéos existantes."""
+    last_id = 0
+    processed = 0
+    while True:
+        query = Video.query.filter(Video.id > last_id)
+        if not reprobe_all:
+            query = query.filter(Video.probed_at.is_(None))
+        batch = query.order_by(Video.id).limit(batch_size).all()
+        if not batch:
+            break
+        for video in batch:
+            video.apply_metadata(probe_media(absolute(app.config['UPLOAD_FOLDER'], video.filename)))
+        db.session.commit()
+        last_id = batch[-1].id
+        processed += len(batch)
+        click.echo(f"{processed} vidéo(s) analysée(s)")
+    click.echo(f"Terminé : {processed} vidéo(s) mises à jour")
+
+@app.cli.command('reconcile-files')
+@click.option('--dry-run', is_flag=True, help='Signaler les orphelins sans rien supprimer')
+@click.option('--grace-period', type=int, default=None, help='Âge minimal (s) d\'un orphelin [RECONCILE_GRACE_PERIOD]')
+@click.option('--batch-size', type=int, default=None, help='Entrées confrontées à la base par requête [RECONCILE_BATCH_SIZE]')
+@click.option('--verbose', '-v', is_flag=True, help='Lister chaque orphelin')
+def reconcile_files(dry_run, grace_period, batch_size, verbose):
+    """Termine les suppressions en attente et nettoie les fichiers orphelins du dossier d'upload."""
+    def show(orphan):
+        if verbose:
+            click.echo(f"  {orphan.category:<16} {orphan.size:>12} {orphan.path}")
+
+    report = reconcile(
+        app.config['UPLOAD_FOLDER'], dry_run=dry_run,
+        grace_period=app.config['RECONCILE_GRACE_PERIOD'] if grace_period is None else grace_period,
+        batch_size=batch_size or app.config['RECONCILE_BATCH_SIZE'], on_orphan=show,
+    )
+    for category, stats in sorted(report.categories.items()):
+        click.echo(f"{category:<16} {stats['count']:>6} fichier(s) {stats['bytes'] / 1024 / 1024:>10.1f} Mo")
+    if dry_run:
+        click.echo(f"Dry-run : {report.orphans} orphelin(s), {report.pending} suppression(s) en attente, rien n'a été supprimé")
+    else:
+        click.echo(f"{report.purged} suppression(s) en attente traitée(s), {report.deleted} orphelin(s) supprimé(s) "
+                   f"({report.freed_bytes / 1024 / 1024:.1f} Mo libérés), {report.errors} erreur(s)")
+    if report.categories.get('unknown'):
+        click.echo("Les fichiers 'unknown' ne sont jamais supprimés : à vérifier manuellement")
+
+@app.cli.command('migrate-storage')
+@click.option('--dry-run', is_flag=True, help='Compter les fichiers à déplacer sans rien modifier')
+@click.option('--batch-size', default=100, show_default=True, help='Vidéos traitées par lot')
+@click.option('--limit', type=int, default=None, help='Nombre maximal de vidéos déplacées')
+def migrate_storage_command(dry_run, batch_size, limit):
+    """Range les fichiers à plat du dossier d'upload dans l'arborescence de storage_layout, sans interruption."""
+    def on_batch(folder_ids):
+        invalidate_listings(*folder_ids)
+        click.echo(f"Lot terminé ({len(folder_ids)} dossier(s) invalidé(s))")
+
+    stats = migrate_storage(app.config['UPLOAD_FOLDER'], batch_size=batch_size, limit=limit,
+                            dry_run=dry_run, on_batch=on_batch)
+    verb = 'à déplacer' if dry_run else 'déplacée(s)'
+    click.echo(f"{stats['moved']} vidéo(s) {verb} ({stats['files']} fichier(s)), {stats['folders']} miniature(s) de dossier ; "
+               f"{stats['busy']} en cours de conversion, {stats['missing']} sans fichier, {stats['conflict']} modifiée(s) pendant le déplacement")
+    if stats['busy'] or stats['conflict']:
+        click.echo("Relancer la commande pour traiter les vidéos ignorées")
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Recrée l'index plein texte (tables, triggers) et réindexe vidéos et dossiers."""
+    with db.engine.begin() as connection:
+        install_search_index(connection)
+    click.echo("Index de recherche reconstruit")
+
+@app.cli.command('transcode-worker')
+@click.option('--loglevel', default='INFO', show_default=True)
+def transcode_worker(loglevel):
+    """Worker Celery de la file de transcodage, avec la concurrence de plan_local_pool."""
+    concurrency, threads = plan_local_pool(app.config['LOCAL_TRANSCODE_CONCURRENCY'], app.config['LOCAL_TRANSCODE_THREADS'])
+    click.echo(f"File {app.config['TRANSCODE_QUEUE']} : {concurrency} job(s) simultané(s), {threads} thread(s) ffmpeg chacun")
+    celery.worker_main(['worker', '-Q', app.config['TRANSCODE_QUEUE'], f'--concurrency={concurrency}',
+                        '--pool=prefork', f'--loglevel={loglevel}'])
+
+@app.cli.command('transcode-watcher')
+def transcode_watcher():
+    """Suit les jobs Cloud Transcoder lancés par les workers (un seul processus pour toute l'installation)."""
+    watcher = get_transcode_watcher()
+    click.echo(f"Suivi des jobs cloud, nouveaux jobs recherchés toutes les {app.config['TRANSCODE_WATCHER_RESCAN']:g} s")
+    try:
+        while True:
+            resume_cloud_jobs(watcher)
+            db.session.remove()
+            time.sleep(app.config['TRANSCODE_WATCHER_RESCAN'])
+    except KeyboardInterrupt:
+        watcher.stop()
+
+@app.cli.command('progress-stream')
+@click.option('--host', default='0.0.0.0', show_default=True)
+@click.option('--port', default=8082, show_default=True)
+def progress_stream(host, port):
+    """Sert les flux SSE de progression des jobs (PROGRESS_STREAM_URL, PROGRESS_BACKEND=redis)."""
+    if app.config['PROGRESS_BACKEND'] != 'redis':
+        click.echo("Attention : sans PROGRESS_BACKEND=redis, les jobs des workers Celery ne seront pas visibles")
+    server = ProgressStreamServer(progress_store, app.config['SECRET_KEY'], host, port,
+                                  heartbeat=app.config['PROGRESS_HEARTBEAT'])
+    click.echo(f"Flux de progression sur http://{host}:{port}/jobs/<id>/events")
+    server.run()
+
 if __name__ == '__main__':
     with app.app_context():
         try:
-            # Vérifier si la base de données existe
-            db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'youtube_clone.db')
-            if not os.path.exists(db_path):
-                # Créer la base de données et les tables
-                db.create_all()
-                print("Base de données initialisée avec succès")
-            else:
-                print("Base de données existante détectée")
+            # Base neuve, base d'avant les migrations (voir la révision « schéma d'origine ») ou déjà suivie
+            upgrade()
+            print("Base de données à jour")
         except Exception as e:
             print("Erreur lors de l'initialisation de la base de données:", str(e))
             traceback.print_exc()
@@ -0,0 +1,214 @@
+import os
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import process_video
+from segmented import should_segment, transcode_segmented
+from thumbnails import generate_thumbnail
+from progress import follow_ffmpeg_progress
+from storage_layout import video_file, video_dir, thumbnail_path, absolute, relative
+
+# Registre des backends de transcodage disponibles, indexé par nom
+BACKENDS = {}
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def register_backend(cls):
+    """Décorateur d'enregistrement d'un backend de transcodage."""
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def available_cpus() -> int:
+    """Nombre de coeurs réellement utilisables par ce processus."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def plan_local_pool(concurrency=None, threads_per_job=None, cpus=None):
+    """
+    Calcule (jobs simultanés, threads par job) sans dépasser le nombre de
+    coeurs : une concurrence demandée au-delà est ramenée au nombre de coeurs.
+    """
+    cpus = cpus or available_cpus()
+    if concurrency is not None and concurrency > cpus:
+        print(f"LOCAL_TRANSCODE_CONCURRENCY={concurrency} dépasse les {cpus} coeurs disponibles : ramené à {cpus}")
+        concurrency = cpus
+    if concurrency is None and threads_per_job is None:
+        threads_per_job = max(1, min(4, cpus // 2))
+    if concurrency is None:
+        concurrency = max(1, cpus // threads_per_job)
+    if threads_per_job is None or concurrency * threads_per_job > cpus:
+        threads_per_job = max(1, cpus // concurrency)
+    return concurrency, threads_per_job
+
+
+class TranscodeBackend:
+    """Interface commune des backends de transcodage.
+
+    transcode() convertit le fichier source selon le plan de
+    utils.plan_conversion et retourne le chemin du fichier produit, relatif
+    au dossier d'upload et rangé dans le dossier de la vidéo (voir
+    storage_layout) ; progress(ratio), si fourni, reçoit l'avancement.
+
+    Un backend asynchrone expose en plus start(), qui lance la conversion et
+    retourne (identifiant externe, emplacement de sortie), et finish(), qui
+    récupère le fichier produit une fois le job externe terminé.
+    """
+    name = None
+    asynchronous = False
+
+    def __init__(self, config):
+        self.config = config
+
+    @classmethod
+    def is_available(cls, config) -> bool:
+        return True
+
+    def transcode(self, video, input_path: str, plan, progress=None) -> str:
+        raise NotImplementedError
+
+
+@register_backend
+class CloudTranscodeBackend(TranscodeBackend):
+    """Conversion via Google Cloud Transcoder (transcoder.py)."""
+    name = 'cloud'
+    asynchronous = True
+
+    @classmethod
+    def is_available(cls, config) -> bool:
+        try:
+            import google.auth
+            from google.cloud.video import transcoder  # noqa: F401
+            google.auth.default()
+        except Exception:
+            return False
+        return bool(config.get('GOOGLE_CLOUD_PROJECT') and config.get('GOOGLE_CLOUD_BUCKET'))
+
+    def transcode(self, video, input_path: str, plan, progress=None) -> str:
+        # Transcoder réencode toujours tout : n'est utilisé que pour le chemin 'transcode'
+        # Import tardif : les bibliothèques Google ne sont pas requises en local
+        from transcoder import process_video_with_transcode
+
+        output_filename = video_file(video.storage_key, f"converted_{os.path.basename(video.filename)}")
+        output_path = absolute(self.config['UPLOAD_FOLDER'], output_filename, create=True)
+        if not process_video_with_transcode(
+            input_path,
+            output_path,
+            self.config['GOOGLE_CLOUD_PROJECT'],
+            self.config['GOOGLE_CLOUD_BUCKET']
+        ):
+            raise RuntimeError('Erreur lors de la conversion de la vidéo')
+        if not os.path.exists(output_path):
+            raise RuntimeError('Le fichier converti n\'a pas été généré')
+        return output_filename
+
+    def start(self, video, input_path: str, plan):
+        """Lance le job Transcoder ; son suivi est confié à transcode_watcher."""
+        from transcoder import start_transcode
+
+        return start_transcode(input_path, self.config['GOOGLE_CLOUD_PROJECT'], self.config['GOOGLE_CLOUD_BUCKET'])
+
+    def finish(self, video, output_folder: str) -> str:
+        from transcoder import fetch_transcode_output
+
+        output_filename = video_file(video.storage_key, f"converted_{os.path.splitext(os.path.basename(video.filename))[0]}.mp4")
+        output_path = absolute(self.config['UPLOAD_FOLDER'], output_filename, create=True)
+        fetch_transcode_output(self.config['GOOGLE_CLOUD_BUCKET'], output_folder, output_path)
+        return output_filename
+
+
+@register_backend
+class LocalTranscodeBackend(TranscodeBackend):
+    """Conversion ffmpeg locale, exécutée directement par la tâche Celery.
+
+    ffmpeg tourne en sous-processus du worker avec threads_per_job threads
+    libx264 (pas de pool de processus : un enfant prefork de Celery est
+    démoniaque et ne peut pas en créer). Le parallélisme est celui de la file
+    TRANSCODE_QUEUE, consommée par des workers lancés avec
+    --concurrency=concurrency (voir `flask transcode-worker`) : au plus
+    concurrency * threads_per_job coeurs occupés.
+
+    Au-delà des seuils SEGMENTED_TRANSCODE_*, la vidéo est découpée et ses
+    segments encodés en parallèle, dans le même budget (voir segmented.py).
+    """
+    name = 'local'
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.concurrency, self.threads_per_job = plan_local_pool(
+            config.get('LOCAL_TRANSCODE_CONCURRENCY'),
+            config.get('LOCAL_TRANSCODE_THREADS'),
+        )
+
+    def transcode(self, video, input_path: str, plan, progress=None) -> str:
+        metadata = video.stored_metadata()
+        # Fichiers produits rangés dans le dossier de la vidéo (voir storage_layout)
+        output_dir = absolute(self.config['UPLOAD_FOLDER'], video_dir(video.storage_key))
+        os.makedirs(output_dir, exist_ok=True)
+        if plan['vcodec'] != 'copy' and should_segment(
+            metadata, os.path.getsize(input_path),
+            self.config.get('SEGMENTED_TRANSCODE_MIN_DURATION', 600),
+            self.config.get('SEGMENTED_TRANSCODE_MIN_SIZE', 512 * 1024 * 1024),
+        ):
+            return self.transcode_segmented(video, input_path, plan, metadata, progress)
+
+        if progress is None:
+            result = process_video(input_path, output_dir, convert=True, threads=self.threads_per_job, plan=plan)
+        else:
+            # ffmpeg écrit son avancement dans un fichier, suivi pendant l'encodage
+            progress_path = f"{input_path}.{uuid.uuid4().hex}.progress"
+            try:
+                with ThreadPoolExecutor(max_workers=1, thread_name_prefix='ffmpeg') as runner:
+                    future = runner.submit(process_video, input_path, output_dir, convert=True,
+                                           threads=self.threads_per_job, plan=plan, progress_path=progress_path)
+                    follow_ffmpeg_progress(future, progress_path, (metadata or {}).get('duration'), progress)
+                    result = future.result()
+            finally:
+                if os.path.exists(progress_path):
+                    os.remove(progress_path)
+        if not result:
+            raise RuntimeError('Erreur lors de la conversion locale de la vidéo')
+        return relative(self.config['UPLOAD_FOLDER'], result['video_path'])
+
+    def transcode_segmented(self, video, input_path: str, plan, metadata, progress=None) -> str:
+        """threads_per_job segments encodés à la fois, un thread libx264 chacun : le budget d'un job."""
+        output_filename = video_file(video.storage_key, f"{uuid.uuid4()}.mp4")
+        output_path = absolute(self.config['UPLOAD_FOLDER'], output_filename, create=True)
+        segments = transcode_segmented(
+            input_path, output_path, metadata['duration'],
+            workers=self.threads_per_job,
+            acodec=plan['acodec'], fps=metadata.get('fps'), progress=progress,
+        )
+        try:
+            generate_thumbnail(output_path, absolute(self.config['UPLOAD_FOLDER'], thumbnail_path(output_filename)))
+        except Exception as e:
+            # Régénérée à la demande par serve_thumbnail
+            print(f"Erreur lors de la génération de la miniature : {e}")
+        return output_filename
+
+
+def resolve_backend_name(config) -> str:
+    """Choisit le backend configuré ; 'auto' utilise le cloud seulement si des identifiants existent."""
+    name = config.get('TRANSCODE_BACKEND', 'auto')
+    if name == 'auto':
+        return 'cloud' if CloudTranscodeBackend.is_available(config) else 'local'
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de transcodage inconnu: {name}")
+    return name
+
+
+def backend_for_plan(name: str, plan) -> str:
+    """Copie de flux et réencodage partiel restent locaux : quelques secondes, sans aller-retour cloud."""
+    return name if plan['path'] == 'transcode' else LocalTranscodeBackend.name
+
+
+def get_backend(name: str, config) -> TranscodeBackend:
+    """Retourne l'instance (partagée par processus) du backend demandé."""
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = BACKENDS[name](config)
+        return _instances[name]
@@ -0,0 +1,146 @@
+"""
+Trafic mixte lectures/écritures concurrentes sur la base : pages de vidéos
+(requête de home) pendant des flushs de vues (insert video_view + update
+views), comme en production avec view_counter.
+
+Compare SQLite en journal par défaut (avant), SQLite WAL avec les PRAGMA de
+database.py (après) et, si une URL est fournie, PostgreSQL :
+
+    python -m benchmarks.bench_db --seconds 10 --readers 8 --writers 2
+    python -m benchmarks.bench_db --postgres-url postgresql://zedtube@localhost/zedtube_bench
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select, insert, update, delete
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.common import emit, summarize
+from database import SQLITE_PRAGMAS, install_sqlite_pragmas
+from models import db, User, Video, VideoView
+
+
+def seed(engine, rows):
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{'id': 1, 'username': 'bench', 'password_hash': 'x'}])
+        conn.execute(insert(Video.__table__), [{
+            'id': i,
+            'filename': f"{i}.mp4",
+            'original_filename': f"{i}.mp4",
+            'title': f"Vidéo {i}",
+            'user_id': 1,
+            'views': 0,
+            'upload_date': start + timedelta(minutes=i),
+        } for i in range(1, rows + 1)])
+
+
+def read_page(conn, rng, rows):
+    # Page racine à une position aléatoire, comme keyset_page
+    before = datetime(2024, 1, 1) + timedelta(minutes=rng.randint(24, rows))
+    conn.execute(
+        select(Video.__table__)
+        .where(Video.folder_id.is_(None), Video.upload_date < before)
+        .order_by(Video.upload_date.desc(), Video.id.desc())
+        .limit(24)
+    ).all()
+
+
+def flush_views(conn, rng, rows, batch=50):
+    # Un flush de ViewBuffer : une transaction, un insert groupé et un update par vidéo
+    ids = [rng.randint(1, rows) for _ in range(batch)]
+    conn.execute(insert(VideoView.__table__), [
+        {'video_id': video_id, 'fingerprint': f"{rng.getrandbits(64):016x}"} for video_id in ids
+    ])
+    for video_id in set(ids):
+        conn.execute(update(Video.__table__).where(Video.id == video_id).values(views=Video.views + 1))
+
+
+def run(engine, seconds, readers, writers, rows):
+    seed(engine, rows)
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(kind, seed_value):
+        rng = random.Random(seed_value)
+        own = []
+        failed = 0
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    if kind == 'read':
+                        read_page(conn, rng, rows)
+                    else:
+                        flush_views(conn, rng, rows)
+                own.append(time.perf_counter() - t0)
+            except OperationalError:
+                # "database is locked" une fois busy_timeout écoulé
+                failed += 1
+        with lock:
+            latencies[kind].extend(own)
+            errors[kind] += failed
+
+    threads = [threading.Thread(target=worker, args=('read', i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write', 1000 + i)) for i in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with engine.begin() as conn:
+        conn.execute(delete(VideoView.__table__))
+    engine.dispose()
+    return {
+        kind: dict(summarize(latencies[kind], elapsed), errors=errors[kind])
+        for kind in ('read', 'write')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--postgres-url', default=os.environ.get('BENCH_POSTGRES_URL'))
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_db_')
+    pool = {'pool_size': args.readers + args.writers, 'max_overflow': 0}
+    engines = {}
+
+    # Avant : pysqlite par défaut (journal DELETE, attente du verrou de 5 s)
+    engines['sqlite_default'] = create_engine(f"sqlite:///{work_dir}/default.db", **pool)
+
+    # Après : WAL, synchronous=NORMAL, busy_timeout et mmap
+    engines['sqlite_wal'] = create_engine(f"sqlite:///{work_dir}/wal.db", **pool)
+    install_sqlite_pragmas(engines['sqlite_wal'], SQLITE_PRAGMAS)
+
+    if args.postgres_url:
+        engines['postgres'] = create_engine(args.postgres_url, pool_pre_ping=True, **pool)
+
+    results = {'readers': args.readers, 'writers': args.writers, 'rows': args.rows, 'engines': {}}
+    for name, engine in engines.items():
+        results['engines'][name] = run(engine, args.seconds, args.readers, args.writers, args.rows)
+
+    for name in os.listdir(work_dir):
+        os.remove(os.path.join(work_dir, name))
+    os.rmdir(work_dir)
+    emit('database', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
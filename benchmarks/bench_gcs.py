@@ -0,0 +1,103 @@
+"""
+Transferts GCS (gcs_transfer) contre l'ancien upload/téléchargement mono-flux
+avec un storage.Client neuf par appel, sur un émulateur GCS local :
+
+    gcp-storage-emulator start --port=9023 --in-memory
+    # ou : docker run -p 4443:4443 fsouza/fake-gcs-server -scheme http
+    STORAGE_EMULATOR_HOST=http://localhost:9023 \\
+        python -m benchmarks.bench_gcs --size-mb 256 --chunk-mb 8,32 --concurrency 4,8
+
+Un émulateur ne reproduit ni la latence ni le débit par connexion de GCS :
+les écarts mesurés ici sous-estiment en général le gain réel.
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+
+from benchmarks.common import emit
+from google.cloud import storage
+import gcs_transfer
+
+
+def sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def baseline_upload(path, bucket_name, blob_name, project):
+    storage.Client(project=project).bucket(bucket_name).blob(blob_name).upload_from_filename(path)
+
+
+def baseline_download(bucket_name, blob_name, path, project):
+    storage.Client(project=project).bucket(bucket_name).blob(blob_name).download_to_filename(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--chunk-mb', default='8,32')
+    parser.add_argument('--concurrency', default='4,8')
+    parser.add_argument('--bucket', default='zedtube-bench')
+    parser.add_argument('--project', default='zedtube-bench')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    if not os.environ.get('STORAGE_EMULATOR_HOST'):
+        parser.error('STORAGE_EMULATOR_HOST doit pointer vers un émulateur GCS local')
+
+    client = gcs_transfer.get_storage_client(args.project)
+    if client.lookup_bucket(args.bucket) is None:
+        client.create_bucket(args.bucket)
+
+    work_dir = tempfile.mkdtemp(prefix='bench_gcs_')
+    source = os.path.join(work_dir, 'source.bin')
+    with open(source, 'wb') as f:
+        for _ in range(args.size_mb):
+            f.write(os.urandom(1024 * 1024))
+    expected = sha256(source)
+    size = args.size_mb * 1024 * 1024
+    target = os.path.join(work_dir, 'downloaded.bin')
+
+    def mb_per_s(seconds):
+        return round(size / seconds / 1024 / 1024, 1)
+
+    results = {'size_mb': args.size_mb, 'runs': []}
+    upload_s = timed(baseline_upload, source, args.bucket, 'baseline.bin', args.project)
+    download_s = timed(baseline_download, args.bucket, 'baseline.bin', target, args.project)
+    assert sha256(target) == expected
+    results['baseline'] = {'upload_mb_s': mb_per_s(upload_s), 'download_mb_s': mb_per_s(download_s)}
+
+    for chunk_mb in [int(c) for c in args.chunk_mb.split(',')]:
+        for concurrency in [int(c) for c in args.concurrency.split(',')]:
+            blob_name = f"parallel-{chunk_mb}-{concurrency}.bin"
+            options = {'chunk_size': chunk_mb * 1024 * 1024, 'concurrency': concurrency, 'client': client}
+            upload_s = timed(gcs_transfer.upload_file, source, args.bucket, blob_name, **options)
+            os.remove(target)
+            download_s = timed(gcs_transfer.download_file, args.bucket, blob_name, target, **options)
+            assert sha256(target) == expected
+            results['runs'].append({
+                'chunk_mb': chunk_mb,
+                'concurrency': concurrency,
+                'upload_mb_s': mb_per_s(upload_s),
+                'download_mb_s': mb_per_s(download_s),
+            })
+
+    for name in os.listdir(work_dir):
+        os.remove(os.path.join(work_dir, name))
+    os.rmdir(work_dir)
+    emit('gcs_transfer', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
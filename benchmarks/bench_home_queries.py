@@ -0,0 +1,93 @@
+"""
+Nombre de requêtes SQL de la page d'accueil selon la taille de la bibliothèque.
+Le nombre doit rester constant quel que soit le nombre de dossiers/vidéos
+(code de sortie 1 sinon).
+
+    python -m benchmarks.bench_home_queries
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmp, 'bench.db')}")
+os.environ.setdefault('CELERY_BROKER_URL', 'memory://')
+os.environ.setdefault('CELERY_RESULT_BACKEND', 'cache+memory://')
+
+from benchmarks.common import emit
+from sqlalchemy import event
+from app import app, cache
+from models import db, User, Folder, Video
+
+SIZES = [(1, 1), (10, 5), (50, 20), (200, 10)]
+
+
+def seed(folders, videos_per_folder):
+    db.drop_all()
+    db.create_all()
+    user = User(username='bench', can_upload=True, is_admin=True)
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.flush()
+    for i in range(folders):
+        folder = Folder(name=f"Dossier {i}", user_id=user.id, is_public=i % 2 == 0)
+        db.session.add(folder)
+        db.session.flush()
+        db.session.add_all([
+            Video(filename=f"f{i}_v{j}.mp4", original_filename=f"v{j}.mp4", user_id=user.id, folder_id=folder.id)
+            for j in range(videos_per_folder)
+        ])
+    db.session.commit()
+
+
+def count_home_queries(client):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        started = time.perf_counter()
+        response = client.get('/')
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200
+    return len(statements), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    results = []
+    for folders, videos_per_folder in SIZES:
+        with app.app_context():
+            seed(folders, videos_per_folder)
+        # Base peuplée sans passer par les routes : les fragments du tour précédent sont périmés
+        cache.clear()
+        client = app.test_client()
+        client.post('/login', data={'username': 'bench', 'password': 'benchmark'})
+        queries, elapsed = count_home_queries(client)
+        results.append({
+            'folders': folders,
+            'videos_per_folder': videos_per_folder,
+            'queries': queries,
+            'render_ms': round(elapsed * 1000, 2),
+        })
+
+    emit('home_queries', results, args.output)
+    if len({r['queries'] for r in results}) != 1:
+        print('Le nombre de requêtes dépend de la taille de la bibliothèque', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
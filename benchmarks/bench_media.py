@@ -0,0 +1,128 @@
+"""
+Débit de la livraison vidéo (media.send_media) sur un gros fichier local, en
+mode direct et en mode X-Accel-Redirect derrière un proxy simulé
+(tests/accel_proxy.py, qui joue le rôle de la location nginx `internal`). Pour
+chaque mode, worker_ms mesure le temps pendant lequel la route Flask occupe un
+worker. Le comportement (en-têtes, plages, 304) est vérifié par
+tests/test_media_delivery.py.
+
+    python -m benchmarks.bench_media --size-mb 1024 --output media.json
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import emit, measure, summarize
+from flask import Flask, send_from_directory
+from werkzeug.test import Client
+from media import send_media
+from tests.accel_proxy import MockAccelProxy, ACCEL_PREFIX
+
+
+def create_file(path, size_mb, sparse):
+    with open(path, 'wb') as f:
+        if sparse:
+            f.truncate(size_mb * 1024 * 1024)
+            return
+        block = os.urandom(8 * 1024 * 1024)
+        for _ in range(0, size_mb, 8):
+            f.write(block)
+
+
+def make_app(directory, filename, delivery='direct'):
+    app = Flask(__name__)
+    app.config['UPLOAD_FOLDER'] = directory
+    app.config['MEDIA_DELIVERY'] = delivery
+    app.config['MEDIA_ACCEL_PREFIX'] = ACCEL_PREFIX
+
+    @app.route('/media')
+    def media():
+        return send_media(os.path.join(directory, filename), mimetype='video/mp4')
+
+    @app.route('/baseline')
+    def baseline():
+        return send_from_directory(directory, filename)
+
+    return app
+
+
+def drain(response):
+    total = 0
+    for chunk in response.response:
+        total += len(chunk)
+    response.close()
+    return total
+
+
+def bench_full(client, url, size, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        assert drain(client.get(url, buffered=False)) == size
+    elapsed = time.perf_counter() - started
+    return {'mb_per_s': round(size * repeat / elapsed / 1024 / 1024, 1)}
+
+
+def bench_seeks(client, url, size, iterations, span, ranges=1):
+    rng = random.Random(42)
+
+    def request_ranges():
+        specs = []
+        for _ in range(ranges):
+            start = rng.randrange(0, size - span)
+            specs.append(f"{start}-{start + span - 1}")
+        response = client.get(url, headers={'Range': 'bytes=' + ','.join(specs)}, buffered=False)
+        drain(response)
+        assert response.status_code == 206
+
+    return summarize(*measure(request_ranges, iterations))
+
+
+def bench_conditional(client, url, iterations):
+    etag = client.head(url).headers['ETag']
+
+    def revalidate():
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+    return summarize(*measure(revalidate, iterations))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size-mb', type=int, default=1024)
+    parser.add_argument('--sparse', action='store_true', help='Fichier creux (mesure le coût Python, pas le disque)')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = 'large.mp4'
+        create_file(os.path.join(directory, filename), args.size_mb, args.sparse)
+        size = os.path.getsize(os.path.join(directory, filename))
+        direct = MockAccelProxy(make_app(directory, filename), directory)
+        offload = MockAccelProxy(make_app(directory, filename, 'x-accel'), directory)
+        client = Client(direct)
+        accel_client = Client(offload)
+
+        results = {'size_mb': args.size_mb, 'sparse': args.sparse}
+        for name, proxy, url in (('media', direct, '/media'), ('baseline', direct, '/baseline'),
+                                 ('x_accel', offload, '/media')):
+            proxy.worker_times.clear()
+            results[name] = {
+                'full_download': bench_full(Client(proxy), url, size, args.repeat),
+                'seek_1mb': bench_seeks(Client(proxy), url, size, args.iterations, 1024 * 1024),
+                'seek_64kb': bench_seeks(Client(proxy), url, size, args.iterations, 64 * 1024),
+                'worker_ms': summarize(proxy.worker_times),
+            }
+        results['media']['multi_range_4x64kb'] = bench_seeks(client, '/media', size, args.iterations, 64 * 1024, ranges=4)
+        results['media']['revalidate_304'] = bench_conditional(client, '/media', args.iterations)
+        results['x_accel']['revalidate_304'] = bench_conditional(accel_client, '/media', args.iterations)
+
+    emit('media_delivery', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
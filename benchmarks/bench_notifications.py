@@ -0,0 +1,104 @@
+"""
+notifications.DiscordNotifier contre un webhook Discord simulé en local :
+lent (latency), limité en débit (429 + Retry-After, quota par fenêtre) et
+parfois en erreur 5xx.
+
+Mesure le coût de send_discord_log sur le chemin de la requête, comparé à
+l'ancien requests.post synchrone, le nombre d'appels HTTP pour une rafale
+d'événements et les messages abandonnés ou perdus.
+
+    python -m benchmarks.bench_notifications --events 500 --output notifications.json
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from benchmarks.common import emit, measure, summarize
+from notifications import DiscordNotifier
+
+
+class WebhookStub(BaseHTTPRequestHandler):
+    latency = 0.2
+    quota = 5          # requêtes par fenêtre, comme les webhooks Discord
+    window = 2.0
+    error_rate = 0.05
+    lock = threading.Lock()
+    requests_seen = []
+    lines_received = 0
+    rng = random.Random(42)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.latency)
+        cls = type(self)
+        with cls.lock:
+            now = time.monotonic()
+            cls.requests_seen = [t for t in cls.requests_seen if now - t < cls.window]
+            if len(cls.requests_seen) >= cls.quota:
+                reset_after = cls.window - (now - cls.requests_seen[0])
+                return self._reply(429, {'retry_after': round(reset_after, 3)}, {'Retry-After': f"{reset_after:.3f}"})
+            cls.requests_seen.append(now)
+            if cls.rng.random() < cls.error_rate:
+                return self._reply(502, {})
+            cls.lines_received += body['content'].count('\n') + 1
+            remaining = cls.quota - len(cls.requests_seen)
+            reset_after = cls.window - (now - cls.requests_seen[0])
+        self._reply(204, None, {'X-RateLimit-Remaining': str(remaining), 'X-RateLimit-Reset-After': f"{reset_after:.3f}"})
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--queue-size', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.2, help='latence du webhook simulé (s)')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    WebhookStub.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), WebhookStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/webhook"
+
+    # Ancien comportement : un POST synchrone par événement, sur le chemin de la requête
+    sync = summarize(*measure(lambda: requests.post(url, json={'content': 'upload'}), 5))
+
+    WebhookStub.lines_received = 0
+    WebhookStub.requests_seen = []
+    notifier = DiscordNotifier(url, max_queue=args.queue_size, coalesce_window=0.5)
+    counter = iter(range(args.events))
+    enqueue = summarize(*measure(lambda: notifier.send(f"📤 Nouvelle vidéo uploadée : video-{next(counter)}"), args.events))
+    started = time.perf_counter()
+    drained = notifier.flush(timeout=300)
+    stats = notifier.snapshot()
+    server.shutdown()
+
+    emit('notifications', {
+        'events': args.events,
+        'sync_post': sync,
+        'enqueue': enqueue,
+        'drained': drained,
+        'drain_seconds': round(time.perf_counter() - started, 2),
+        'lines_received': WebhookStub.lines_received,
+        'notifier': stats,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Durée de utils.process_video et de l'extraction de miniature
+(thumbnails.generate_thumbnail) sur des vidéos synthétiques générées par les
+sources lavfi de ffmpeg (testsrc2 + sine), pour plusieurs définitions et
+formats sources :
+
+- mpeg4/mp2 en AVI : transcodage complet ;
+- h264/aac en MOV : simple remux ;
+- h264/mp2 en MKV : audio seul réencodé.
+
+    python -m benchmarks.bench_pipeline --durations 10,60 --sizes 640x360,1280x720,1920x1080 --output pipeline.json
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import ffmpeg
+
+from benchmarks.common import emit
+from thumbnails import generate_thumbnail
+from utils import process_video, probe_media, plan_conversion
+
+SOURCES = {
+    'mpeg4_avi': ('avi', {'vcodec': 'mpeg4', 'qscale': 3, 'acodec': 'mp2'}),
+    'h264_mov': ('mov', {'vcodec': 'libx264', 'preset': 'ultrafast', 'pix_fmt': 'yuv420p', 'acodec': 'aac'}),
+    'h264_mkv': ('mkv', {'vcodec': 'libx264', 'preset': 'ultrafast', 'pix_fmt': 'yuv420p', 'acodec': 'mp2'}),
+}
+
+
+def create_source(path, duration, size, fps, options):
+    video = ffmpeg.input(f"testsrc2=size={size}:rate={fps}", f='lavfi', t=duration)
+    audio = ffmpeg.input('sine=frequency=440:sample_rate=48000', f='lavfi', t=duration)
+    ffmpeg.output(video, audio, path, **options).overwrite_output().run(capture_stdout=True, capture_stderr=True)
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return round(time.perf_counter() - started, 3), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--durations', default='10,60', help='durées des vidéos synthétiques (s)')
+    parser.add_argument('--sizes', default='640x360,1280x720')
+    parser.add_argument('--sources', default=','.join(SOURCES))
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--threads', type=int, default=None, help='threads libx264 (défaut : ffmpeg décide)')
+    parser.add_argument('--thumbnails', type=int, default=5, help='extractions de miniature par vidéo')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    runs = []
+    try:
+        for duration in [int(d) for d in args.durations.split(',')]:
+            for size in args.sizes.split(','):
+                for source in args.sources.split(','):
+                    extension, options = SOURCES[source]
+                    input_path = os.path.join(work_dir, f"{source}_{size}_{duration}.{extension}")
+                    create_source(input_path, duration, size, args.fps, options)
+                    plan = plan_conversion(probe_media(input_path))
+
+                    output_dir = os.path.join(work_dir, 'out')
+                    os.makedirs(output_dir, exist_ok=True)
+                    process_s, result = timed(process_video, input_path, output_dir, True, args.threads, plan)
+
+                    thumb_path = os.path.join(work_dir, 'thumb.jpg')
+                    thumbnail_s = [timed(generate_thumbnail, input_path, thumb_path)[0] for _ in range(args.thumbnails)]
+
+                    runs.append({
+                        'source': source,
+                        'size': size,
+                        'duration_s': duration,
+                        'input_mb': round(os.path.getsize(input_path) / 1024 / 1024, 2),
+                        'conversion_path': plan['path'],
+                        'process_video_s': process_s,
+                        'speed_x': round(duration / process_s, 2) if result else None,
+                        'ok': result is not None,
+                        'thumbnail_s': min(thumbnail_s),
+                        'thumbnail_max_s': max(thumbnail_s),
+                    })
+                    shutil.rmtree(output_dir)
+                    os.remove(input_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    emit('pipeline', {'fps': args.fps, 'threads': args.threads, 'runs': runs}, args.output)
+
+
+if __name__ == '__main__':
+    main()
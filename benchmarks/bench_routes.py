@@ -0,0 +1,206 @@
+"""
+Charge HTTP sur les routes publiques : home, video_page, serve_video (requêtes
+Range comme un lecteur), serve_thumbnail et discord_embed, avec des clients
+concurrents sur un serveur local, après avoir peuplé une base temporaire de
+N utilisateurs, dossiers, vidéos et vues.
+
+    python -m benchmarks.bench_routes --users 50 --videos 5000 --requests 2000 --concurrency 16
+    CACHE_BACKEND=none python -m benchmarks.bench_routes --output routes-nocache.json
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_tmp = tempfile.mkdtemp(prefix='bench_routes_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmp, 'bench.db')}")
+os.environ.setdefault('CELERY_BROKER_URL', 'memory://')
+os.environ.setdefault('CELERY_RESULT_BACKEND', 'cache+memory://')
+
+import ffmpeg
+import requests
+from sqlalchemy import insert, update, bindparam
+from werkzeug.serving import make_server
+
+from benchmarks.common import emit, summarize
+from app import app, view_buffer, cache
+from models import db, User, Folder, Video, VideoView
+
+PASSWORD = 'benchmark'
+
+
+def create_media(directory):
+    """Une vidéo synthétique et sa miniature, partagées par toutes les vidéos (liens symboliques)."""
+    clip = os.path.join(directory, 'clip.mp4')
+    video = ffmpeg.input('testsrc2=size=1280x720:rate=30', f='lavfi', t=20)
+    audio = ffmpeg.input('sine=frequency=440:sample_rate=48000', f='lavfi', t=20)
+    (
+        ffmpeg
+        .output(video, audio, clip, vcodec='libx264', preset='ultrafast', pix_fmt='yuv420p',
+                acodec='aac', movflags='+faststart')
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    thumb = os.path.join(directory, 'clip_thumb.jpg')
+    ffmpeg.input(clip, ss=1).output(thumb, vframes=1).overwrite_output().run(capture_stdout=True, capture_stderr=True)
+    return clip, thumb
+
+
+def seed(upload_folder, users, folders_per_user, videos, views):
+    db.drop_all()
+    db.create_all()
+    clip, thumb = create_media(upload_folder)
+
+    admin = User(username='bench', can_upload=True, is_admin=True)
+    admin.set_password(PASSWORD)
+    db.session.add(admin)
+    db.session.flush()
+    db.session.execute(insert(User), [
+        {'username': f"user{i}", 'password_hash': 'x', 'can_upload': True} for i in range(users)
+    ])
+    user_ids = [admin.id] + [u.id for u in User.query.filter(User.id != admin.id)]
+    db.session.execute(insert(Folder), [
+        {'name': f"Dossier {u}-{i}", 'user_id': u, 'is_public': i % 2 == 0}
+        for u in user_ids for i in range(folders_per_user)
+    ])
+    folder_ids = [f.id for f in Folder.query.with_entities(Folder.id)]
+
+    rng = random.Random(42)
+    rows = []
+    for i in range(videos):
+        filename = f"v{i}.mp4"
+        os.symlink(clip, os.path.join(upload_folder, filename))
+        os.symlink(thumb, os.path.join(upload_folder, f"v{i}_thumb.jpg"))
+        # Un tiers des vidéos à la racine, le reste réparti dans les dossiers
+        rows.append({
+            'filename': filename,
+            'original_filename': filename,
+            'title': f"Vidéo {i}",
+            'user_id': rng.choice(user_ids),
+            'folder_id': rng.choice(folder_ids) if folder_ids and i % 3 else None,
+            'width': 1280,
+            'height': 720,
+            'is_converted': True,
+        })
+    db.session.execute(insert(Video), rows)
+    videos = Video.query.with_entities(Video.id, Video.filename).all()
+    video_ids = [video_id for video_id, _ in videos]
+
+    view_rows = [{'video_id': rng.choice(video_ids), 'fingerprint': f"{i:064x}"} for i in range(views)]
+    for start in range(0, len(view_rows), 10000):
+        db.session.execute(insert(VideoView), view_rows[start:start + 10000])
+    counts = {}
+    for row in view_rows:
+        counts[row['video_id']] = counts.get(row['video_id'], 0) + 1
+    db.session.execute(
+        update(Video.__table__).where(Video.id == bindparam('vid')).values(views=bindparam('views')),
+        [{'vid': video_id, 'views': count} for video_id, count in counts.items()]
+    )
+    db.session.commit()
+    return videos
+
+
+def drive(base_url, make_request, total, concurrency, login=False):
+    """total requêtes réparties sur concurrency clients (une session HTTP par client)."""
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def session():
+        s = getattr(local, 'session', None)
+        if s is None:
+            s = local.session = requests.Session()
+            s.headers['User-Agent'] = f"bench-{threading.get_ident()}"
+            if login:
+                s.post(f"{base_url}/login", data={'username': 'bench', 'password': PASSWORD})
+        return s
+
+    def hit(i):
+        s = session()
+        path, headers = make_request(i)
+        t0 = time.perf_counter()
+        response = s.get(f"{base_url}{path}", headers=headers)
+        _ = response.content
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(hit, range(total)))
+    result = summarize(latencies, time.perf_counter() - started)
+    result['status'] = {str(code): count for code, count in sorted(statuses.items())}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--folders-per-user', type=int, default=4)
+    parser.add_argument('--videos', type=int, default=2000)
+    parser.add_argument('--views', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=1000, help='requêtes par scénario')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--range-kb', type=int, default=1024, help='taille des requêtes Range sur serve_video')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    upload_folder = os.path.join(_tmp, 'uploads')
+    os.makedirs(upload_folder, exist_ok=True)
+    app.config.update(UPLOAD_FOLDER=upload_folder, WTF_CSRF_ENABLED=False)
+
+    started = time.perf_counter()
+    with app.app_context():
+        videos = seed(upload_folder, args.users, args.folders_per_user, args.videos, args.views)
+    cache.clear()
+    seed_seconds = round(time.perf_counter() - started, 2)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    rng = random.Random(7)
+    clip_size = os.path.getsize(os.path.join(upload_folder, 'clip.mp4'))
+    range_size = args.range_kb * 1024
+
+    def video_range(i):
+        start = rng.randrange(0, max(1, clip_size - range_size))
+        return f"/video/{rng.choice(videos).filename}", {'Range': f"bytes={start}-{start + range_size - 1}"}
+
+    scenarios = {
+        'home_anonymous': (lambda i: ('/', {}), False),
+        'home_logged_in': (lambda i: ('/', {}), True),
+        'video_page': (lambda i: (f"/video/{rng.choice(videos).id}", {}), False),
+        'serve_video_range': (video_range, False),
+        'serve_thumbnail': (lambda i: (f"/thumbnail/{rng.choice(videos).filename}", {}), False),
+        'discord_embed': (lambda i: (f"/embed/{rng.choice(videos).id}", {}), False),
+    }
+
+    results = {
+        'users': args.users,
+        'folders': (args.users + 1) * args.folders_per_user,
+        'videos': args.videos,
+        'views': args.views,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'cache_backend': app.config['CACHE_BACKEND'],
+        'seed_seconds': seed_seconds,
+        'routes': {},
+    }
+    for name, (make_request, login) in scenarios.items():
+        results['routes'][name] = drive(base_url, make_request, args.requests, args.concurrency, login)
+
+    view_buffer.flush()
+    server.shutdown()
+    shutil.rmtree(_tmp, ignore_errors=True)
+    emit('routes', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Latence de la recherche (search.search_videos) sur l'index FTS5, comparée au
+parcours `LIKE '%x%'` sur les mêmes données, selon la taille de la bibliothèque.
+
+    python -m benchmarks.bench_search --videos 10000 100000 --iterations 200
+"""
+import argparse
+import os
+import random
+import tempfile
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmp, 'bench.db')}")
+os.environ.setdefault('CELERY_BROKER_URL', 'memory://')
+os.environ.setdefault('CELERY_RESULT_BACKEND', 'cache+memory://')
+
+from benchmarks.common import emit, measure, summarize
+from sqlalchemy import insert, or_
+from app import app
+from models import db, User, Folder, Video
+from search import install_search_index, search_videos
+
+# Vocabulaire à fréquences de Zipf : quelques mots fréquents, beaucoup de mots rares
+_rng = random.Random(7)
+WORDS = [''.join(_rng.choice('abcdefghijklmnopqrstuvwxyzéè') for _ in range(_rng.randint(4, 10))) for _ in range(5000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(WORDS))]
+QUERIES = {
+    'frequent': (WORDS[0], f"{WORDS[1]} {WORDS[2]}"),
+    'rare': (WORDS[2000], f"{WORDS[300]} {WORDS[400]}", WORDS[1500][:3]),
+    'absent': ('introuvable', 'zzzz'),
+}
+
+
+class Viewer:
+    is_authenticated = True
+    is_admin = False
+    id = 1
+
+
+def seed(videos, batch=5000):
+    db.drop_all()
+    db.create_all()
+    with db.engine.begin() as connection:
+        install_search_index(connection)
+    user = User(username='bench', can_upload=True)
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.flush()
+    folders = [Folder(name=f"Dossier {i}", user_id=user.id, is_public=i % 2 == 0) for i in range(20)]
+    db.session.add_all(folders)
+    db.session.flush()
+    rng = random.Random(42)
+    for start in range(0, videos, batch):
+        db.session.execute(insert(Video), [
+            {
+                'filename': f"v{i}.mp4",
+                'original_filename': f"{'_'.join(rng.choices(WORDS, WEIGHTS, k=2))}_{i}.mp4",
+                'title': ' '.join(rng.choices(WORDS, WEIGHTS, k=4)),
+                'user_id': user.id,
+                'folder_id': rng.choice(folders).id if i % 3 else None,
+            }
+            for i in range(start, min(start + batch, videos))
+        ])
+    db.session.commit()
+
+
+def like_search(query, limit=24):
+    """Ce que ferait une recherche naïve : parcours complet de la table."""
+    terms = query.split()
+    videos = Video.query.filter(*(or_(Video.title.icontains(term), Video.original_filename.icontains(term))
+                                  for term in terms))
+    return videos.order_by(Video.upload_date.desc(), Video.id.desc()).limit(limit).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--videos', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    results = []
+    for videos in args.videos:
+        result = {'videos': videos}
+        with app.app_context():
+            seed(videos)
+            for kind, queries in QUERIES.items():
+                fts = iter(queries * args.iterations)
+                like = iter(queries * args.iterations)
+                result[kind] = {
+                    'fts': summarize(*measure(lambda: search_videos(next(fts), Viewer()), args.iterations)),
+                    'like': summarize(*measure(lambda: like_search(next(like)), args.iterations)),
+                }
+                print(f"{videos} vidéos, termes {kind} : FTS p50 {result[kind]['fts']['p50_ms']} ms, "
+                      f"LIKE p50 {result[kind]['like']['p50_ms']} ms")
+        results.append(result)
+
+    emit('search', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Transcodage segmenté (segmented.transcode_segmented) contre un encodage
+ffmpeg unique, sur une vidéo synthétique générée par ffmpeg (testsrc2 + sine).
+
+    python -m benchmarks.bench_segmented --duration 300 --workers 1,2,4,8 --output segmented.json
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import ffmpeg
+
+from benchmarks.common import emit
+from segmented import transcode_segmented, _stream_duration
+
+
+def create_source(path, duration, size, fps, gop):
+    video = ffmpeg.input(f"testsrc2=size={size}:rate={fps}", f='lavfi', t=duration)
+    audio = ffmpeg.input('sine=frequency=440:sample_rate=48000', f='lavfi', t=duration)
+    (
+        ffmpeg
+        .output(video, audio, path, vcodec='mpeg4', g=gop, qscale=3, acodec='mp2')
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+
+
+def single_pass(input_path, output_path, preset):
+    (
+        ffmpeg
+        .input(input_path)
+        .output(output_path, vcodec='libx264', pix_fmt='yuv420p', preset=preset, acodec='aac', movflags='+faststart')
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=int, default=180, help='durée de la vidéo synthétique (s)')
+    parser.add_argument('--size', default='1280x720')
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--workers', default=None, help='liste de nombres de workers (défaut : 1, 2, 4... jusqu\'au nombre de coeurs)')
+    parser.add_argument('--preset', default='veryfast')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(',')]
+    else:
+        worker_counts = sorted({min(2 ** i, cpus) for i in range(cpus.bit_length() + 1)})
+
+    work_dir = tempfile.mkdtemp(prefix='bench_segmented_')
+    try:
+        source = os.path.join(work_dir, 'source.avi')
+        create_source(source, args.duration, args.size, args.fps, gop=args.fps * 2)
+
+        baseline, _ = timed(single_pass, source, os.path.join(work_dir, 'single.mp4'), args.preset)
+        results = {
+            'duration_s': args.duration,
+            'size': args.size,
+            'single_pass_s': round(baseline, 2),
+            'segmented': [],
+        }
+        for workers in worker_counts:
+            output = os.path.join(work_dir, f"segmented_{workers}.mp4")
+            elapsed, segments = timed(transcode_segmented, source, output, args.duration, workers,
+                                      fps=args.fps, preset=args.preset)
+            results['segmented'].append({
+                'workers': workers,
+                'segments': segments,
+                'seconds': round(elapsed, 2),
+                'speedup': round(baseline / elapsed, 2),
+                'output_duration_s': round(_stream_duration(output), 3),
+            })
+            os.remove(output)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    emit('segmented', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
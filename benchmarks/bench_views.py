@@ -0,0 +1,110 @@
+"""
+Débit de la page vidéo : écriture de la vue dans la requête (avant)
+contre tampon write-behind view_counter.ViewBuffer (après).
+
+    python -m benchmarks.bench_views --requests 2000 --concurrency 16
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from benchmarks.common import emit, summarize
+from flask import Flask, request
+from werkzeug.serving import make_server
+from models import db, User, Video, VideoView
+from view_counter import ViewBuffer
+
+
+def make_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    db.init_app(app)
+    buffer = ViewBuffer(app, flush_interval=1.0)
+
+    def fingerprint():
+        return hashlib.sha256(request.headers.get('User-Agent', '').encode()).hexdigest()
+
+    @app.route('/inline/<int:video_id>')
+    def inline(video_id):
+        # Ancienne implémentation de video_page
+        video = db.session.get(Video, video_id)
+        existing_view = VideoView.query.filter_by(video_id=video_id, fingerprint=fingerprint()).first()
+        if not existing_view:
+            video.views += 1
+            db.session.add(VideoView(video_id=video_id, fingerprint=fingerprint()))
+            db.session.commit()
+        return str(video.views)
+
+    @app.route('/buffered/<int:video_id>')
+    def buffered(video_id):
+        video = db.session.get(Video, video_id)
+        buffer.record(video_id, fingerprint())
+        return str(video.views + buffer.pending_count(video_id))
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Video(filename='bench.mp4', original_filename='bench.mp4', user_id=user.id, views=0))
+        db.session.commit()
+    return app, buffer
+
+
+def drive(base_url, path, total, concurrency):
+    local = threading.local()
+    latencies = []
+    errors = 0
+
+    def hit(i):
+        nonlocal errors
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        t0 = time.perf_counter()
+        response = session.get(f"{base_url}{path}", headers={'User-Agent': f"client-{path}-{i}"})
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code != 200:
+            errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(hit, range(total)))
+    result = summarize(latencies, time.perf_counter() - started)
+    result['errors'] = errors
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app, buffer = make_app(os.path.join(directory, 'bench.db'))
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        results = {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'before_inline_write': drive(base_url, '/inline/1', args.requests, args.concurrency),
+            'after_write_behind': drive(base_url, '/buffered/1', args.requests, args.concurrency),
+        }
+        started = time.perf_counter()
+        results['final_flush'] = {'rows': buffer.flush(), 'seconds': round(time.perf_counter() - started, 3)}
+        server.shutdown()
+
+    emit('view_counter', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+transcode_watcher.TranscodeWatcher contre un faux service Transcoder :
+nombre d'appels get_job par rapport à une interrogation à intervalle fixe,
+jobs longs suivis jusqu'au bout, erreurs passagères de l'API.
+
+Les durées sont réduites (1 seconde simulée = time_scale secondes réelles).
+
+    python -m benchmarks.bench_watcher --jobs 200 --output watcher.json
+"""
+import argparse
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import emit
+from transcode_watcher import TranscodeWatcher
+
+
+class FakeTranscoderService:
+    """Client asynchrone minimal : get_job(name=...) renvoie un objet avec .state (et .error)."""
+
+    def __init__(self, jobs, error_rate=0.0, seed=42):
+        self.jobs = jobs  # nom -> (durée de la file d'attente, durée d'exécution, échec ?)
+        self.started = time.monotonic()
+        self.calls = 0
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+    async def get_job(self, name):
+        self.calls += 1
+        if self.rng.random() < self.error_rate:
+            raise ConnectionError('503 Service Unavailable')
+        queued, running, fails = self.jobs[name]
+        elapsed = time.monotonic() - self.started
+        if elapsed < queued:
+            state = 'PENDING'
+        elif elapsed < queued + running:
+            state = 'RUNNING'
+        else:
+            state = 'FAILED' if fails else 'SUCCEEDED'
+        error = SimpleNamespace(message='Input file is corrupted') if state == 'FAILED' else None
+        return SimpleNamespace(state=SimpleNamespace(name=state), error=error)
+
+
+def make_jobs(count, time_scale, seed=42):
+    rng = random.Random(seed)
+    jobs = {}
+    for i in range(count):
+        # Durées simulées : 10 s à 40 min, dont certains jobs bien au-delà des 5 minutes de l'ancienne limite
+        running = rng.uniform(10, 2400) * time_scale
+        jobs[f"projects/p/locations/l/jobs/{i}"] = (rng.uniform(0, 30) * time_scale, running, rng.random() < 0.05)
+    return jobs
+
+
+def run(jobs, time_scale, error_rate):
+    service = FakeTranscoderService(jobs, error_rate)
+    done = threading.Event()
+    results = {}
+    lock = threading.Lock()
+
+    def record(job_name, job, context):
+        with lock:
+            results[job_name] = (job.state.name, time.monotonic() - service.started)
+            if len(results) == len(jobs):
+                done.set()
+
+    watcher = TranscodeWatcher(lambda: service, on_complete=record, on_failure=record,
+                               initial_delay=5 * time_scale, max_delay=60 * time_scale)
+    for name in jobs:
+        watcher.watch(name, context=name)
+    done.wait()
+    watcher.stop()
+
+    # Latence de détection : temps entre la fin réelle du job et l'appel du callback
+    lags = [finished - (jobs[name][0] + jobs[name][1]) for name, (_, finished) in results.items()]
+    fixed_polls = sum(int((queued + running) / (10 * time_scale)) + 1 for queued, running, _ in jobs.values())
+    return {
+        'jobs': len(jobs),
+        'succeeded': sum(1 for state, _ in results.values() if state == 'SUCCEEDED'),
+        'failed': sum(1 for state, _ in results.values() if state == 'FAILED'),
+        'over_5_minutes': sum(1 for queued, running, _ in jobs.values() if (queued + running) / time_scale > 300),
+        'get_job_calls': service.calls,
+        'fixed_10s_polling_calls': fixed_polls,
+        'max_detection_lag_s': round(max(lags) / time_scale, 1),
+        'mean_detection_lag_s': round(sum(lags) / len(lags) / time_scale, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--time-scale', type=float, default=0.002, help='secondes réelles par seconde simulée')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='proportion d\'appels get_job en erreur')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    jobs = make_jobs(args.jobs, args.time_scale)
+    results = run(jobs, args.time_scale, args.error_rate)
+    assert results['succeeded'] + results['failed'] == args.jobs
+    emit('transcode_watcher', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed=None):
+    """Statistiques de latence (en millisecondes) d'une série de mesures en secondes."""
+    ms = [l * 1000 for l in latencies]
+    summary = {
+        'count': len(ms),
+        'mean_ms': round(statistics.fmean(ms), 3) if ms else None,
+        'p50_ms': round(percentile(ms, 50), 3) if ms else None,
+        'p90_ms': round(percentile(ms, 90), 3) if ms else None,
+        'p99_ms': round(percentile(ms, 99), 3) if ms else None,
+        'max_ms': round(max(ms), 3) if ms else None,
+    }
+    if elapsed:
+        summary['rps'] = round(len(ms) / elapsed, 2)
+    return summary
+
+
+def measure(fn, iterations):
+    """Exécute fn `iterations` fois et retourne (latences, durée totale)."""
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - started
+
+
+def emit(name, results, output=None):
+    """Écrit les résultats en JSON (stdout ou fichier) pour comparaison entre commits."""
+    report = {
+        'benchmark': name,
+        'revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    data = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(data + '\n')
+    else:
+        print(data)
+    return report
@@ -0,0 +1,91 @@
+import os
+import uuid
+import hashlib
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from models import db, MediaBlob
+from chunked_upload import PARTIAL_DIR
+from storage_layout import blob_path, absolute
+
+READ_SIZE = 1024 * 1024
+
+
+def save_stream(stream, upload_folder: str):
+    """
+    Écrit un flux d'upload dans un fichier temporaire du dossier d'upload en
+    calculant son SHA-256 au passage. Retourne (chemin temporaire, hash, taille).
+    """
+    directory = os.path.join(upload_folder, PARTIAL_DIR)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f"{uuid.uuid4().hex}.upload")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            while True:
+                block = stream.read(READ_SIZE)
+                if not block:
+                    break
+                hasher.update(block)
+                f.write(block)
+                size += len(block)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, hasher.hexdigest(), size
+
+
+def hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _acquire(blob):
+    # Incrément en SQL : deux uploads simultanés du même fichier ne perdent pas de référence
+    db.session.execute(
+        update(MediaBlob).where(MediaBlob.id == blob.id).values(ref_count=MediaBlob.ref_count + 1)
+    )
+    db.session.refresh(blob)
+    return blob
+
+
+def ingest_blob(upload_folder: str, tmp_path: str, digest: str, extension: str):
+    """
+    Range le fichier temporaire sous son hash. Si le contenu est déjà connu, le
+    doublon est supprimé et le blob existant est réutilisé.
+    Retourne (blob, created) ; la transaction reste à valider par l'appelant.
+    """
+    blob = MediaBlob.query.filter_by(sha256=digest).first()
+    if blob is not None:
+        os.remove(tmp_path)
+        return _acquire(blob), False
+
+    size = os.path.getsize(tmp_path)
+    filename = blob_path(digest, extension)
+    os.replace(tmp_path, absolute(upload_folder, filename, create=True))
+    blob = MediaBlob(sha256=digest, size=size, filename=filename, ref_count=1)
+    try:
+        with db.session.begin_nested():
+            db.session.add(blob)
+    except IntegrityError:
+        # Même contenu enregistré entre-temps par une autre requête (même fichier, déjà en place)
+        return _acquire(MediaBlob.query.filter_by(sha256=digest).one()), False
+    return blob, True
+
+
+def release_blob(blob) -> bool:
+    """
+    Retire une référence au blob. Retourne True si c'était la dernière : la
+    ligne est supprimée et l'appelant doit effacer les fichiers.
+    """
+    db.session.execute(
+        update(MediaBlob).where(MediaBlob.id == blob.id).values(ref_count=MediaBlob.ref_count - 1)
+    )
+    db.session.refresh(blob)
+    if blob.ref_count > 0:
+        return False
+    db.session.delete(blob)
+    return True
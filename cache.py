@@ -0,0 +1,176 @@
+import time
+import pickle
+import threading
+from collections import OrderedDict
+
+# Étiquettes d'invalidation
+FOLDERS_TAG = 'folders'
+
+
+def listing_tag(folder_id=None) -> str:
+    """Étiquette des listes de vidéos d'un dossier (ou de la racine)."""
+    return f"videos:{folder_id or 'root'}"
+
+
+class Cache:
+    """
+    Cache clé/valeur avec durée de vie et invalidation par étiquettes.
+
+    Chaque entrée est rangée sous sa clé et la version courante de ses
+    étiquettes : invalidate(tag) incrémente la version, les entrées
+    concernées ne sont plus jamais lues et disparaissent par LRU ou TTL.
+    """
+
+    def __init__(self, default_ttl=30):
+        self.default_ttl = default_ttl
+
+    def get_or_set(self, key, compute, tags=(), ttl=None):
+        versioned = self._versioned_key(key, tags)
+        value = self._get(versioned)
+        if value is None:
+            value = compute()
+            self._set(versioned, value, ttl or self.default_ttl)
+        return value
+
+    def _versioned_key(self, key, tags):
+        versions = self._versions(tags)
+        return f"{key}|" + '.'.join(f"{tag}={version}" for tag, version in zip(tags, versions))
+
+    def invalidate(self, *tags):
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Vide tout le cache. Les routes invalident par étiquettes ; clear() sert
+        après une écriture qui les contourne (peuplement direct de la base par un
+        script, restauration, tests et benchmarks).
+        """
+        raise NotImplementedError
+
+    def _versions(self, tags):
+        raise NotImplementedError
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value, ttl):
+        raise NotImplementedError
+
+
+class NullCache(Cache):
+    """Cache désactivé (CACHE_BACKEND='none')."""
+
+    def get_or_set(self, key, compute, tags=(), ttl=None):
+        return compute()
+
+    def invalidate(self, *tags):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryCache(Cache):
+    """Cache du processus : LRU borné en nombre d'entrées et en octets (taille sérialisée)."""
+
+    def __init__(self, default_ttl=30, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._tag_versions = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+
+    def _versions(self, tags):
+        with self._lock:
+            return [self._tag_versions.get(tag, 0) for tag in tags]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value, ttl):
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.size -= size
+
+
+class RedisCache(Cache):
+    """
+    Cache partagé entre processus (web et workers) : une invalidation faite
+    par un worker est vue par tous. La borne mémoire et l'éviction LRU sont
+    celles de Redis (maxmemory + maxmemory-policy allkeys-lru).
+    """
+    PREFIX = 'zedtube:cache:'
+
+    def __init__(self, redis_url='redis://localhost:6379/0', default_ttl=30):
+        super().__init__(default_ttl)
+        import redis
+        self.redis = redis.Redis.from_url(redis_url)
+
+    def invalidate(self, *tags):
+        pipe = self.redis.pipeline()
+        for tag in tags:
+            pipe.incr(f"{self.PREFIX}tag:{tag}")
+        pipe.execute()
+
+    def clear(self):
+        # Parcours SCAN des seules clés du cache (la base Redis est partagée avec Celery et la progression)
+        keys = list(self.redis.scan_iter(match=f"{self.PREFIX}*", count=1000))
+        for start in range(0, len(keys), 1000):
+            self.redis.delete(*keys[start:start + 1000])
+
+    def _versions(self, tags):
+        if not tags:
+            return []
+        return [int(v or 0) for v in self.redis.mget([f"{self.PREFIX}tag:{tag}" for tag in tags])]
+
+    def _get(self, key):
+        data = self.redis.get(self.PREFIX + key)
+        return pickle.loads(data) if data is not None else None
+
+    def _set(self, key, value, ttl):
+        self.redis.set(self.PREFIX + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=int(ttl))
+
+
+def make_cache(app):
+    """Construit le cache selon CACHE_BACKEND ('memory', 'redis' ou 'none')."""
+    backend = app.config['CACHE_BACKEND']
+    if backend == 'none':
+        cache = NullCache()
+    elif backend == 'redis':
+        cache = RedisCache(app.config['REDIS_URL'], default_ttl=app.config['CACHE_TTL'])
+    else:
+        cache = MemoryCache(app.config['CACHE_TTL'], app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_MAX_BYTES'])
+    app.extensions['cache'] = cache
+    return cache
@@ -0,0 +1,88 @@
+import os
+import base64
+import fcntl
+import hashlib
+
+PARTIAL_DIR = '.partial'
+READ_SIZE = 64 * 1024
+CHECKSUM_ALGORITHMS = {'sha256', 'sha1', 'md5'}
+
+
+class ChunkError(Exception):
+    """Erreur d'envoi d'un morceau, avec le code HTTP à renvoyer."""
+
+    def __init__(self, message, status, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def partial_path(upload_folder: str, upload_id: str) -> str:
+    """Fichier partiel d'un envoi en cours (assemblé sur le même disque que les uploads)."""
+    directory = os.path.join(upload_folder, PARTIAL_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{upload_id}.part")
+
+
+def current_offset(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def parse_checksum(header):
+    """Analyse un en-tête 'Upload-Checksum: sha256 <base64>'."""
+    if not header:
+        return None
+    try:
+        algorithm, encoded = header.strip().split(' ', 1)
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except ValueError:
+        raise ChunkError('En-tête Upload-Checksum invalide', 400)
+    algorithm = algorithm.lower()
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ChunkError(f"Algorithme de somme de contrôle non supporté: {algorithm}", 400)
+    return algorithm, digest
+
+
+def append_chunk(path: str, offset: int, stream, total_size: int, checksum=None) -> int:
+    """
+    Écrit un morceau à la suite du fichier partiel en le lisant par blocs depuis
+    le flux de la requête. Le morceau est annulé si sa somme de contrôle ne
+    correspond pas. Retourne le nouvel offset.
+    """
+    with open(path, 'ab') as f:
+        # Un seul envoi à la fois par fichier (ex: deux onglets qui reprennent le même upload)
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            actual = os.fstat(f.fileno()).st_size
+            if actual != offset:
+                raise ChunkError('Offset invalide', 409, offset=actual)
+
+            hasher = hashlib.new(checksum[0]) if checksum else None
+            written = 0
+            while True:
+                block = stream.read(READ_SIZE)
+                if not block:
+                    break
+                written += len(block)
+                if offset + written > total_size:
+                    f.truncate(offset)
+                    raise ChunkError('Le morceau dépasse la taille annoncée', 413, offset=offset)
+                f.write(block)
+                if hasher:
+                    hasher.update(block)
+            f.flush()
+
+            if hasher and hasher.digest() != checksum[1]:
+                f.truncate(offset)
+                raise ChunkError('Somme de contrôle invalide', 460, offset=offset)
+            return offset + written
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def discard(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,53 @@
+from sqlalchemy import event
+
+# Réglages SQLite appliqués à chaque connexion : WAL laisse les lectures se
+# poursuivre pendant une écriture (flush des vues, fin de transcodage)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # sûr en WAL : seule la dernière transaction peut être perdue en cas de coupure
+    'busy_timeout': 5000,     # millisecondes d'attente du verrou d'écriture avant "database is locked"
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+def engine_options(config) -> dict:
+    """Pool de connexions pour un serveur (PostgreSQL) ; SQLite garde le pool par défaut."""
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,  # connexions coupées par le serveur détectées avant usage
+    }
+
+
+def sqlite_pragmas(config) -> dict:
+    pragmas = dict(SQLITE_PRAGMAS, busy_timeout=config['SQLITE_BUSY_TIMEOUT'], mmap_size=config['SQLITE_MMAP_SIZE'])
+    if not config['SQLITE_WAL']:
+        del pragmas['journal_mode']
+        del pragmas['synchronous']
+    return pragmas
+
+
+def install_sqlite_pragmas(engine, pragmas=SQLITE_PRAGMAS):
+    """Exécute les PRAGMA à l'ouverture de chaque connexion du moteur (sans effet hors SQLite)."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def init_database(app, db):
+    """db.init_app avec les options de pool, puis les PRAGMA sur chaque moteur SQLite."""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            install_sqlite_pragmas(engine, sqlite_pragmas(app.config))
@@ -0,0 +1,146 @@
+import time
+import threading
+from flask import has_app_context
+
+# Repli tant que l'historique est insuffisant : débit fixe, comme l'ancienne estimation
+DEFAULT_RATE_MB_PER_MINUTE = 50
+MIN_ESTIMATE_SECONDS = 10
+
+
+def job_features(size, metadata) -> list:
+    """
+    Variables explicatives d'un job : constante, taille (Mo) et volume de pixels
+    à traiter (durée × définition × images/s, en milliards de pixels).
+    """
+    metadata = metadata or {}
+    pixels = (metadata.get('duration') or 0) * (metadata.get('width') or 0) \
+        * (metadata.get('height') or 0) * (metadata.get('fps') or 0)
+    return [1.0, (size or 0) / (1024 * 1024), pixels / 1e9]
+
+
+def _solve(matrix, vector):
+    """Résout matrix · x = vector (Gauss avec pivot partiel) ; None si le système est singulier."""
+    n = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(n)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) < 1e-12:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(col + 1, n):
+            factor = rows[r][col] / rows[col][col]
+            for c in range(col, n + 1):
+                rows[r][c] -= factor * rows[col][c]
+    solution = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        solution[r] = (rows[r][n] - sum(rows[r][c] * solution[c] for c in range(r + 1, n))) / rows[r][r]
+    return solution
+
+
+class _Fit:
+    """Moindres carrés récursifs : sommes XᵀX et Xᵀy pondérées par l'ancienneté (decay)."""
+
+    def __init__(self, size):
+        self.xtx = [[0.0] * size for _ in range(size)]
+        self.xty = [0.0] * size
+        self.samples = 0
+        self.coefficients = None
+
+    def add(self, x, y, decay, ridge):
+        for i in range(len(x)):
+            self.xty[i] = decay * self.xty[i] + x[i] * y
+            for j in range(len(x)):
+                self.xtx[i][j] = decay * self.xtx[i][j] + x[i] * x[j]
+        self.samples += 1
+        # Régularisation (hors constante) : reste stable avec peu d'exemples ou des variables colinéaires
+        regularized = [[v + (ridge if i == j and i else 0.0) for j, v in enumerate(row)] for i, row in enumerate(self.xtx)]
+        self.coefficients = _solve(regularized, self.xty)
+
+    def predict(self, x):
+        return sum(c * v for c, v in zip(self.coefficients, x))
+
+
+class ProcessingTimeEstimator:
+    """
+    Durée de transcodage apprise sur les jobs terminés, par (backend, conversion).
+
+    Le modèle est linéaire en (taille, volume de pixels) et mis à jour
+    incrémentalement : refresh() ne lit que les jobs terminés depuis le
+    dernier appel, au plus une fois par refresh_interval secondes. Les jobs
+    récents pèsent davantage (decay) pour suivre les changements de machine
+    ou de réglages.
+    """
+
+    def __init__(self, min_samples=5, decay=0.98, ridge=1e-3, refresh_interval=60):
+        self.min_samples = min_samples
+        self.decay = decay
+        self.ridge = ridge
+        self.refresh_interval = refresh_interval
+        self._fits = {}
+        self._last_job_id = 0
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def observe(self, backend, conversion_path, features, seconds):
+        with self._lock:
+            for key in ((backend, conversion_path), (None, conversion_path)):
+                fit = self._fits.setdefault(key, _Fit(len(features)))
+                fit.add(features, seconds, self.decay, self.ridge)
+
+    def refresh(self, force=False):
+        """Intègre les jobs réussis depuis le dernier appel (nécessite un contexte d'application)."""
+        if not has_app_context():
+            # process_video exécuté dans le thread ffmpeg de LocalTranscodeBackend (suivi de la
+            # progression : le contexte Flask n'est pas transmis au thread) ou hors application
+            # (benchmarks) : l'estimation se fait avec l'historique déjà chargé
+            return
+        now = time.monotonic()
+        if not force and self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+            return
+        self._refreshed_at = now
+        from models import db, TranscodeJob
+
+        try:
+            jobs = (
+                TranscodeJob.query
+                .filter(TranscodeJob.id > self._last_job_id,
+                        TranscodeJob.state == TranscodeJob.SUCCEEDED,
+                        TranscodeJob.processing_seconds.isnot(None))
+                .order_by(TranscodeJob.id)
+                .all()
+            )
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erreur lors du chargement de l'historique de transcodage: {e}")
+            return
+        for job in jobs:
+            # Les jobs réessayés mesurent aussi les attentes entre essais : exclus
+            if job.attempts == 1:
+                self.observe(job.backend, job.conversion_path,
+                             job_features(job.input_size, job.input_metadata()), job.processing_seconds)
+            self._last_job_id = job.id
+
+    def predict(self, backend, conversion_path, features):
+        """(secondes, nombre d'exemples) ou None si l'historique est insuffisant."""
+        with self._lock:
+            for key in ((backend, conversion_path), (None, conversion_path)):
+                fit = self._fits.get(key)
+                if fit is not None and fit.samples >= self.min_samples and fit.coefficients is not None:
+                    return max(1.0, fit.predict(features)), fit.samples
+        return None
+
+    def estimate(self, size, metadata, backend, conversion_path) -> dict:
+        features = job_features(size, metadata)
+        prediction = self.predict(backend, conversion_path, features)
+        if prediction is not None:
+            seconds, samples = prediction
+            return {'estimated_seconds': round(seconds), 'source': 'history', 'samples': samples}
+        seconds = max(MIN_ESTIMATE_SECONDS, features[1] / DEFAULT_RATE_MB_PER_MINUTE * 60)
+        return {'estimated_seconds': round(seconds), 'source': 'default', 'samples': 0}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {f"{backend or '*'}:{path}": fit.samples for (backend, path), fit in self._fits.items()}
+
+
+processing_estimator = ProcessingTimeEstimator()
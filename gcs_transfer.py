@@ -0,0 +1,232 @@
+import io
+import os
+import uuid
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from google.cloud import storage
+from metrics import timed_stage
+
+# Réglages par défaut, ajustables par variables d'environnement
+CHUNK_SIZE = int(os.environ.get('GCS_TRANSFER_CHUNK_SIZE', 32 * 1024 * 1024))
+CONCURRENCY = int(os.environ.get('GCS_TRANSFER_CONCURRENCY', 8))
+MAX_COMPOSE_SOURCES = 32  # limite de l'API compose
+READ_SIZE = 1024 * 1024
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_storage_client(project=None, pool_size=CONCURRENCY) -> storage.Client:
+    """
+    Client GCS partagé par le processus : jetons d'authentification et
+    connexions HTTP (pool dimensionné pour les transferts parallèles) réutilisés.
+    """
+    with _clients_lock:
+        client = _clients.get(project)
+        if client is None:
+            client = storage.Client(project=project)
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            client._http.mount('https://', adapter)
+            client._http.mount('http://', adapter)
+            _clients[project] = client
+        return client
+
+
+class TransferProgress:
+    """Compteur d'octets transférés, partagé entre threads ; appelle callback(transférés, total)."""
+
+    def __init__(self, total, callback=None):
+        self.total = total
+        self.done = 0
+        self.callback = callback
+        self._lock = threading.Lock()
+
+    def add(self, count):
+        with self._lock:
+            self.done += count
+            done = self.done
+        if self.callback:
+            self.callback(done, self.total)
+
+
+def log_progress(label, step=10):
+    """Callback de progression qui affiche un pourcentage tous les `step` %."""
+    state = {'last': -step}
+
+    def callback(done, total):
+        percent = int(done * 100 / total) if total else 100
+        if percent >= state['last'] + step or done == total:
+            state['last'] = percent
+            print(f"{label} : {percent}% ({done // (1024 * 1024)} / {total // (1024 * 1024)} Mo)")
+    return callback
+
+
+class FileSlice(io.RawIOBase):
+    """Vue en lecture seule d'une plage d'un fichier, vue comme un fichier commençant à 0."""
+
+    def __init__(self, path, start, length):
+        super().__init__()
+        self._file = open(path, 'rb')
+        self._start = start
+        self._length = length
+        self._position = 0
+        self._file.seek(start)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._length}[whence]
+        self._position = max(0, min(self._length, base + offset))
+        self._file.seek(self._start + self._position)
+        return self._position
+
+    def read(self, size=-1):
+        remaining = self._length - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self._file.read(size)
+        self._position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _ranges(size, chunk_size):
+    return [(start, min(chunk_size, size - start)) for start in range(0, size, chunk_size)]
+
+
+def _compose(bucket, sources, destination):
+    """Compose par niveaux : au plus MAX_COMPOSE_SOURCES objets par appel. Retourne les intermédiaires créés."""
+    intermediates = []
+    level = 0
+    while len(sources) > MAX_COMPOSE_SOURCES:
+        grouped = []
+        for i in range(0, len(sources), MAX_COMPOSE_SOURCES):
+            blob = bucket.blob(f"{destination.name}.compose/{uuid.uuid4().hex}-{level}-{i}")
+            blob.compose(sources[i:i + MAX_COMPOSE_SOURCES])
+            grouped.append(blob)
+        intermediates.extend(grouped)
+        sources = grouped
+        level += 1
+    destination.compose(sources)
+    return intermediates
+
+
+@timed_stage('gcs_upload', 'cloud')
+def upload_file(local_path: str, bucket_name: str, blob_name: str, chunk_size=CHUNK_SIZE,
+                concurrency=CONCURRENCY, progress=None, client=None) -> str:
+    """
+    Envoie un fichier sur GCS. Au-delà de chunk_size, upload composite parallèle :
+    les morceaux sont envoyés en parallèle comme objets temporaires puis assemblés
+    côté serveur (compose) et supprimés. Retourne l'URI gs://.
+    """
+    client = client or get_storage_client()
+    bucket = client.bucket(bucket_name)
+    destination = bucket.blob(blob_name)
+    size = os.path.getsize(local_path)
+    tracker = TransferProgress(size, progress)
+
+    if size <= chunk_size:
+        destination.upload_from_filename(local_path)
+        tracker.add(size)
+        return f"gs://{bucket_name}/{blob_name}"
+
+    prefix = f"{blob_name}.parts/{uuid.uuid4().hex}"
+
+    def upload_part(index, start, length):
+        part = bucket.blob(f"{prefix}/{index:05d}")
+        with FileSlice(local_path, start, length) as f:
+            part.upload_from_file(f, size=length)
+        tracker.add(length)
+        return part
+
+    parts = []
+    intermediates = []
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='gcs-upload') as pool:
+            futures = [pool.submit(upload_part, i, start, length)
+                       for i, (start, length) in enumerate(_ranges(size, chunk_size))]
+            parts = [future.result() for future in futures]
+        intermediates = _compose(bucket, parts, destination)
+    finally:
+        # Objets temporaires supprimés même en cas d'échec (ceux qui n'existent pas sont ignorés)
+        temporary = parts + intermediates
+        if temporary:
+            bucket.delete_blobs(temporary, on_error=lambda blob: None)
+    return f"gs://{bucket_name}/{blob_name}"
+
+
+def _crc32c(path) -> str:
+    import google_crc32c
+
+    checksum = google_crc32c.Checksum()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b''):
+            checksum.update(block)
+    return base64.b64encode(checksum.digest()).decode()
+
+
+@timed_stage('gcs_download', 'cloud')
+def download_blob(blob, local_path: str, chunk_size=CHUNK_SIZE, concurrency=CONCURRENCY, progress=None) -> None:
+    """
+    Télécharge un objet. Au-delà de chunk_size, les plages sont lues en parallèle
+    et écrites à leur position dans un fichier préalloué, puis le CRC32C de
+    l'ensemble est comparé à celui de l'objet.
+    """
+    if blob.size is None:
+        blob.reload()
+    size = blob.size
+    tracker = TransferProgress(size, progress)
+
+    if size <= chunk_size:
+        blob.download_to_filename(local_path)
+        tracker.add(size)
+        return
+
+    tmp_path = f"{local_path}.{uuid.uuid4().hex}.part"
+    with open(tmp_path, 'wb') as f:
+        f.truncate(size)
+
+    def download_range(start, length):
+        part = blob.bucket.blob(blob.name, generation=blob.generation)
+        with open(tmp_path, 'r+b') as f:
+            f.seek(start)
+            # Pas de contrôle par plage (impossible sur une partie d'objet) : CRC32C global à la fin
+            part.download_to_file(f, start=start, end=start + length - 1, checksum=None)
+        tracker.add(length)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='gcs-download') as pool:
+            for future in [pool.submit(download_range, start, length) for start, length in _ranges(size, chunk_size)]:
+                future.result()
+        if blob.crc32c and _crc32c(tmp_path) != blob.crc32c:
+            raise IOError(f"CRC32C invalide après téléchargement de {blob.name}")
+        os.replace(tmp_path, local_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def download_file(bucket_name: str, blob_name: str, local_path: str, chunk_size=CHUNK_SIZE,
+                  concurrency=CONCURRENCY, progress=None, client=None) -> None:
+    client = client or get_storage_client()
+    blob = client.bucket(bucket_name).get_blob(blob_name)
+    if blob is None:
+        raise FileNotFoundError(f"gs://{bucket_name}/{blob_name}")
+    download_blob(blob, local_path, chunk_size, concurrency, progress)
@@ -0,0 +1,112 @@
+import os
+import shutil
+import ffmpeg
+from storage_layout import absolute, hls_path
+
+# Échelle de qualités HLS, de la plus haute à la plus basse
+HLS_LADDER = [
+    {'name': '1080p', 'height': 1080, 'video_bitrate': 5000000, 'audio_bitrate': 192000},
+    {'name': '720p', 'height': 720, 'video_bitrate': 2800000, 'audio_bitrate': 128000},
+    {'name': '480p', 'height': 480, 'video_bitrate': 1400000, 'audio_bitrate': 128000},
+    {'name': '360p', 'height': 360, 'video_bitrate': 800000, 'audio_bitrate': 96000},
+]
+
+MASTER_PLAYLIST = 'master.m3u8'
+
+
+def hls_dir(upload_folder: str, storage_key) -> str:
+    """Dossier contenant les playlists et segments HLS d'une vidéo (voir Video.storage_key)."""
+    return absolute(upload_folder, hls_path(storage_key))
+
+
+def select_renditions(source_height=None, ladder=HLS_LADDER):
+    """Garde les qualités inférieures ou égales à la source (jamais d'upscale)."""
+    if not source_height:
+        return list(ladder)
+    renditions = [r for r in ladder if r['height'] <= source_height]
+    return renditions or [ladder[-1]]
+
+
+def _probe_size(input_path):
+    try:
+        probe = ffmpeg.probe(input_path)
+        video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
+        return int(video_info['width']), int(video_info['height'])
+    except Exception as e:
+        print(f"Erreur lors de l'analyse de la vidéo pour HLS : {e}")
+        return None, None
+
+
+def _encode_rendition(input_path, output_dir, rendition, segment_duration, threads):
+    name = rendition['name']
+    output_options = {
+        'vf': f"scale=-2:{rendition['height']}",
+        'vcodec': 'libx264',
+        'preset': 'veryfast',
+        'b:v': rendition['video_bitrate'],
+        'maxrate': int(rendition['video_bitrate'] * 1.07),
+        'bufsize': rendition['video_bitrate'] * 2,
+        # Images clés alignées sur les segments pour que le changement de qualité soit propre
+        'force_key_frames': f"expr:gte(t,n_forced*{segment_duration})",
+        'sc_threshold': 0,
+        'acodec': 'aac',
+        'b:a': rendition['audio_bitrate'],
+        'ac': 2,
+        'f': 'hls',
+        'hls_time': segment_duration,
+        'hls_playlist_type': 'vod',
+        'hls_segment_filename': os.path.join(output_dir, f"{name}_%04d.ts"),
+    }
+    if threads:
+        output_options['threads'] = threads
+    (
+        ffmpeg
+        .input(input_path)
+        .output(os.path.join(output_dir, f"{name}.m3u8"), **output_options)
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+
+
+def write_master_playlist(output_dir, renditions, source_width=None, source_height=None):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for rendition in renditions:
+        bandwidth = rendition['video_bitrate'] + rendition['audio_bitrate']
+        attributes = f"BANDWIDTH={bandwidth}"
+        if source_width and source_height:
+            width = int(round(source_width * rendition['height'] / source_height / 2) * 2)
+            attributes += f",RESOLUTION={width}x{rendition['height']}"
+        lines.append(f"#EXT-X-STREAM-INF:{attributes}")
+        lines.append(f"{rendition['name']}.m3u8")
+    with open(os.path.join(output_dir, MASTER_PLAYLIST), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def package_hls(input_path: str, output_dir: str, segment_duration: int = 6, threads=None, ladder=HLS_LADDER, source_size=None) -> str:
+    """
+    Produit l'échelle de qualités HLS (une playlist par qualité + playlist maître).
+    Les fichiers sont écrits dans un dossier temporaire puis déplacés d'un bloc,
+    pour ne jamais servir une playlist incomplète. Retourne le chemin de la playlist maître.
+    source_size : (largeur, hauteur) de la source si déjà connues.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(input_path)
+
+    # Dimensions déjà connues (Video.width/height) : pas besoin de relancer ffprobe
+    source_width, source_height = source_size or _probe_size(input_path)
+    renditions = select_renditions(source_height, ladder)
+
+    work_dir = f"{output_dir}.tmp"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    try:
+        for rendition in renditions:
+            _encode_rendition(input_path, work_dir, rendition, segment_duration, threads)
+        write_master_playlist(work_dir, renditions, source_width, source_height)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.rename(work_dir, output_dir)
+    return os.path.join(output_dir, MASTER_PLAYLIST)
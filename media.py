@@ -0,0 +1,219 @@
+import os
+import mimetypes
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import quote
+from flask import current_app, request, Response, abort
+from werkzeug.http import http_date, parse_date, parse_etags
+from werkzeug.wsgi import wrap_file
+
+CHUNK_SIZE = 256 * 1024
+MAX_RANGES = 16  # Au-delà, la requête est servie en entier (évite les requêtes abusives)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Modes de livraison (MEDIA_DELIVERY) : 'direct' envoie les octets depuis le
+# worker Python ; 'x-accel' et 'x-sendfile' laissent le proxy frontal envoyer
+# le fichier (sendfile, sans copie). Exemple nginx pour 'x-accel' :
+#   location /_media/ {
+#       internal;
+#       alias /srv/zedtube/static/uploads/;
+#   }
+DELIVERY_MODES = ('direct', 'x-accel', 'x-sendfile')
+
+
+class RangeNotSatisfiable(Exception):
+    """Aucune des plages demandées n'est dans le fichier."""
+    pass
+
+
+def file_etag(stat) -> str:
+    """ETag fort : les fichiers uploadés ne sont jamais modifiés sur place."""
+    return f"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def parse_range_header(header, size):
+    """
+    Analyse un en-tête Range et retourne une liste de (début, fin) inclusifs,
+    triée et fusionnée. Retourne None si l'en-tête doit être ignoré.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+
+    ranges = []
+    for spec in header[len('bytes='):].split(','):
+        spec = spec.strip()
+        if '-' not in spec:
+            return None
+        first, last = spec.split('-', 1)
+        try:
+            if first == '':
+                # Suffixe : les N derniers octets
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(0, size - length), size - 1
+            else:
+                start = int(first)
+                if last and int(last) < start:
+                    return None
+                end = min(int(last), size - 1) if last else size - 1
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _multipart_body(path, ranges, size, mimetype, boundary):
+    for start, end in ranges:
+        yield (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode()
+        yield from _read_range(path, start, end)
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+def _multipart_length(ranges, size, mimetype, boundary):
+    length = 0
+    for start, end in ranges:
+        length += len((
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode()) + end - start + 1
+    return length + len(f"\r\n--{boundary}--\r\n".encode())
+
+
+def _is_not_modified(etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # Comparaison faible (RFC 9110 §13.1.2)
+        return parse_etags(if_none_match).contains_weak(etag)
+
+    if_modified_since = parse_date(request.headers.get('If-Modified-Since'))
+    if if_modified_since:
+        return last_modified <= if_modified_since
+    return False
+
+
+def _if_range_allows(etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        # If-Range exige une comparaison forte
+        return not if_range.startswith('W/') and if_range.strip('"') == etag
+    date = parse_date(if_range)
+    return date is not None and date == last_modified
+
+
+def offload_media(path, mode, root, prefix, mimetype=None, cache_control=IMMUTABLE_CACHE_CONTROL):
+    """
+    Réponse vide qui délègue l'envoi du fichier au proxy frontal :
+      - 'x-accel' (nginx) : X-Accel-Redirect vers prefix + chemin relatif à root,
+        servi par une location `internal` qui pointe sur root ;
+      - 'x-sendfile' (Apache mod_xsendfile, lighttpd) : chemin absolu du fichier.
+    Le proxy gère lui-même plages, ETag et requêtes conditionnelles ; il conserve
+    Content-Type et Cache-Control de cette réponse.
+    """
+    mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    response = Response(mimetype=mimetype, headers={'Cache-Control': cache_control})
+    if mode == 'x-sendfile':
+        response.headers['X-Sendfile'] = os.path.abspath(path)
+        return response
+
+    relative_path = os.path.relpath(path, root).replace(os.sep, '/')
+    if relative_path == '..' or relative_path.startswith('../'):
+        abort(404)
+    response.headers['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{quote(relative_path)}"
+    return response
+
+
+def send_media(path, mimetype=None, cache_control=IMMUTABLE_CACHE_CONTROL, root=None):
+    """
+    Sert un fichier média avec ETag fort, requêtes conditionnelles
+    (If-None-Match / If-Modified-Since) et plages d'octets simples ou multiples.
+
+    Avec MEDIA_DELIVERY = 'x-accel' ou 'x-sendfile', la route ne fait que la
+    recherche et l'autorisation : l'envoi est délégué au proxy (offload_media).
+    root est le dossier exposé par le proxy (par défaut UPLOAD_FOLDER).
+    """
+    mode = current_app.config.get('MEDIA_DELIVERY', 'direct')
+    if mode != 'direct':
+        return offload_media(path, mode, root or current_app.config['UPLOAD_FOLDER'],
+                             current_app.config.get('MEDIA_ACCEL_PREFIX', '/_media/'), mimetype, cache_control)
+
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        abort(404)
+
+    size = stat.st_size
+    etag = file_etag(stat)
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+    mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': cache_control,
+    }
+
+    if _is_not_modified(etag, last_modified):
+        return Response(status=304, headers=headers)
+
+    ranges = None
+    if request.method in ('GET', 'HEAD') and _if_range_allows(etag, last_modified):
+        try:
+            ranges = parse_range_header(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            headers['Content-Range'] = f"bytes */{size}"
+            return Response(status=416, headers=headers)
+
+    if not ranges:
+        f = open(path, 'rb')
+        headers['Content-Length'] = str(size)
+        return Response(wrap_file(request.environ, f, CHUNK_SIZE), status=200,
+                        mimetype=mimetype, headers=headers, direct_passthrough=True)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+        headers['Content-Length'] = str(end - start + 1)
+        return Response(_read_range(path, start, end), status=206,
+                        mimetype=mimetype, headers=headers, direct_passthrough=True)
+
+    boundary = uuid.uuid4().hex
+    headers['Content-Length'] = str(_multipart_length(ranges, size, mimetype, boundary))
+    return Response(_multipart_body(path, ranges, size, mimetype, boundary), status=206,
+                    content_type=f"multipart/byteranges; boundary={boundary}",
+                    headers=headers, direct_passthrough=True)
@@ -0,0 +1,175 @@
+import os
+import time
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Avec PROMETHEUS_MULTIPROC_DIR (workers gunicorn, processus prefork des workers Celery),
+# chaque processus écrit ses mesures dans ce dossier et /metrics les agrège
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+REQUEST_LATENCY = Histogram(
+    'zedtube_request_duration_seconds', 'Durée des requêtes HTTP par route',
+    ['endpoint', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_QUERIES = Histogram(
+    'zedtube_request_db_queries', 'Requêtes SQL par requête HTTP',
+    ['endpoint'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+DB_TIME = Histogram(
+    'zedtube_request_db_seconds', 'Temps passé en base par requête HTTP',
+    ['endpoint'], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+UPLOAD_BYTES = Counter('zedtube_upload_bytes', 'Octets reçus par upload', ['kind'])
+UPLOAD_RATE = Histogram(
+    'zedtube_upload_rate_bytes_per_second', 'Débit de réception des uploads (formulaire ou morceau)',
+    ['kind'], buckets=(1e5, 5e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8, 1e9),
+)
+STAGE_SECONDS = Histogram(
+    'zedtube_pipeline_stage_seconds', 'Durée des étapes du pipeline média',
+    ['stage', 'backend', 'outcome'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+TRANSCODE_SEGMENTS = Histogram(
+    'zedtube_transcode_segments', 'Segments par conversion segmentée',
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+# Collecteurs calculés au moment du scrape (profondeur de file, stats Discord)
+_collectors = []
+
+
+def observe_stage(stage, seconds, backend='none', outcome='success'):
+    STAGE_SECONDS.labels(stage, backend, outcome).observe(seconds)
+
+
+@contextmanager
+def timed_stage(stage, backend='none'):
+    """Mesure un bloc comme étape du pipeline ; outcome='error' si le bloc lève une exception."""
+    started = time.perf_counter()
+    outcome = 'success'
+    try:
+        yield
+    except BaseException:
+        outcome = 'error'
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - started, backend, outcome)
+
+
+def record_upload(kind, size, seconds):
+    UPLOAD_BYTES.labels(kind).inc(size)
+    if seconds > 0:
+        UPLOAD_RATE.labels(kind).observe(size / seconds)
+
+
+def record_segments(count):
+    TRANSCODE_SEGMENTS.observe(count)
+
+
+class QueueDepthCollector:
+    """Jobs de transcodage par état et backend (depth_source() -> {(état, backend): nombre})."""
+
+    def __init__(self, depth_source):
+        self.depth_source = depth_source
+
+    def _gauge(self):
+        return GaugeMetricFamily('zedtube_transcode_queue_depth', 'Jobs de transcodage non terminés',
+                                 labels=['state', 'backend'])
+
+    def describe(self):
+        # Sans describe(), l'enregistrement appellerait collect() hors contexte d'application
+        yield self._gauge()
+
+    def collect(self):
+        gauge = self._gauge()
+        try:
+            depth = self.depth_source()
+        except Exception as e:
+            print(f"Erreur lors du calcul de la file de transcodage: {e}")
+            depth = {}
+        for (state, backend), count in depth.items():
+            gauge.add_metric([state, backend], count)
+        yield gauge
+
+
+class NotifierCollector:
+    """Compteurs de notifications.DiscordNotifier (snapshot())."""
+
+    COUNTERS = ('queued', 'sent', 'dropped', 'failed', 'batches', 'retries', 'rate_limited')
+
+    def __init__(self, notifier):
+        self.notifier = notifier
+
+    def collect(self):
+        stats = self.notifier.snapshot()
+        counter = CounterMetricFamily('zedtube_discord_events', 'Notifications Discord', labels=['event'])
+        for name in self.COUNTERS:
+            counter.add_metric([name], stats.get(name, 0))
+        yield counter
+        yield GaugeMetricFamily('zedtube_discord_pending', 'Notifications Discord en attente', value=stats['pending'])
+
+
+def register_collector(collector):
+    _collectors.append(collector)
+    if not MULTIPROCESS:
+        REGISTRY.register(collector)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_seconds = g.get('db_seconds', 0.0) + elapsed
+
+
+def _handle_error(context):
+    # Requête en erreur : after_cursor_execute ne sera pas appelé
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def init_metrics(app):
+    """Mesure chaque requête HTTP (durée, nombre et temps des requêtes SQL)."""
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_LATENCY.labels(endpoint, request.method, response.status_code).observe(time.perf_counter() - started)
+            DB_QUERIES.labels(endpoint).observe(g.get('db_queries', 0))
+            DB_TIME.labels(endpoint).observe(g.get('db_seconds', 0.0))
+        return response
+
+
+def metrics_response():
+    """Corps et en-têtes de /metrics au format texte Prometheus."""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _collectors:
+            registry.register(collector)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
@@ -0,0 +1,116 @@
+"""schema d'origine
+
+Revision ID: 3c8a1f7d2e90
+Revises: 
+Create Date: 2026-10-18 17:41:26.508113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8a1f7d2e90'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# Schéma des modèles d'avant les migrations, autrefois créé par db.create_all().
+# Les bases existantes peuvent dater d'une version plus ancienne encore (sans
+# dossiers ni vues, par exemple) : seuls les tables et colonnes manquantes sont
+# créées, et une base neuve est créée entièrement.
+def _columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'user' not in tables:
+        op.create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('can_upload', sa.Boolean(), nullable=True),
+        sa.Column('is_admin', sa.Boolean(), nullable=True),
+        sa.Column('upload_requested', sa.Boolean(), nullable=True),
+        sa.Column('upload_requested_date', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username')
+        )
+    else:
+        missing = {'upload_requested', 'upload_requested_date'} - _columns('user')
+        with op.batch_alter_table('user', schema=None) as batch_op:
+            if 'upload_requested' in missing:
+                batch_op.add_column(sa.Column('upload_requested', sa.Boolean(), nullable=True))
+            if 'upload_requested_date' in missing:
+                batch_op.add_column(sa.Column('upload_requested_date', sa.DateTime(), nullable=True))
+
+    if 'folder' not in tables:
+        op.create_table('folder',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('custom_thumbnail', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('is_public', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'video' not in tables:
+        op.create_table('video',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('original_filename', sa.String(length=255), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('upload_date', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('processed_path', sa.String(length=255), nullable=True),
+        sa.Column('is_converted', sa.Boolean(), nullable=True),
+        sa.Column('views', sa.Integer(), nullable=True),
+        sa.Column('folder_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['folder_id'], ['folder.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    else:
+        missing = {'views', 'folder_id'} - _columns('video')
+        with op.batch_alter_table('video', schema=None) as batch_op:
+            if 'views' in missing:
+                batch_op.add_column(sa.Column('views', sa.Integer(), nullable=True))
+            if 'folder_id' in missing:
+                batch_op.add_column(sa.Column('folder_id', sa.Integer(), nullable=True))
+                batch_op.create_foreign_key('fk_video_folder_id_folder', 'folder', ['folder_id'], ['id'])
+        # Compteur incrémenté en SQL (view_counter) : NULL + n resterait NULL
+        op.execute("UPDATE video SET views = 0 WHERE views IS NULL")
+
+    if 'video_view' not in tables:
+        op.create_table('video_view',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('video_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('fingerprint', sa.String(length=64), nullable=True),
+        sa.Column('viewed_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['video_id'], ['video.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'ix_video_view_fingerprint' not in _indexes('video_view'):
+        with op.batch_alter_table('video_view', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_video_view_fingerprint'), ['fingerprint'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('video_view', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_video_view_fingerprint'))
+
+    op.drop_table('video_view')
+    op.drop_table('video')
+    op.drop_table('folder')
+    op.drop_table('user')
@@ -0,0 +1,100 @@
+"""pipeline media
+
+Revision ID: df3d32b93e41
+Revises: 3c8a1f7d2e90
+Create Date: 2026-10-18 14:18:05.049784
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'df3d32b93e41'
+down_revision = '3c8a1f7d2e90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_blob',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('transcoded', sa.Boolean(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sha256')
+    )
+    op.create_table('upload_session',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('original_filename', sa.String(length=255), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=True),
+    sa.Column('folder_id', sa.Integer(), nullable=True),
+    sa.Column('convert', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['folder_id'], ['folder.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('video', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('hls_playlist', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('blob_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('duration', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('height', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('fps', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('video_codec', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('pix_fmt', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('audio_codec', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('bit_rate', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('video_bitrate', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('audio_bitrate', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('container', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('probed_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('conversion_path', sa.String(length=16), nullable=True))
+        batch_op.create_foreign_key('fk_video_blob_id_media_blob', 'media_blob', ['blob_id'], ['id'])
+        batch_op.create_index(batch_op.f('ix_video_blob_id'), ['blob_id'], unique=False)
+        batch_op.create_index('ix_video_folder_upload_date_id', ['folder_id', 'upload_date', 'id'], unique=False)
+        batch_op.create_index('ix_video_upload_date_id', ['upload_date', 'id'], unique=False)
+
+    op.create_table('transcode_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('video_id', sa.Integer(), nullable=False),
+    sa.Column('backend', sa.String(length=20), nullable=False),
+    sa.Column('state', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('task_id', sa.String(length=155), nullable=True),
+    sa.Column('external_id', sa.String(length=255), nullable=True),
+    sa.Column('external_output', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['video_id'], ['video.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('transcode_job', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_transcode_job_state'), ['state'], unique=False)
+        batch_op.create_index(batch_op.f('ix_transcode_job_video_id'), ['video_id'], unique=False)
+
+
+def downgrade():
+    op.drop_table('transcode_job')
+    with op.batch_alter_table('video', schema=None) as batch_op:
+        batch_op.drop_index('ix_video_upload_date_id')
+        batch_op.drop_index('ix_video_folder_upload_date_id')
+        batch_op.drop_index(batch_op.f('ix_video_blob_id'))
+        batch_op.drop_constraint('fk_video_blob_id_media_blob', type_='foreignkey')
+        for name in ('conversion_path', 'probed_at', 'container', 'audio_bitrate', 'video_bitrate', 'bit_rate',
+                     'audio_codec', 'pix_fmt', 'video_codec', 'fps', 'height', 'width', 'duration', 'blob_id',
+                     'hls_playlist'):
+            batch_op.drop_column(name)
+
+    op.drop_table('upload_session')
+    op.drop_table('media_blob')
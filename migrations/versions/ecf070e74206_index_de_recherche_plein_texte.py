@@ -0,0 +1,84 @@
+"""index de recherche plein texte
+
+Revision ID: ecf070e74206
+Revises: ef9f5195ae46
+Create Date: 2026-10-18 16:02:11.318254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ecf070e74206'
+down_revision = 'ef9f5195ae46'
+branch_labels = None
+depends_on = None
+
+
+# SQLite : tables FTS5 à contenu externe tenues à jour par des triggers (voir search.py)
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE video_fts USING fts5("
+    "title, original_filename, content='video', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER video_fts_insert AFTER INSERT ON video BEGIN "
+    "INSERT INTO video_fts(rowid, title, original_filename) VALUES (new.id, new.title, new.original_filename); END",
+    "CREATE TRIGGER video_fts_delete AFTER DELETE ON video BEGIN "
+    "INSERT INTO video_fts(video_fts, rowid, title, original_filename) "
+    "VALUES ('delete', old.id, old.title, old.original_filename); END",
+    "CREATE TRIGGER video_fts_update AFTER UPDATE OF title, original_filename ON video BEGIN "
+    "INSERT INTO video_fts(video_fts, rowid, title, original_filename) "
+    "VALUES ('delete', old.id, old.title, old.original_filename); "
+    "INSERT INTO video_fts(rowid, title, original_filename) VALUES (new.id, new.title, new.original_filename); END",
+    "CREATE VIRTUAL TABLE folder_fts USING fts5("
+    "name, content='folder', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER folder_fts_insert AFTER INSERT ON folder BEGIN "
+    "INSERT INTO folder_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER folder_fts_delete AFTER DELETE ON folder BEGIN "
+    "INSERT INTO folder_fts(folder_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER folder_fts_update AFTER UPDATE OF name ON folder BEGIN "
+    "INSERT INTO folder_fts(folder_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO folder_fts(rowid, name) VALUES (new.id, new.name); END",
+    "INSERT INTO video_fts(video_fts) VALUES ('rebuild')",
+    "INSERT INTO folder_fts(folder_fts) VALUES ('rebuild')",
+)
+
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS video_fts_insert",
+    "DROP TRIGGER IF EXISTS video_fts_delete",
+    "DROP TRIGGER IF EXISTS video_fts_update",
+    "DROP TRIGGER IF EXISTS folder_fts_insert",
+    "DROP TRIGGER IF EXISTS folder_fts_delete",
+    "DROP TRIGGER IF EXISTS folder_fts_update",
+    "DROP TABLE IF EXISTS video_fts",
+    "DROP TABLE IF EXISTS folder_fts",
+)
+
+# PostgreSQL : colonnes tsvector générées et index GIN
+POSTGRES_UPGRADE = (
+    "ALTER TABLE video ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(original_filename, '')), 'B')) STORED",
+    "CREATE INDEX ix_video_search_vector ON video USING gin (search_vector)",
+    "ALTER TABLE folder ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "to_tsvector('simple', coalesce(name, ''))) STORED",
+    "CREATE INDEX ix_folder_search_vector ON folder USING gin (search_vector)",
+)
+
+POSTGRES_DOWNGRADE = (
+    "DROP INDEX IF EXISTS ix_video_search_vector",
+    "ALTER TABLE video DROP COLUMN IF EXISTS search_vector",
+    "DROP INDEX IF EXISTS ix_folder_search_vector",
+    "ALTER TABLE folder DROP COLUMN IF EXISTS search_vector",
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for statement in {'sqlite': SQLITE_UPGRADE, 'postgresql': POSTGRES_UPGRADE}.get(dialect, ()):
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for statement in {'sqlite': SQLITE_DOWNGRADE, 'postgresql': POSTGRES_DOWNGRADE}.get(dialect, ()):
+        op.execute(statement)
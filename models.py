@@ -1,9 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, and_
+from collections import namedtuple
 from sqlalchemy.sql import func
 from flask import url_for  # Ajout de cette importation
+from datetime import datetime
 
 db = SQLAlchemy()
 
@@ -42,10 +44,16 @@ class Folder(db.Model):
                            order_by='Video.upload_date.desc()')
     def get_thumbnail(self):
         """Retourne le chemin de la miniature du dossier"""
+        if self.custom_thumbnail:
+            return self.thumbnail_url()
+        return self.thumbnail_url(self.videos[0].filename if self.videos else None)
+
+    def thumbnail_url(self, latest_filename=None):
+        """Miniature du dossier à partir du nom de la dernière vidéo, sans charger la relation"""
         if self.custom_thumbnail:
             return url_for('serve_uploaded_file', filename=self.custom_thumbnail)
-        elif self.videos:
-            return url_for('serve_thumbnail', filename=self.videos[0].filename)
+        elif latest_filename:
+            return url_for('serve_thumbnail', filename=latest_filename)
         return url_for('static', filename='default_folder.png')
 
 class Video(db.Model):
@@ -59,6 +67,65 @@ class Video(db.Model):
     is_converted = db.Column(db.Boolean, default=True)
     views = db.Column(db.Integer, default=0)
     folder_id = db.Column(db.Integer, ForeignKey('folder.id'), nullable=True)
+    hls_playlist = db.Column(db.String(255), nullable=True)  # Playlist maître HLS, relative au dossier d'upload
+    blob_id = db.Column(db.Integer, ForeignKey('media_blob.id'), nullable=True, index=True)
+
+    # Métadonnées média, renseignées une fois à l'ingestion (voir utils.probe_media)
+    duration = db.Column(db.Float, nullable=True)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    fps = db.Column(db.Float, nullable=True)
+    video_codec = db.Column(db.String(32), nullable=True)
+    pix_fmt = db.Column(db.String(32), nullable=True)
+    audio_codec = db.Column(db.String(32), nullable=True)
+    bit_rate = db.Column(db.Integer, nullable=True)
+    video_bitrate = db.Column(db.Integer, nullable=True)
+    audio_bitrate = db.Column(db.Integer, nullable=True)
+    container = db.Column(db.String(64), nullable=True)
+    probed_at = db.Column(db.DateTime, nullable=True)
+    # Chemin de conversion choisi par utils.plan_conversion ('remux', 'audio', 'video', 'transcode')
+    conversion_path = db.Column(db.String(16), nullable=True)
+
+    # Index de la pagination par clé (upload_date DESC, id DESC), globale et par dossier
+    __table_args__ = (
+        db.Index('ix_video_upload_date_id', 'upload_date', 'id'),
+        db.Index('ix_video_folder_upload_date_id', 'folder_id', 'upload_date', 'id'),
+    )
+
+    METADATA_FIELDS = ('duration', 'width', 'height', 'fps', 'video_codec', 'pix_fmt', 'audio_codec',
+                       'bit_rate', 'video_bitrate', 'audio_bitrate', 'container')
+
+    @property
+    def storage_key(self):
+        """Clé des fichiers dérivés (HLS) : partagée par toutes les vidéos d'un même blob"""
+        return self.blob.sha256 if self.blob else str(self.id)
+
+    def apply_metadata(self, metadata):
+        """Enregistre le résultat de utils.probe_media (None si la vidéo n'a pas pu être analysée)"""
+        for field in self.METADATA_FIELDS:
+            setattr(self, field, (metadata or {}).get(field))
+        self.probed_at = datetime.utcnow()
+
+    def stored_metadata(self):
+        """Métadonnées enregistrées, au format de utils.probe_media (None si jamais analysée)"""
+        if self.probed_at is None:
+            return None
+        return {field: getattr(self, field) for field in self.METADATA_FIELDS}
+
+class MediaBlob(db.Model):
+    """
+    Fichier stocké sous le hash SHA-256 de l'upload d'origine. Plusieurs vidéos
+    peuvent y faire référence ; le fichier est supprimé avec la dernière.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    filename = db.Column(db.String(255), nullable=False)  # Fichier servi (converti une fois le transcodage terminé)
+    transcoded = db.Column(db.Boolean, default=False, nullable=False)
+    ref_count = db.Column(db.Integer, default=1, nullable=False)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+
+    videos = db.relationship('Video', backref='blob', lazy=True)
 
 class VideoView(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -69,4 +136,136 @@ class VideoView(db.Model):
     
     # Relations
     video = db.relationship('Video', backref='view_records')
-    user = db.relationship('User', backref='view_history')
\ No newline at end of file
+    user = db.relationship('User', backref='view_history')
+class UploadSession(db.Model):
+    """Upload par morceaux en cours ; l'offset est la taille du fichier partiel sur disque."""
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, ForeignKey('user.id'), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    title = db.Column(db.String(255), nullable=True, default='')
+    folder_id = db.Column(db.Integer, ForeignKey('folder.id'), nullable=True)
+    convert = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+class FileDeletion(db.Model):
+    """
+    Fichier (ou dossier HLS) à effacer, enregistré dans la transaction qui
+    supprime la vidéo : si elle échoue, rien n'est effacé. Traité par lots
+    par reconciler.purge_deletions.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(512), nullable=False)  # Relatif au dossier d'upload
+    created_at = db.Column(db.DateTime, server_default=func.now())
+
+class TranscodeJob(db.Model):
+    """Job de conversion exécuté en arrière-plan par un worker Celery."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    RETRYING = 'retrying'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATES = (PENDING, RUNNING, RETRYING, SUCCEEDED, FAILED)
+
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.Integer, ForeignKey('video.id'), nullable=False, index=True)
+    backend = db.Column(db.String(20), nullable=False, default='cloud')
+    state = db.Column(db.String(20), nullable=False, default=PENDING, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    task_id = db.Column(db.String(155), nullable=True)
+    external_id = db.Column(db.String(255), nullable=True)  # Job Cloud Transcoder suivi par transcode_watcher
+    external_output = db.Column(db.String(255), nullable=True)  # Dossier de sortie du job dans le bucket
+    # Entrée et durée du traitement, historique de estimator.ProcessingTimeEstimator
+    input_size = db.Column(db.BigInteger, nullable=True)
+    input_duration = db.Column(db.Float, nullable=True)
+    input_width = db.Column(db.Integer, nullable=True)
+    input_height = db.Column(db.Integer, nullable=True)
+    input_fps = db.Column(db.Float, nullable=True)
+    input_codec = db.Column(db.String(32), nullable=True)
+    conversion_path = db.Column(db.String(16), nullable=True)
+    processing_seconds = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    video = db.relationship('Video', backref=db.backref('transcode_jobs', cascade='all, delete-orphan'))
+
+    @property
+    def is_finished(self):
+        return self.state in (self.SUCCEEDED, self.FAILED)
+
+    def record_input(self, size, metadata, conversion_path):
+        self.input_size = size
+        self.input_duration = metadata.get('duration')
+        self.input_width = metadata.get('width')
+        self.input_height = metadata.get('height')
+        self.input_fps = metadata.get('fps')
+        self.input_codec = metadata.get('video_codec')
+        self.conversion_path = conversion_path
+
+    def input_metadata(self):
+        return {'duration': self.input_duration, 'width': self.input_width,
+                'height': self.input_height, 'fps': self.input_fps, 'video_codec': self.input_codec}
+
+    def to_dict(self):
+        """Représentation JSON du job pour l'API de statut"""
+        return {
+            'id': self.id,
+            'video_id': self.video_id,
+            'backend': self.backend,
+            'state': self.state,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+FolderSummary = namedtuple('FolderSummary', ['folder', 'video_count', 'latest_filename'])
+
+# Copies détachées de la session, que le cache peut conserver entre les requêtes
+VideoCard = namedtuple('VideoCard', ['id', 'title', 'filename', 'upload_date', 'views', 'user_id'])
+
+class FolderCard(namedtuple('FolderCard', ['id', 'name', 'is_public', 'custom_thumbnail'])):
+    __slots__ = ()
+    thumbnail_url = Folder.thumbnail_url
+
+def video_cards(videos):
+    return [VideoCard(v.id, v.title, v.filename, v.upload_date, v.views, v.user_id) for v in videos]
+
+def folder_cards(summaries):
+    return [
+        FolderSummary(FolderCard(s.folder.id, s.folder.name, s.folder.is_public, s.folder.custom_thumbnail),
+                      s.video_count, s.latest_filename)
+        for s in summaries
+    ]
+
+def folder_summaries(folder_query):
+    """
+    Retourne un FolderSummary (dossier, nombre de vidéos, dernière vidéo) pour
+    chaque dossier de folder_query, en une seule requête.
+    """
+    visible_ids = folder_query.with_entities(Folder.id).order_by(None)
+    ranked = (
+        db.session.query(
+            Video.folder_id.label('folder_id'),
+            Video.filename.label('filename'),
+            func.count().over(partition_by=Video.folder_id).label('video_count'),
+            func.row_number().over(
+                partition_by=Video.folder_id,
+                order_by=(Video.upload_date.desc(), Video.id.desc())
+            ).label('position'),
+        )
+        .filter(Video.folder_id.in_(visible_ids))
+        .subquery()
+    )
+    rows = (
+        folder_query
+        .outerjoin(ranked, and_(ranked.c.folder_id == Folder.id, ranked.c.position == 1))
+        .add_columns(func.coalesce(ranked.c.video_count, 0), ranked.c.filename)
+        .all()
+    )
+    return [FolderSummary(folder, count, filename) for folder, count, filename in rows]
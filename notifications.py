@@ -0,0 +1,169 @@
+import os
+import time
+import queue
+import atexit
+import threading
+import requests
+
+DISCORD_MESSAGE_LIMIT = 2000  # caractères par message (limite de l'API Discord)
+
+
+class DiscordNotifier:
+    """
+    Envoi des logs Discord en arrière-plan.
+
+    - send() ne bloque jamais : le message est placé dans une file bornée,
+      et compté dans dropped si la file est pleine ;
+    - les messages arrivés pendant coalesce_window sont regroupés en un seul
+      envoi (dans la limite de taille d'un message Discord) ;
+    - une réponse 429 est rejouée après le délai Retry-After, les erreurs
+      réseau et 5xx avec un délai exponentiel, au plus max_attempts fois ;
+    - une seule session HTTP (connexion keep-alive) est réutilisée.
+    """
+
+    def __init__(self, webhook_url, max_queue=1000, coalesce_window=1.0, max_attempts=5,
+                 timeout=(3.05, 10), session=None):
+        self.webhook_url = webhook_url
+        self.coalesce_window = coalesce_window
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.stats = {'queued': 0, 'sent': 0, 'batches': 0, 'dropped': 0, 'failed': 0, 'retries': 0, 'rate_limited': 0}
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def send(self, message: str) -> bool:
+        """Place le message en file ; retourne False s'il a été abandonné (file pleine)."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout=5.0) -> bool:
+        """Attend que la file soit vide (au plus timeout secondes)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return not self._queue.unfinished_tasks
+
+    def snapshot(self) -> dict:
+        with self._stats_lock:
+            return dict(self.stats, pending=self.pending())
+
+    def _count(self, key, value=1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def _ensure_started(self):
+        # Un thread par processus : après un fork (workers Celery), il est relancé
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='discord-notifier', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _next_batch(self):
+        """Premier message en attente puis ceux qui arrivent pendant la fenêtre de regroupement."""
+        messages = [self._queue.get()]
+        length = len(messages[0])
+        deadline = time.monotonic() + self.coalesce_window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                message = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if length + 1 + len(message) > DISCORD_MESSAGE_LIMIT:
+                # Message suivant trop long pour ce lot : envoyé seul au prochain tour
+                self._post_batch(messages)
+                messages, length = [message], len(message)
+                continue
+            messages.append(message)
+            length += 1 + len(message)
+        return messages
+
+    def _run(self):
+        while True:
+            self._post_batch(self._next_batch())
+
+    def _post_batch(self, messages):
+        content = '\n'.join(messages)[:DISCORD_MESSAGE_LIMIT]
+        try:
+            if self._post(content):
+                self._count('sent', len(messages))
+                self._count('batches')
+            else:
+                self._count('failed', len(messages))
+        finally:
+            for _ in messages:
+                self._queue.task_done()
+
+    def _post(self, content) -> bool:
+        delay = 1.0
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self._count('retries')
+            try:
+                response = self.session.post(self.webhook_url, json={'content': content}, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"Erreur lors de l'envoi du log Discord: {str(e)}")
+                time.sleep(delay)
+                delay *= 2
+                continue
+
+            if response.status_code == 429:
+                self._count('rate_limited')
+                time.sleep(retry_after(response, delay))
+                continue
+            if response.status_code >= 500:
+                time.sleep(delay)
+                delay *= 2
+                continue
+            if response.status_code >= 400:
+                # Erreur définitive (webhook supprimé, message invalide) : inutile de réessayer
+                print(f"Erreur lors de l'envoi du log Discord: HTTP {response.status_code}")
+                return False
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                # Quota du webhook épuisé : on attend sa remise à zéro plutôt que de provoquer un 429
+                time.sleep(retry_after_reset(response))
+            return True
+        return False
+
+
+def retry_after(response, default=1.0) -> float:
+    """Délai demandé par Discord : en-tête Retry-After ou champ retry_after du JSON (secondes)."""
+    for value in (response.headers.get('Retry-After'), _json_retry_after(response)):
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            continue
+    return default
+
+
+def retry_after_reset(response) -> float:
+    try:
+        return max(0.0, float(response.headers.get('X-RateLimit-Reset-After', 0)))
+    except ValueError:
+        return 0.0
+
+
+def _json_retry_after(response):
+    try:
+        return response.json().get('retry_after')
+    except (ValueError, AttributeError):
+        return None
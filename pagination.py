@@ -0,0 +1,61 @@
+import base64
+from datetime import datetime
+from sqlalchemy import or_, and_, literal, String
+from models import db, Video
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Curseur de pagination illisible."""
+    pass
+
+
+def encode_cursor(video) -> str:
+    """Curseur opaque (upload_date, id) de la dernière vidéo d'une page."""
+    raw = f"{video.upload_date.isoformat()}|{video.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        upload_date, video_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(upload_date), int(video_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE) -> int:
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+
+def _comparable_date(upload_date):
+    # SQLite compare des chaînes et CURRENT_TIMESTAMP (server_default) est stocké
+    # sans microsecondes : on compare avec la même représentation textuelle
+    if db.engine.dialect.name == 'sqlite':
+        return literal(upload_date.isoformat(sep=' '), String)
+    return upload_date
+
+
+def keyset_page(query, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Pagination par clé (upload_date DESC, id DESC) : le coût d'une page ne dépend
+    pas de sa position, contrairement à OFFSET. Retourne (vidéos, curseur suivant ou None).
+    """
+    if cursor:
+        upload_date, video_id = decode_cursor(cursor)
+        upload_date = _comparable_date(upload_date)
+        query = query.filter(or_(
+            Video.upload_date < upload_date,
+            and_(Video.upload_date == upload_date, Video.id < video_id)
+        ))
+    videos = query.order_by(Video.upload_date.desc(), Video.id.desc()).limit(limit + 1).all()
+    if len(videos) > limit:
+        videos = videos[:limit]
+        return videos, encode_cursor(videos[-1])
+    return videos, None
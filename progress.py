@@ -0,0 +1,211 @@
+import json
+import time
+from datetime import datetime, timezone
+import threading
+from concurrent.futures import wait
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+# États après lesquels un flux de progression se termine
+TERMINAL_STATES = ('succeeded', 'failed')
+
+
+def format_event(update) -> str:
+    """Message Server-Sent Events pour une mise à jour de progression."""
+    return f"data: {json.dumps(update)}\n\n"
+
+
+class ProgressStore:
+    """
+    Dernière progression connue de chaque job de transcodage, et diffusion des
+    mises à jour aux écouteurs (add_listener) quel que soit le processus qui
+    les publie.
+    """
+    TTL = 24 * 3600  # secondes de conservation de la dernière progression
+
+    def __init__(self):
+        self._listeners = []
+
+    def publish(self, job_id, state, stage=None, percent=None, error=None):
+        update = {
+            'job_id': job_id,
+            'state': state,
+            'stage': stage,
+            'percent': round(percent, 1) if percent is not None else None,
+            'error': error,
+            'updated_at': time.time(),
+        }
+        try:
+            self._store(update)
+        except Exception as e:
+            # La progression est accessoire : ne jamais faire échouer la conversion
+            print(f"Erreur lors de la publication de la progression du job {job_id}: {e}")
+        return update
+
+    def add_listener(self, callback):
+        """callback(update) est appelé, depuis un thread quelconque, à chaque publication."""
+        self._listeners.append(callback)
+
+    def _dispatch(self, update):
+        for callback in list(self._listeners):
+            try:
+                callback(update)
+            except Exception as e:
+                print(f"Erreur dans un écouteur de progression: {e}")
+
+    def latest(self, job_id):
+        raise NotImplementedError
+
+    def _store(self, update):
+        raise NotImplementedError
+
+
+class MemoryProgressStore(ProgressStore):
+    """Progression du processus courant (serveur de développement, Celery en mode eager)."""
+
+    def __init__(self):
+        super().__init__()
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def latest(self, job_id):
+        with self._lock:
+            update = self._latest.get(job_id)
+        if update is not None and time.time() - update['updated_at'] > self.TTL:
+            return None
+        return update
+
+    def _store(self, update):
+        with self._lock:
+            self._latest[update['job_id']] = update
+        self._dispatch(update)
+
+
+class RedisProgressStore(ProgressStore):
+    """
+    Progression partagée entre workers et serveurs web : dernière valeur dans
+    une clé, diffusion sur un canal unique. Chaque processus qui écoute ouvre
+    une seule souscription, quel que soit le nombre de navigateurs connectés.
+    """
+    PREFIX = 'zedtube:progress:'
+    CHANNEL = 'zedtube:progress'
+
+    def __init__(self, redis_url='redis://localhost:6379/0'):
+        super().__init__()
+        import redis
+        self.redis = redis.Redis.from_url(redis_url)
+        self._subscriber = None
+        self._subscriber_lock = threading.Lock()
+
+    def latest(self, job_id):
+        data = self.redis.get(f"{self.PREFIX}{job_id}")
+        return json.loads(data) if data is not None else None
+
+    def _store(self, update):
+        data = json.dumps(update)
+        pipe = self.redis.pipeline()
+        pipe.set(f"{self.PREFIX}{update['job_id']}", data, ex=self.TTL)
+        pipe.publish(self.CHANNEL, data)
+        pipe.execute()
+
+    def add_listener(self, callback):
+        super().add_listener(callback)
+        with self._subscriber_lock:
+            if self._subscriber is None:
+                self._subscriber = threading.Thread(target=self._listen, name='progress-subscriber', daemon=True)
+                self._subscriber.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for message in pubsub.listen():
+                    self._dispatch(json.loads(message['data']))
+            except Exception as e:
+                print(f"Erreur de souscription à la progression: {e}")
+                time.sleep(1)
+
+
+def make_progress_store(app):
+    """Construit le store de progression selon PROGRESS_BACKEND ('memory' ou 'redis')."""
+    if app.config['PROGRESS_BACKEND'] == 'redis':
+        store = RedisProgressStore(app.config['REDIS_URL'])
+    else:
+        store = MemoryProgressStore()
+    app.extensions['progress'] = store
+    return store
+
+
+## Jetons d'accès au flux de progression (serveur progress_stream, sans session Flask)
+def progress_token(secret_key, job_id) -> str:
+    return URLSafeTimedSerializer(secret_key, salt='job-progress').dumps(job_id)
+
+
+def read_progress_token(secret_key, token, max_age=3600, is_active=None):
+    """
+    Identifiant du job autorisé par le jeton, ou None si le jeton est invalide
+    ou expiré. Un jeton expiré reste accepté tant que is_active(job_id) est
+    vrai : un transcodage plus long que max_age garde son flux (reconnexions
+    EventSource comprises).
+    """
+    try:
+        job_id, signed_at = URLSafeTimedSerializer(secret_key, salt='job-progress').loads(token, return_timestamp=True)
+    except BadSignature:
+        return None
+    if (datetime.now(timezone.utc) - signed_at).total_seconds() > max_age:
+        if is_active is None or not is_active(job_id):
+            return None
+    return job_id
+
+
+## Progression d'un encodage ffmpeg (option -progress)
+class FfmpegProgressReader:
+    """
+    Lit incrémentalement le fichier écrit par `ffmpeg -progress <fichier>` :
+    des blocs clé=valeur terminés par progress=continue|end.
+    """
+
+    def __init__(self, path, duration):
+        self.path = path
+        self.duration = duration
+        self._offset = 0
+        self._partial = ''
+        self.out_time = None
+        self.ended = False
+
+    def poll(self):
+        """Ratio d'avancement (0..1), ou None si la durée ou la position sont inconnues."""
+        try:
+            with open(self.path, 'r') as f:
+                f.seek(self._offset)
+                data = f.read()
+                self._offset = f.tell()
+        except FileNotFoundError:
+            return None
+        lines = (self._partial + data).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            key, _, value = line.strip().partition('=')
+            if key == 'out_time_us' and value.isdigit():
+                self.out_time = int(value) / 1e6
+            elif key == 'progress' and value == 'end':
+                self.ended = True
+        if self.ended:
+            return 1.0
+        if not self.duration or self.out_time is None:
+            return None
+        return max(0.0, min(1.0, self.out_time / self.duration))
+
+
+def follow_ffmpeg_progress(future, progress_path, duration, callback, interval=1.0):
+    """Pendant l'exécution de future, appelle callback(ratio) à chaque avancée de l'encodage."""
+    reader = FfmpegProgressReader(progress_path, duration)
+    last = None
+    while True:
+        done, _ = wait([future], timeout=interval)
+        ratio = reader.poll()
+        if ratio is not None and ratio != last:
+            last = ratio
+            callback(ratio)
+        if done:
+            return
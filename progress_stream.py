@@ -0,0 +1,153 @@
+import re
+import asyncio
+import threading
+from urllib.parse import urlsplit, parse_qs
+from progress import TERMINAL_STATES, format_event, read_progress_token
+
+EVENTS_PATH = re.compile(r'^/jobs/(\d+)/events$')
+
+
+class ProgressStreamServer:
+    """
+    Serveur Server-Sent Events de la progression des jobs.
+
+    Une seule boucle asyncio sert toutes les connexions : un navigateur qui
+    attend la fin d'un transcodage ne coûte qu'une coroutine et une file,
+    pas un thread de worker WSGI. Les mises à jour arrivent par
+    store.add_listener (une seule souscription Redis par processus) et sont
+    réparties entre les connexions qui suivent le même job.
+
+    L'accès est autorisé par un jeton signé (progress.progress_token) passé
+    en paramètre ?token=, délivré par l'application Flask avec l'URL du flux ;
+    après token_max_age, il reste valable tant que le job n'est pas terminé.
+    """
+
+    def __init__(self, store, secret_key, host='0.0.0.0', port=8082, heartbeat=15, token_max_age=3600,
+                 request_timeout=10):
+        self.store = store
+        self.secret_key = secret_key
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self.token_max_age = token_max_age
+        self.request_timeout = request_timeout
+        self._loop = None
+        self._server = None
+        self._watchers = {}  # job_id -> ensemble de asyncio.Queue
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def watching(self) -> int:
+        return sum(len(queues) for queues in self._watchers.values())
+
+    def start(self):
+        """Lance le serveur dans un thread dédié (usage embarqué)."""
+        self._thread = threading.Thread(target=self.run, name='progress-stream', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def run(self):
+        """Sert les connexions jusqu'à stop() (bloquant)."""
+        asyncio.run(self._serve())
+
+    def stop(self):
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self.store.add_listener(lambda update: self._loop.call_soon_threadsafe(self._dispatch, update))
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def _dispatch(self, update):
+        for queue in self._watchers.get(update['job_id'], ()):
+            queue.put_nowait(update)
+
+    async def _handle(self, reader, writer):
+        try:
+            job_id = await self._authorize(reader)
+            if job_id is None:
+                writer.write(b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            await self._stream(job_id, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            # Client parti, requête trop longue ou jamais terminée : connexion fermée sans réponse
+            pass
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, RuntimeError):
+                pass
+
+    async def _authorize(self, reader):
+        """Lit la requête HTTP et retourne le job autorisé, ou None."""
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=self.request_timeout)
+        request_line = head.split(b'\r\n', 1)[0].decode('latin-1')
+        try:
+            method, target, _ = request_line.split(' ', 2)
+        except ValueError:
+            return None
+        url = urlsplit(target)
+        match = EVENTS_PATH.match(url.path)
+        if method != 'GET' or match is None:
+            return None
+        token = parse_qs(url.query).get('token', [None])[0]
+        if token is None:
+            return None
+        # Jeton expiré : l'état du job est lu dans le store (bloquant avec Redis)
+        job_id = await self._loop.run_in_executor(None, read_progress_token, self.secret_key, token,
+                                                  self.token_max_age, self._is_active)
+        return job_id if job_id == int(match.group(1)) else None
+
+    def _is_active(self, job_id) -> bool:
+        latest = self.store.latest(job_id)
+        return latest is not None and latest['state'] not in TERMINAL_STATES
+
+    async def _stream(self, job_id, writer):
+        queue = asyncio.Queue()
+        self._watchers.setdefault(job_id, set()).add(queue)
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\n"
+                b"Access-Control-Allow-Origin: *\r\n"
+                b"X-Accel-Buffering: no\r\n"
+                b"Connection: close\r\n\r\n"
+                b"retry: 3000\n\n"
+            )
+            latest = await self._loop.run_in_executor(None, self.store.latest, job_id)
+            if latest is not None:
+                writer.write(format_event(latest).encode())
+                if latest['state'] in TERMINAL_STATES:
+                    return
+            await writer.drain()
+
+            while True:
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                    writer.write(b": ping\n\n")
+                else:
+                    writer.write(format_event(update).encode())
+                    if update['state'] in TERMINAL_STATES:
+                        return
+                await writer.drain()
+        finally:
+            queues = self._watchers.get(job_id)
+            queues.discard(queue)
+            if not queues:
+                del self._watchers[job_id]
@@ -0,0 +1,340 @@
+import os
+import time
+import shutil
+from collections import namedtuple
+from itertools import islice
+from models import db, Video, MediaBlob, Folder, UploadSession, FileDeletion
+from chunked_upload import PARTIAL_DIR
+from hls import MASTER_PLAYLIST
+from storage_layout import VIDEOS_DIR, FOLDERS_DIR, HLS_SUBDIR, THUMBNAIL_SUFFIX
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+# Fichiers jamais supprimés par le réconciliateur : signalés seulement
+KEPT_CATEGORIES = ('unknown',)
+
+# Fichier ou dossier du dossier d'upload sans référence en base (path relatif au dossier d'upload)
+Orphan = namedtuple('Orphan', ['path', 'category', 'size', 'is_dir'])
+
+
+def _classify_name(name, is_dir):
+    if is_dir:
+        # Dossiers de travail de segmented.transcode_segmented et hls.package_hls
+        return 'temporary' if name.endswith(('.segments', '.tmp')) else None
+    if '.tmp.' in name or name.endswith('.progress'):
+        return 'temporary'
+    if name.startswith('folder_') and '_thumb.' in name:
+        return 'folder_thumbnail'
+    if name.endswith(THUMBNAIL_SUFFIX):
+        return 'thumbnail'
+    if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS:
+        return 'video'
+    return 'unknown'
+
+
+def classify(path: str, is_dir: bool):
+    """
+    Catégorie d'un chemin du dossier d'upload (relatif, séparateur '/'), ou
+    None s'il n'est pas géré par l'application. Couvre l'arborescence de
+    storage_layout et l'ancien format à plat.
+    """
+    parts = path.split('/')
+    name = parts[-1]
+    if parts[0] == PARTIAL_DIR:
+        if len(parts) != 2 or is_dir:
+            return None
+        if name.endswith('.part'):
+            return 'partial'
+        return 'temporary' if name.endswith('.upload') else 'unknown'
+    if parts[0] == HLS_SUBDIR:
+        # Ancien emplacement hls/<clé>
+        if len(parts) != 2 or not is_dir:
+            return None
+        return 'temporary' if name.endswith('.tmp') else 'hls'
+    if parts[0] == VIDEOS_DIR:
+        if len(parts) == 4:
+            return 'directory' if is_dir else None
+        if len(parts) != 5:
+            return None
+        if is_dir and name == HLS_SUBDIR:
+            return 'hls'
+    elif parts[0] == FOLDERS_DIR:
+        if len(parts) != 4 or is_dir:
+            return None
+    elif len(parts) != 1:
+        return None
+    return _classify_name(name, is_dir)
+
+
+def referenced_paths(paths) -> set:
+    """Parmi les chemins donnés, ceux qu'une ligne de la base utilise encore (une requête par type)."""
+    partial, hls, directories, files = [], [], {}, []
+    for path in paths:
+        parts = path.split('/')
+        if parts[0] == PARTIAL_DIR:
+            if path.endswith('.part'):
+                partial.append(path)
+        elif parts[-1] == HLS_SUBDIR or (parts[0] == HLS_SUBDIR and len(parts) == 2):
+            hls.append(path)
+        elif parts[0] == VIDEOS_DIR and len(parts) == 4:
+            directories[parts[3]] = path
+        else:
+            files.append(path)
+    found = set()
+
+    if files:
+        for column in (Video.filename, Video.processed_path, MediaBlob.filename, Folder.custom_thumbnail):
+            found.update(row[0] for row in db.session.query(column).filter(column.in_(files)))
+        # Miniature <base>_thumb.jpg d'une vidéo <base>.<ext>
+        thumbnails = {}
+        for path in files:
+            if path.endswith(THUMBNAIL_SUFFIX):
+                base = path[:-len(THUMBNAIL_SUFFIX)]
+                for ext in VIDEO_EXTENSIONS:
+                    thumbnails[base + ext] = thumbnails[base + ext.upper()] = path
+        if thumbnails:
+            found.update(thumbnails[row[0]] for row in
+                         db.session.query(Video.filename).filter(Video.filename.in_(list(thumbnails))))
+
+    if partial:
+        ids = {path[len(PARTIAL_DIR) + 1:-len('.part')]: path for path in partial}
+        found.update(ids[row[0]] for row in
+                     db.session.query(UploadSession.id)
+                     .filter(UploadSession.id.in_(list(ids)), UploadSession.completed_at.is_(None)))
+
+    if hls:
+        playlists = {f"{path}/{MASTER_PLAYLIST}": path for path in hls}
+        found.update(playlists[row[0]] for row in
+                     db.session.query(Video.hls_playlist).filter(Video.hls_playlist.in_(list(playlists))))
+
+    if directories:
+        # Clé de stockage : hash du blob, ou identifiant d'une vidéo sans blob (voir Video.storage_key)
+        found.update(directories[row[0]] for row in
+                     db.session.query(MediaBlob.sha256).filter(MediaBlob.sha256.in_(list(directories))))
+        ids = [int(key) for key in directories if key.isdigit()]
+        if ids:
+            found.update(directories[str(row[0])] for row in
+                         db.session.query(Video.id).filter(Video.id.in_(ids), Video.blob_id.is_(None)))
+    return found
+
+
+def _entries(upload_folder, directory):
+    try:
+        with os.scandir(os.path.join(upload_folder, directory)) as entries:
+            yield from ((f"{directory}/{entry.name}" if directory else entry.name, entry) for entry in entries)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+
+
+def _subdirectories(upload_folder, directory, depth):
+    """Dossiers situés depth niveaux sous directory (préfixes de storage_layout)."""
+    if depth == 0:
+        yield directory
+        return
+    for path, entry in _entries(upload_folder, directory):
+        if entry.is_dir(follow_symlinks=False):
+            yield from _subdirectories(upload_folder, path, depth - 1)
+
+
+def _scan(upload_folder):
+    """
+    Parcourt le dossier d'upload sans le charger en mémoire : (chemin
+    relatif, DirEntry). Le dossier vide d'une vidéo est lui-même renvoyé.
+    """
+    special = (PARTIAL_DIR, HLS_SUBDIR, VIDEOS_DIR, FOLDERS_DIR)
+    for path, entry in _entries(upload_folder, ''):
+        if path not in special:
+            yield path, entry
+    yield from _entries(upload_folder, PARTIAL_DIR)
+    yield from _entries(upload_folder, HLS_SUBDIR)
+    for directory in _subdirectories(upload_folder, VIDEOS_DIR, 2):
+        for path, entry in _entries(upload_folder, directory):
+            empty = True
+            for item in _entries(upload_folder, path):
+                empty = False
+                yield item
+            if empty and entry.is_dir(follow_symlinks=False):
+                yield path, entry
+    for directory in _subdirectories(upload_folder, FOLDERS_DIR, 2):
+        yield from _entries(upload_folder, directory)
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _size(full_path, is_dir) -> int:
+    try:
+        if not is_dir:
+            return os.path.getsize(full_path)
+        return sum(os.path.getsize(os.path.join(directory, name))
+                   for directory, _, files in os.walk(full_path) for name in files)
+    except OSError:
+        return 0
+
+
+def find_orphans(upload_folder: str, grace_period=3600, batch_size=500):
+    """
+    Génère les fichiers orphelins du dossier d'upload, par lots de
+    batch_size entrées confrontés à la base. Les fichiers modifiés depuis
+    moins de grace_period secondes sont ignorés : upload ou conversion en
+    cours, dont la ligne n'est pas encore validée.
+    """
+    cutoff = time.time() - grace_period
+    for batch in _batches(_scan(upload_folder), batch_size):
+        candidates = []
+        for path, entry in batch:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                category = classify(path, is_dir)
+                if category is None or entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            candidates.append((path, category, is_dir))
+        referenced = referenced_paths([path for path, category, _ in candidates if category != 'temporary'])
+        db.session.rollback()  # pas de transaction ouverte pendant les suppressions
+        for path, category, is_dir in candidates:
+            if path not in referenced:
+                yield Orphan(path, category, _size(os.path.join(upload_folder, path), is_dir), is_dir)
+
+
+def remove_path(upload_folder: str, path: str) -> bool:
+    """Efface un fichier ou un dossier du dossier d'upload ; False s'il n'existait plus."""
+    full_path = os.path.join(upload_folder, path)
+    if os.path.isdir(full_path) and not os.path.islink(full_path):
+        shutil.rmtree(full_path)
+        return True
+    try:
+        os.remove(full_path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class ReconcileReport:
+    """Bilan d'un passage : orphelins par catégorie, suppressions et échantillon de chemins."""
+
+    def __init__(self, dry_run, sample_size=20):
+        self.dry_run = dry_run
+        self.sample_size = sample_size
+        self.categories = {}
+        self.samples = []
+        self.deleted = 0
+        self.freed_bytes = 0
+        self.errors = 0
+        self.purged = 0
+        self.pending = 0
+
+    def add(self, orphan):
+        stats = self.categories.setdefault(orphan.category, {'count': 0, 'bytes': 0})
+        stats['count'] += 1
+        stats['bytes'] += orphan.size
+        if len(self.samples) < self.sample_size:
+            self.samples.append(orphan.path)
+
+    @property
+    def orphans(self) -> int:
+        return sum(stats['count'] for stats in self.categories.values())
+
+    def to_dict(self) -> dict:
+        return {
+            'dry_run': self.dry_run,
+            'orphans': self.orphans,
+            'categories': self.categories,
+            'deleted': self.deleted,
+            'freed_bytes': self.freed_bytes,
+            'errors': self.errors,
+            'purged': self.purged,
+            'pending_deletions': self.pending,
+            'samples': self.samples,
+        }
+
+
+def reconcile(upload_folder: str, dry_run=True, grace_period=3600, batch_size=500, on_orphan=None) -> ReconcileReport:
+    """
+    Termine les suppressions en attente puis recherche les orphelins ; en
+    dry_run, seul le bilan est établi. on_orphan(orphan) est appelé pour
+    chaque orphelin trouvé (affichage au fil de l'eau).
+    """
+    report = ReconcileReport(dry_run)
+    if dry_run:
+        report.pending = pending_deletions()
+    else:
+        report.purged = purge_deletions(upload_folder, batch_size)
+    cutoff = time.time() - grace_period
+    for orphan in find_orphans(upload_folder, grace_period, batch_size):
+        report.add(orphan)
+        if on_orphan is not None:
+            on_orphan(orphan)
+        if dry_run or orphan.category in KEPT_CATEGORIES:
+            continue
+        full_path = os.path.join(upload_folder, orphan.path)
+        try:
+            # Revérifié juste avant : un upload a pu reprendre ce nom depuis le lot
+            if os.lstat(full_path).st_mtime > cutoff:
+                continue
+            if orphan.category == 'directory':
+                # Dossier de vidéo vide : rmdir échoue si un fichier y a été rangé entre-temps
+                os.rmdir(full_path)
+                report.deleted += 1
+            elif remove_path(upload_folder, orphan.path):
+                report.deleted += 1
+                report.freed_bytes += orphan.size
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            if orphan.category == 'directory':
+                continue
+            report.errors += 1
+            print(f"Erreur lors de la suppression de {orphan.path}: {e}")
+    return report
+
+
+## Suppressions différées
+def schedule_deletion(*paths):
+    """Programme l'effacement de fichiers (relatifs au dossier d'upload) au commit de la transaction courante."""
+    for path in paths:
+        if path:
+            db.session.add(FileDeletion(path=path))
+
+
+def purge_deletions(upload_folder: str, batch_size=500) -> int:
+    """
+    Efface les fichiers programmés par schedule_deletion, par lots (une
+    transaction par lot). Un fichier de nouveau référencé (même contenu
+    réuploadé depuis) est conservé. Retourne le nombre de lignes traitées.
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        rows = (
+            FileDeletion.query
+            .filter(FileDeletion.id > last_id)
+            .order_by(FileDeletion.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return processed
+        referenced = referenced_paths([row.path for row in rows])
+        for row in rows:
+            last_id = row.id
+            if row.path not in referenced:
+                try:
+                    remove_path(upload_folder, row.path)
+                except OSError as e:
+                    # Ligne conservée : nouvel essai au prochain passage
+                    print(f"Erreur lors de la suppression de {row.path}: {e}")
+                    continue
+            db.session.delete(row)
+            processed += 1
+        db.session.commit()
+
+
+def pending_deletions() -> int:
+    return FileDeletion.query.count()
@@ -0,0 +1,169 @@
+import re
+from sqlalchemy import func, literal_column, or_, and_, table, column, true, text
+from models import db, Video, Folder
+
+# Index plein texte des titres et noms de fichiers des vidéos, et des noms de dossiers :
+#   - SQLite : tables FTS5 à contenu externe (video_fts, folder_fts), tenues à
+#     jour par des triggers sur video et folder ;
+#   - PostgreSQL : colonnes tsvector générées (video.search_vector,
+#     folder.search_vector) et index GIN.
+# Les deux sont créés par la migration ; install_search_index les recrée
+# (bases créées par create_all, triggers perdus lors d'une migration batch
+# qui recopie la table video sous SQLite : voir `flask rebuild-search-index`).
+VIDEO_WEIGHTS = (10.0, 2.0)  # bm25 : title, original_filename
+MAX_TERMS = 8
+FOLDER_RESULTS = 8
+
+_TERM = re.compile(r'\w+')
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS video_fts USING fts5("
+    "title, original_filename, content='video', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS video_fts_insert AFTER INSERT ON video BEGIN "
+    "INSERT INTO video_fts(rowid, title, original_filename) VALUES (new.id, new.title, new.original_filename); END",
+    "CREATE TRIGGER IF NOT EXISTS video_fts_delete AFTER DELETE ON video BEGIN "
+    "INSERT INTO video_fts(video_fts, rowid, title, original_filename) "
+    "VALUES ('delete', old.id, old.title, old.original_filename); END",
+    # Limité aux colonnes indexées : le flush des vues ne touche pas à l'index
+    "CREATE TRIGGER IF NOT EXISTS video_fts_update AFTER UPDATE OF title, original_filename ON video BEGIN "
+    "INSERT INTO video_fts(video_fts, rowid, title, original_filename) "
+    "VALUES ('delete', old.id, old.title, old.original_filename); "
+    "INSERT INTO video_fts(rowid, title, original_filename) VALUES (new.id, new.title, new.original_filename); END",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS folder_fts USING fts5("
+    "name, content='folder', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS folder_fts_insert AFTER INSERT ON folder BEGIN "
+    "INSERT INTO folder_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS folder_fts_delete AFTER DELETE ON folder BEGIN "
+    "INSERT INTO folder_fts(folder_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS folder_fts_update AFTER UPDATE OF name ON folder BEGIN "
+    "INSERT INTO folder_fts(folder_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO folder_fts(rowid, name) VALUES (new.id, new.name); END",
+    # Réindexe le contenu existant
+    "INSERT INTO video_fts(video_fts) VALUES ('rebuild')",
+    "INSERT INTO folder_fts(folder_fts) VALUES ('rebuild')",
+)
+
+# Configuration 'simple' : ni racinisation ni liste de mots vides, comme unicode61 sous SQLite
+POSTGRES_DDL = (
+    "ALTER TABLE video ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(original_filename, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_video_search_vector ON video USING gin (search_vector)",
+    "ALTER TABLE folder ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "to_tsvector('simple', coalesce(name, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_folder_search_vector ON folder USING gin (search_vector)",
+)
+
+FTS_TABLES = ('video_fts', 'folder_fts')
+
+
+def install_search_index(connection):
+    """Crée (ou complète) l'index plein texte et le remplit ; sans effet hors SQLite et PostgreSQL."""
+    ddl = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}.get(connection.dialect.name, ())
+    for statement in ddl:
+        connection.execute(text(statement))
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Filtre d'autogenerate (Alembic) : l'index plein texte n'est pas décrit par les modèles."""
+    if type_ == 'table' and reflected and name.startswith(FTS_TABLES):
+        return False
+    if type_ == 'column' and reflected and name == 'search_vector':
+        return False
+    if type_ == 'index' and reflected and name in ('ix_video_search_vector', 'ix_folder_search_vector'):
+        return False
+    return True
+
+
+def search_terms(query) -> list:
+    """Mots de la recherche (lettres, chiffres), en minuscules ; la syntaxe des moteurs est ignorée."""
+    return [term.lower() for term in _TERM.findall(query or '')][:MAX_TERMS]
+
+
+def _fts5_query(terms) -> str:
+    # Tous les mots, le dernier en préfixe (recherche pendant la frappe)
+    return ' '.join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+
+
+def _tsquery(terms) -> str:
+    return ' & '.join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+def visible_videos(user):
+    """
+    Vidéos visibles : celles de la racine pour tous ; pour un utilisateur
+    connecté, aussi les siennes et celles des dossiers publics ou à lui ;
+    tout pour un administrateur. Suppose une jointure externe sur Folder.
+    """
+    if not user.is_authenticated:
+        return Video.folder_id.is_(None)
+    if user.is_admin:
+        return true()
+    return or_(Video.folder_id.is_(None), Video.user_id == user.id,
+               Folder.is_public == True, Folder.user_id == user.id)
+
+
+def visible_folders(user):
+    """Dossiers affichés sur l'accueil : aucun pour un visiteur anonyme."""
+    if not user.is_authenticated:
+        return None
+    if user.is_admin:
+        return true()
+    return or_(Folder.is_public == True, Folder.user_id == user.id)
+
+
+def search_videos(query, user, page=1, limit=24):
+    """
+    Vidéos correspondant à query, les plus pertinentes d'abord (titre avant
+    nom de fichier). Retourne (vidéos de la page, page suivante ou None).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], None
+
+    videos = Video.query.outerjoin(Folder, Video.folder_id == Folder.id).filter(visible_videos(user))
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        fts = table('video_fts', column('rowid'))
+        videos = (videos.join(fts, fts.c.rowid == Video.id)
+                  .filter(literal_column('video_fts').op('MATCH')(_fts5_query(terms)))
+                  .order_by(func.bm25(literal_column('video_fts'), *VIDEO_WEIGHTS), Video.id.desc()))
+    elif dialect == 'postgresql':
+        vector = literal_column('video.search_vector')
+        tsquery = func.to_tsquery('simple', _tsquery(terms))
+        videos = (videos.filter(vector.op('@@')(tsquery))
+                  .order_by(func.ts_rank_cd(vector, tsquery).desc(), Video.id.desc()))
+    else:
+        # Sans index plein texte : parcours complet, du plus récent au plus ancien
+        videos = (videos.filter(and_(*(or_(Video.title.icontains(term, autoescape=True),
+                                           Video.original_filename.icontains(term, autoescape=True))
+                                       for term in terms)))
+                  .order_by(Video.upload_date.desc(), Video.id.desc()))
+
+    rows = videos.offset((page - 1) * limit).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], page + 1
+    return rows, None
+
+
+def search_folders(query, user, limit=FOLDER_RESULTS):
+    """Dossiers visibles dont le nom correspond à query, les plus pertinents d'abord."""
+    terms = search_terms(query)
+    visible = visible_folders(user)
+    if not terms or visible is None:
+        return []
+
+    folders = Folder.query.filter(visible)
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        fts = table('folder_fts', column('rowid'))
+        folders = (folders.join(fts, fts.c.rowid == Folder.id)
+                   .filter(literal_column('folder_fts').op('MATCH')(_fts5_query(terms)))
+                   .order_by(func.bm25(literal_column('folder_fts')), Folder.name))
+    elif dialect == 'postgresql':
+        vector = literal_column('folder.search_vector')
+        tsquery = func.to_tsquery('simple', _tsquery(terms))
+        folders = folders.filter(vector.op('@@')(tsquery)).order_by(func.ts_rank_cd(vector, tsquery).desc(), Folder.name)
+    else:
+        folders = folders.filter(and_(*(Folder.name.icontains(term, autoescape=True) for term in terms))).order_by(Folder.name)
+    return folders.limit(limit).all()
@@ -0,0 +1,147 @@
+import os
+import glob
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import ffmpeg
+from metrics import timed_stage, record_segments
+
+MIN_SEGMENT_DURATION = 30  # secondes : en dessous, le coût de découpe dépasse le gain
+SEGMENT_PATTERN = 'part_%04d.mkv'
+
+
+class SyncError(RuntimeError):
+    """Dérive audio/vidéo au-delà de la tolérance après concaténation."""
+    pass
+
+
+def should_segment(metadata, file_size, min_duration, min_size) -> bool:
+    """Découpage réservé aux longues vidéos (durée ou taille au-delà des seuils) de durée connue."""
+    duration = (metadata or {}).get('duration')
+    if not duration or duration < 2 * MIN_SEGMENT_DURATION:
+        return False
+    return duration >= min_duration or file_size >= min_size
+
+
+def segment_count(duration, workers, min_segment_duration=MIN_SEGMENT_DURATION) -> int:
+    # Deux segments par worker pour lisser les écarts de complexité entre segments
+    return max(1, min(workers * 2, int(duration // min_segment_duration)))
+
+
+def _stream_duration(path, codec_type='video'):
+    probe = ffmpeg.probe(path)
+    stream = next((s for s in probe['streams'] if s['codec_type'] == codec_type), None)
+    if stream is None:
+        return None
+    value = stream.get('duration') or probe['format'].get('duration')
+    return float(value) if value else None
+
+
+def split_at_keyframes(input_path, work_dir, segments, duration):
+    """
+    Découpe la piste vidéo en copie de flux : le muxer segment coupe à la
+    première image clé après chaque point demandé. L'audio n'est pas découpé,
+    il est encodé d'un seul tenant à l'assemblage.
+    """
+    step = duration / segments
+    times = ','.join(f"{step * i:.3f}" for i in range(1, segments))
+    output_options = {'map': '0:v:0', 'c': 'copy', 'f': 'segment', 'reset_timestamps': 1}
+    if times:
+        output_options['segment_times'] = times
+    (
+        ffmpeg
+        .input(input_path)
+        .output(os.path.join(work_dir, SEGMENT_PATTERN), **output_options)
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return sorted(glob.glob(os.path.join(work_dir, 'part_*.mkv')))
+
+
+def encode_segment(segment_path, threads=1, preset='veryfast'):
+    """Encode un segment en H.264 (un sous-processus ffmpeg)."""
+    output_path = f"{os.path.splitext(segment_path)[0]}.h264.mkv"
+    (
+        ffmpeg
+        .input(segment_path)
+        .output(output_path, vcodec='libx264', pix_fmt='yuv420p', preset=preset, threads=threads)
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return output_path
+
+
+def concat_segments(encoded, input_path, output_path, work_dir, acodec='aac'):
+    """Concatène les segments sans réencodage et y ajoute l'audio complet de la source."""
+    list_path = os.path.join(work_dir, 'segments.txt')
+    with open(list_path, 'w') as f:
+        for path in encoded:
+            f.write(f"file '{path}'\n")
+    video = ffmpeg.input(list_path, f='concat', safe=0)
+    source = ffmpeg.input(input_path)
+    (
+        ffmpeg
+        .output(video.video, source['a?'], output_path, vcodec='copy', acodec=acodec, movflags='+faststart')
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+
+
+def check_sync(source_segments, encoded_segments, output_path, fps=None):
+    """
+    Vérifie qu'aucune frontière de segment ne dérive : la durée cumulée des
+    segments encodés doit suivre celle des segments source, et la piste vidéo
+    finale doit couvrir la piste audio. Tolérance : deux images.
+    Retourne la dérive maximale observée (secondes).
+    """
+    tolerance = 2 / fps if fps else 0.1
+    source_total = encoded_total = drift = 0.0
+    for index, (source, encoded) in enumerate(zip(source_segments, encoded_segments)):
+        source_total += _stream_duration(source) or 0
+        encoded_total += _stream_duration(encoded) or 0
+        drift = max(drift, abs(encoded_total - source_total))
+        if drift > tolerance:
+            raise SyncError(f"Dérive de {drift:.3f}s à la frontière du segment {index}")
+
+    audio_duration = _stream_duration(output_path, 'audio')
+    video_duration = _stream_duration(output_path, 'video')
+    # Le muxer peut arrondir la dernière image ou le dernier paquet audio : une image de marge en plus
+    if audio_duration and video_duration and abs(audio_duration - video_duration) > tolerance * 1.5:
+        raise SyncError(f"Pistes désynchronisées : vidéo {video_duration:.3f}s, audio {audio_duration:.3f}s")
+    return drift
+
+
+def transcode_segmented(input_path, output_path, duration, workers, threads=1, acodec='aac', fps=None, preset='veryfast',
+                        progress=None):
+    """
+    Transcodage parallèle d'une longue vidéo : découpe aux images clés,
+    encodage des segments par au plus `workers` ffmpeg simultanés,
+    concaténation sans perte puis contrôle de la synchronisation A/V.
+    Retourne le nombre de segments. progress(ratio) est appelé à chaque
+    segment encodé.
+
+    Les threads du pool ne font qu'attendre les sous-processus ffmpeg : pas
+    de pool de processus, utilisable depuis un worker Celery prefork.
+    """
+    work_dir = f"{output_path}.segments"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    try:
+        with timed_stage('segment_split'):
+            segments = split_at_keyframes(input_path, work_dir, segment_count(duration, workers), duration)
+        record_segments(len(segments))
+        with timed_stage('segment_encode'), ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ffmpeg') as pool:
+            futures = [pool.submit(encode_segment, segment, threads, preset) for segment in segments]
+            for done, _ in enumerate(as_completed(futures), 1):
+                if progress:
+                    progress(done / len(futures))
+            encoded = [future.result() for future in futures]
+        with timed_stage('segment_concat'):
+            concat_segments(encoded, input_path, output_path, work_dir, acodec)
+            check_sync(segments, encoded, output_path, fps)
+        return len(segments)
+    except Exception:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -152,8 +152,101 @@ async function shareVideo(videoId) {
     }
 }
 
+// Défilement infini de la grille de vidéos (API /api/videos, pagination par curseur)
+function escapeHTML(value) {
+    const div = document.createElement('div');
+    div.textContent = value;
+    return div.innerHTML;
+}
+
+function createVideoCard(video) {
+    const csrfToken = document.querySelector('meta[name="csrf-token"]').content;
+    const deleteForm = video.can_delete ? `
+        <form method="POST" action="${video.delete_url}" data-action="delete-video">
+            <input type="hidden" name="csrf_token" value="${csrfToken}">
+            <button type="submit" class="text-gray-400 hover:text-red-500"
+                    onclick="return confirm('Supprimer cette vidéo définitivement?');">
+                <svg xmlns="http://www.w3.org/2000/svg" class="h-5 w-5" fill="none" viewBox="0 0 24 24" stroke="currentColor">
+                    <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16" />
+                </svg>
+            </button>
+        </form>` : '';
+
+    return `
+    <div class="group relative bg-[#1E1E1E] rounded-lg overflow-hidden shadow-lg hover:shadow-xl transition-shadow"
+         data-video-id="${video.id}">
+        <a href="${video.url}" class="block">
+            <div class="aspect-video bg-black relative">
+                <img src="${video.thumbnail_url}" alt="${escapeHTML(video.title)}" loading="lazy"
+                     class="w-full h-full object-cover">
+            </div>
+        </a>
+        <div class="p-4">
+            <div class="flex justify-between items-start">
+                <div>
+                    <h3 class="text-white font-medium truncate">${escapeHTML(video.title || 'Sans titre')}</h3>
+                    <p class="text-xs text-gray-400 mt-1">
+                        ${video.upload_date} • ${video.views} vue${video.views > 1 ? 's' : ''}
+                    </p>
+                </div>
+                <div class="flex space-x-2">
+                    <button data-action="share" class="text-gray-400 hover:text-white">
+                        <svg xmlns="http://www.w3.org/2000/svg" class="h-5 w-5" fill="none" viewBox="0 0 24 24" stroke="currentColor">
+                            <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M8.684 13.342C8.886 12.938 9 12.482 9 12c0-.482-.114-.938-.316-1.342m0 2.684a3 3 0 110-2.684m0 2.684l6.632 3.316m-6.632-6l6.632-3.316m0 0a3 3 0 105.367-2.684 3 3 0 00-5.367 2.684zm0 9.316a3 3 0 105.368 2.684 3 3 0 00-5.368-2.684z" />
+                        </svg>
+                    </button>
+                    ${deleteForm}
+                </div>
+            </div>
+        </div>
+    </div>`;
+}
+
+function setupInfiniteScroll() {
+    const container = document.getElementById('videos-container');
+    const sentinel = document.getElementById('videos-sentinel');
+    if (!container || !sentinel || !('IntersectionObserver' in window)) return;
+
+    let loading = false;
+    const stop = () => {
+        observer.disconnect();
+        sentinel.remove();
+    };
+
+    const observer = new IntersectionObserver(async (entries) => {
+        if (!entries[0].isIntersecting || loading) return;
+        const cursor = container.dataset.nextCursor;
+        if (!cursor) return stop();
+
+        loading = true;
+        try {
+            const url = new URL(container.dataset.apiUrl, window.location.origin);
+            url.searchParams.set('cursor', cursor);
+            const response = await fetch(url, { credentials: 'same-origin' });
+            if (!response.ok) throw new Error('Erreur serveur');
+
+            const data = await response.json();
+            container.insertAdjacentHTML('beforeend', data.videos.map(createVideoCard).join(''));
+            container.dataset.nextCursor = data.next_cursor || '';
+            if (!data.next_cursor) return stop();
+
+            // Le sentinel peut encore être visible : relancer l'observation
+            observer.unobserve(sentinel);
+            observer.observe(sentinel);
+        } catch (error) {
+            console.error('Error:', error);
+            showAlert('Erreur lors du chargement des vidéos', 'error');
+        } finally {
+            loading = false;
+        }
+    }, { rootMargin: '400px' });
+
+    observer.observe(sentinel);
+}
+
 // Initialisation
 document.addEventListener('DOMContentLoaded', () => {
     setupFolderActions();
     setupVideoActions();
+    setupInfiniteScroll();
 });
\ No newline at end of file
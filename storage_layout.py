@@ -0,0 +1,76 @@
+import os
+import re
+import hashlib
+
+# Arborescence du dossier d'upload (chemins relatifs enregistrés en base) :
+#   videos/ab/cd/<clé>/<sha256>.<ext>         original (voir blob_store.ingest_blob)
+#   videos/ab/cd/<clé>/<uuid>.mp4             version convertie, à côté de l'original
+#   videos/ab/cd/<clé>/<uuid>_thumb.jpg       miniature : <vidéo sans extension>_thumb.jpg
+#   videos/ab/cd/<clé>/hls/                   échelle HLS
+#   folders/ef/01/folder_<id>_thumb.<ext>     miniature personnalisée d'un dossier
+# La clé est Video.storage_key (hash du blob, ou identifiant d'une vidéo sans blob) ;
+# ab/cd sont tirés de son hash : au plus 256 entrées par niveau de préfixe.
+# Les fichiers antérieurs, à plat à la racine, restent lisibles jusqu'à leur
+# déplacement par `flask migrate-storage` (voir storage_migration.py).
+VIDEOS_DIR = 'videos'
+FOLDERS_DIR = 'folders'
+HLS_SUBDIR = 'hls'
+THUMBNAIL_SUFFIX = '_thumb.jpg'
+
+_HEX_DIGEST = re.compile(r'[0-9a-f]{64}')
+
+
+def shard(key) -> str:
+    """Préfixe haché 'ab/cd' d'une clé."""
+    key = str(key)
+    digest = key if _HEX_DIGEST.fullmatch(key) else hashlib.sha256(key.encode()).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}"
+
+
+def video_dir(storage_key) -> str:
+    """Dossier propre à une vidéo (ou à un blob) : original et dérivés."""
+    return f"{VIDEOS_DIR}/{shard(storage_key)}/{storage_key}"
+
+
+def video_file(storage_key, name: str) -> str:
+    """Fichier (original ou dérivé) rangé dans le dossier de la vidéo."""
+    return f"{video_dir(storage_key)}/{name}"
+
+
+def blob_path(digest: str, extension: str) -> str:
+    return video_file(digest, f"{digest}.{extension.lower()}")
+
+
+def thumbnail_path(filename: str) -> str:
+    """Miniature d'une vidéo, par convention à côté d'elle."""
+    return f"{os.path.splitext(filename)[0]}{THUMBNAIL_SUFFIX}"
+
+
+def hls_path(storage_key) -> str:
+    return f"{video_dir(storage_key)}/{HLS_SUBDIR}"
+
+
+def legacy_hls_path(storage_key) -> str:
+    """Emplacement HLS de l'ancien format à plat."""
+    return f"{HLS_SUBDIR}/{storage_key}"
+
+
+def folder_thumbnail_path(folder_id, extension: str) -> str:
+    return f"{FOLDERS_DIR}/{shard(folder_id)}/folder_{folder_id}_thumb.{extension.lower()}"
+
+
+def is_sharded(path: str) -> bool:
+    return path.startswith((VIDEOS_DIR + '/', FOLDERS_DIR + '/'))
+
+
+def absolute(upload_folder: str, path: str, create=False) -> str:
+    """Chemin sur disque d'un chemin relatif ; create=True crée son dossier parent."""
+    full_path = os.path.join(upload_folder, path)
+    if create:
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    return full_path
+
+
+def relative(upload_folder: str, full_path: str) -> str:
+    """Chemin relatif au dossier d'upload, tel qu'enregistré en base."""
+    return os.path.relpath(full_path, upload_folder).replace(os.sep, '/')
@@ -0,0 +1,189 @@
+import os
+import shutil
+from sqlalchemy import update
+from models import db, Video, MediaBlob, Folder, TranscodeJob
+from reconciler import schedule_deletion, purge_deletions
+from storage_layout import (
+    VIDEOS_DIR, FOLDERS_DIR, video_file, hls_path, thumbnail_path, folder_thumbnail_path, is_sharded, absolute,
+)
+
+ACTIVE_STATES = (TranscodeJob.PENDING, TranscodeJob.RUNNING, TranscodeJob.RETRYING)
+
+
+def _link_file(src, dst):
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return dst
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Système de fichiers sans liens physiques
+        shutil.copy2(src, dst)
+    return dst
+
+
+def _link(src, dst):
+    """Second nom pour un fichier ou une arborescence (liens physiques : ni copie ni fenêtre d'absence)."""
+    if os.path.isdir(src):
+        shutil.copytree(src, dst, copy_function=_link_file, dirs_exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        _link_file(src, dst)
+
+
+def _moves(videos, storage_key, blob=None) -> dict:
+    """{ancien chemin: nouveau chemin} des fichiers à plat d'un groupe de vidéos de même storage_key."""
+    moves = {}
+    paths = [blob.filename] if blob is not None else []
+    for video in videos:
+        paths += [video.filename, video.processed_path, thumbnail_path(video.filename)]
+        if video.hls_playlist and not is_sharded(video.hls_playlist):
+            moves[os.path.dirname(video.hls_playlist)] = hls_path(storage_key)
+    for path in paths:
+        if path and not is_sharded(path):
+            moves[path] = video_file(storage_key, os.path.basename(path))
+    return moves
+
+
+def _moved(path, moves):
+    if path is None:
+        return None
+    if path in moves:
+        return moves[path]
+    directory, name = os.path.split(path)
+    return f"{moves[directory]}/{name}" if directory in moves else path
+
+
+def migrate_group(upload_folder, videos, storage_key, blob=None, dry_run=False):
+    """
+    Range les fichiers d'une vidéo (ou de toutes les vidéos d'un blob) dans
+    leur dossier. Les nouveaux noms sont créés avant la mise à jour de la
+    base et les anciens effacés après : la vidéo reste servie pendant tout
+    le déplacement. Retourne (résultat, fichiers déplacés) avec résultat
+    parmi 'moved', 'busy' (conversion en cours), 'missing' et 'conflict'.
+    """
+    video_ids = [video.id for video in videos]
+    if video_ids and TranscodeJob.query.filter(TranscodeJob.video_id.in_(video_ids),
+                                               TranscodeJob.state.in_(ACTIVE_STATES)).first() is not None:
+        return 'busy', 0
+    main = blob.filename if blob is not None else videos[0].filename
+    if not os.path.exists(absolute(upload_folder, main)):
+        return 'missing', 0
+    moves = _moves(videos, storage_key, blob)
+    existing = [old for old in moves if os.path.exists(absolute(upload_folder, old))]
+    if dry_run:
+        return 'moved', len(existing)
+
+    for old in existing:
+        _link(absolute(upload_folder, old), absolute(upload_folder, moves[old]))
+
+    # Mises à jour conditionnelles : annulées si une conversion a changé les fichiers entre-temps
+    updated = True
+    if blob is not None:
+        updated = db.session.execute(
+            update(MediaBlob)
+            .where(MediaBlob.id == blob.id, MediaBlob.filename == blob.filename)
+            .values(filename=_moved(blob.filename, moves))
+        ).rowcount == 1
+    for video in videos:
+        updated = updated and db.session.execute(
+            update(Video)
+            .where(Video.id == video.id, Video.filename == video.filename)
+            .values(filename=_moved(video.filename, moves),
+                    processed_path=_moved(video.processed_path, moves),
+                    hls_playlist=_moved(video.hls_playlist, moves))
+        ).rowcount == 1
+    if not updated:
+        # Les nouveaux noms, inutilisés, seront retirés par le réconciliateur
+        db.session.rollback()
+        return 'conflict', 0
+    schedule_deletion(*existing)
+    db.session.commit()
+    return 'moved', len(existing)
+
+
+def migrate_folder(upload_folder, folder, dry_run=False):
+    old = folder.custom_thumbnail
+    if not os.path.exists(absolute(upload_folder, old)):
+        return 'missing', 0
+    if dry_run:
+        return 'moved', 1
+    new = folder_thumbnail_path(folder.id, old.rsplit('.', 1)[-1])
+    _link(absolute(upload_folder, old), absolute(upload_folder, new))
+    updated = db.session.execute(
+        update(Folder).where(Folder.id == folder.id, Folder.custom_thumbnail == old).values(custom_thumbnail=new)
+    ).rowcount == 1
+    if not updated:
+        db.session.rollback()
+        return 'conflict', 0
+    schedule_deletion(old)
+    db.session.commit()
+    return 'moved', 1
+
+
+def _groups(batch_size):
+    """Lots de (vidéos, storage_key, blob) encore à plat : blobs, puis vidéos sans blob."""
+    last_id = 0
+    while True:
+        blobs = (MediaBlob.query
+                 .filter(MediaBlob.id > last_id, ~MediaBlob.filename.startswith(f"{VIDEOS_DIR}/"))
+                 .order_by(MediaBlob.id).limit(batch_size).all())
+        if not blobs:
+            break
+        last_id = blobs[-1].id
+        yield [(blob.videos, blob.sha256, blob) for blob in blobs]
+    last_id = 0
+    while True:
+        videos = (Video.query
+                  .filter(Video.id > last_id, Video.blob_id.is_(None), ~Video.filename.startswith(f"{VIDEOS_DIR}/"))
+                  .order_by(Video.id).limit(batch_size).all())
+        if not videos:
+            break
+        last_id = videos[-1].id
+        yield [([video], video.storage_key, None) for video in videos]
+
+
+def migrate_storage(upload_folder, batch_size=100, limit=None, dry_run=False, on_batch=None) -> dict:
+    """
+    Migration en ligne vers storage_layout, par lots : l'application reste
+    servie et peut être relancée à tout moment (les vidéos déjà rangées,
+    ou en cours de conversion, sont ignorées). on_batch(folder_ids) est
+    appelé après chaque lot pour invalider les listes en cache.
+    """
+    stats = dict.fromkeys(('moved', 'files', 'busy', 'missing', 'conflict', 'folders'), 0)
+    for batch in _groups(batch_size):
+        folder_ids = set()
+        for videos, storage_key, blob in batch:
+            if limit is not None and stats['moved'] >= limit:
+                break
+            result, files = migrate_group(upload_folder, videos, storage_key, blob, dry_run)
+            stats[result] += 1
+            stats['files'] += files
+            if result == 'moved':
+                folder_ids.update(video.folder_id for video in videos)
+        if not dry_run:
+            purge_deletions(upload_folder, batch_size)
+        if on_batch is not None and folder_ids and not dry_run:
+            on_batch(folder_ids)
+        if limit is not None and stats['moved'] >= limit:
+            return stats
+
+    last_id = 0
+    while True:
+        folders = (Folder.query
+                   .filter(Folder.id > last_id, Folder.custom_thumbnail.isnot(None),
+                           ~Folder.custom_thumbnail.startswith(f"{FOLDERS_DIR}/"))
+                   .order_by(Folder.id).limit(batch_size).all())
+        if not folders:
+            break
+        last_id = folders[-1].id
+        for folder in folders:
+            result, files = migrate_folder(upload_folder, folder, dry_run)
+            stats['folders' if result == 'moved' else result] += 1
+            stats['files'] += files
+        if not dry_run:
+            purge_deletions(upload_folder, batch_size)
+            if on_batch is not None:
+                on_batch(set())
+    return stats
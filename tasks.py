@@ -0,0 +1,433 @@
+import os
+import threading
+from datetime import datetime
+from celery import Celery, Task
+from sqlalchemy import update
+from models import db, Video, TranscodeJob
+from utils import send_discord_log, probe_media, plan_conversion
+from backends import get_backend, resolve_backend_name, plan_local_pool, backend_for_plan
+from hls import package_hls, hls_dir
+from transcode_watcher import TranscodeWatcher
+from cache import listing_tag, FOLDERS_TAG
+from metrics import timed_stage
+from estimator import processing_estimator
+from reconciler import reconcile, purge_deletions
+from storage_layout import absolute, relative
+
+_flask_app = None
+
+
+class FlaskTask(Task):
+    """Tâche Celery exécutée dans le contexte de l'application Flask."""
+
+    def __call__(self, *args, **kwargs):
+        with _flask_app.app_context():
+            return super().__call__(*args, **kwargs)
+
+
+celery = Celery(__name__, task_cls=FlaskTask)
+
+
+def init_celery(app):
+    """Configure Celery à partir de la configuration Flask.
+
+    Avec CELERY_BROKER_URL='memory://' et CELERY_TASK_ALWAYS_EAGER=True les
+    jobs s'exécutent en mémoire, sans Redis (utile pour les tests).
+
+    Les encodages (run_transcode_job, package_hls_job) passent par la file
+    TRANSCODE_QUEUE : sa concurrence borne l'usage CPU, chaque job occupant
+    threads_per_job coeurs (backends.plan_local_pool). Workers à lancer :
+        flask transcode-worker                   # file de transcodage, --concurrency calculé
+        celery -A app.celery worker -Q celery    # autres tâches
+        flask transcode-watcher                  # suivi des jobs cloud, un seul processus
+        celery -A app.celery beat                # réconciliation, si RECONCILE_INTERVAL est non nul
+    """
+    global _flask_app
+    _flask_app = app
+    celery.conf.update(
+        broker_url=app.config['CELERY_BROKER_URL'],
+        result_backend=app.config['CELERY_RESULT_BACKEND'],
+        task_always_eager=app.config['CELERY_TASK_ALWAYS_EAGER'],
+        task_acks_late=True,
+        worker_prefetch_multiplier=1,
+        task_routes={
+            'tasks.run_transcode_job': {'queue': app.config['TRANSCODE_QUEUE']},
+            'tasks.package_hls_job': {'queue': app.config['TRANSCODE_QUEUE']},
+        },
+    )
+    if app.config['RECONCILE_INTERVAL']:
+        # Planifié par `celery -A app.celery beat` (l'application doit être chargée pour
+        # que cette configuration existe) ; RECONCILE_INTERVAL=0 désactive le passage
+        celery.conf.beat_schedule = {
+            'reconcile-upload-folder': {'task': 'tasks.reconcile_files', 'schedule': app.config['RECONCILE_INTERVAL']},
+        }
+    app.extensions['celery'] = celery
+    return celery
+
+
+def enqueue_transcode(video, backend=None):
+    """Crée un TranscodeJob pour la vidéo et le place dans la file Celery."""
+    job = TranscodeJob(video_id=video.id, backend=backend or resolve_backend_name(_flask_app.config))
+    db.session.add(job)
+    db.session.commit()
+
+    publish_progress(job, stage='queued', percent=0)
+    result = run_transcode_job.delay(job.id)
+    # En mode eager la tâche a déjà tourné dans une autre session
+    db.session.refresh(job)
+    if job.task_id is None:
+        job.task_id = result.id
+        db.session.commit()
+    return job
+
+
+@celery.task(bind=True, name='tasks.run_transcode_job', max_retries=3, default_retry_delay=30)
+def run_transcode_job(self, job_id):
+    job = db.session.get(TranscodeJob, job_id)
+    if job is None or job.is_finished:
+        return None
+
+    video = job.video
+    input_path = absolute(_flask_app.config['UPLOAD_FOLDER'], video.filename)
+
+    job.state = TranscodeJob.RUNNING
+    job.attempts += 1
+    job.task_id = self.request.id
+    job.started_at = job.started_at or datetime.utcnow()
+    job.error = None
+    db.session.commit()
+    publish_progress(job, stage='probe', percent=0)
+
+    try:
+        # Décision sur les métadonnées enregistrées à l'ingestion (nouvelle analyse si absentes)
+        metadata = video.stored_metadata() or probe_media(input_path) or {}
+        plan = plan_conversion(metadata)
+        backend = get_backend(backend_for_plan(job.backend, plan), _flask_app.config)
+        job.backend = backend.name
+        job.record_input(os.path.getsize(input_path), metadata, plan['path'])
+        if backend.asynchronous:
+            # Le worker est libéré tout de suite : `flask transcode-watcher` prend le relais
+            job.external_id, job.external_output = backend.start(video, input_path, plan)
+            db.session.commit()
+            if celery.conf.task_always_eager:
+                # Sans worker ni processus de suivi : suivi dans ce processus
+                get_transcode_watcher().watch(job.external_id, job.id)
+            return job.state
+        db.session.commit()
+        publish_progress(job, stage='transcode', percent=0)
+        with timed_stage('transcode', backend.name):
+            output_filename = backend.transcode(video, input_path, plan, progress=_progress_callback(job))
+    except Exception as e:
+        job.error = str(e)
+        if self.request.retries < self.max_retries:
+            job.state = TranscodeJob.RETRYING
+            db.session.commit()
+            publish_progress(job, error=job.error)
+            raise self.retry(exc=e, countdown=self.default_retry_delay * (2 ** self.request.retries))
+
+        fail_transcode(job, e)
+        return job.state
+
+    complete_transcode(job, output_filename, plan['path'])
+    return job.state
+
+
+def complete_transcode(job, output_filename, conversion_path):
+    """Remplace l'original par le fichier converti et marque le job réussi."""
+    video = job.video
+    input_path = absolute(_flask_app.config['UPLOAD_FOLDER'], video.filename)
+
+    # Supprimer le fichier original
+    if output_filename != video.filename:
+        try:
+            os.remove(input_path)
+        except OSError as e:
+            print(f"Erreur lors de la suppression du fichier original: {e}")
+
+    # Toutes les vidéos du même contenu partagent le fichier converti
+    metadata = probe_media(absolute(_flask_app.config['UPLOAD_FOLDER'], output_filename))
+    if video.blob is not None:
+        video.blob.filename = output_filename
+        video.blob.transcoded = True
+    converted_videos = video.blob.videos if video.blob is not None else [video]
+    for converted in converted_videos:
+        converted.filename = output_filename
+        converted.is_converted = True
+        converted.conversion_path = conversion_path
+        converted.apply_metadata(metadata)
+    job.state = TranscodeJob.SUCCEEDED
+    job.finished_at = datetime.utcnow()
+    # Durée de l'essai réussi, apprise par l'estimateur (premiers essais seulement)
+    if job.started_at is not None:
+        job.processing_seconds = (job.finished_at - job.started_at).total_seconds()
+    db.session.commit()
+    publish_progress(job, stage='done', percent=100)
+
+    # Les miniatures des listes suivent le nouveau nom de fichier
+    _flask_app.extensions['cache'].invalidate(FOLDERS_TAG, *{listing_tag(v.folder_id) for v in converted_videos})
+
+    send_discord_log(f"✅ Vidéo convertie avec succès : {video.title or video.filename}")
+
+    if _flask_app.config['HLS_ENABLED']:
+        package_hls_job.delay(video.id)
+
+
+def fail_transcode(job, error):
+    video = job.video
+    job.state = TranscodeJob.FAILED
+    job.error = str(error)
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    publish_progress(job, error=job.error)
+    send_discord_log(f"❌ Erreur lors de la conversion de la vidéo : {video.title or video.filename} ({error})")
+
+
+## Progression en direct (voir progress.py)
+def publish_progress(job, stage=None, percent=None, error=None):
+    return _flask_app.extensions['progress'].publish(job.id, job.state, stage=stage, percent=percent, error=error)
+
+
+def _progress_callback(job):
+    """callback(ratio) pour backend.transcode ; ne publie qu'à chaque point de pourcentage gagné."""
+    store = _flask_app.extensions['progress']
+    job_id, state = job.id, job.state
+    last = 0
+
+    def callback(ratio):
+        nonlocal last
+        percent = int(ratio * 100)
+        if percent > last:
+            last = percent
+            store.publish(job_id, state, stage='transcode', percent=percent)
+    return callback
+
+
+## File d'attente : estimations
+ACTIVE_STATES = (TranscodeJob.PENDING, TranscodeJob.RUNNING, TranscodeJob.RETRYING)
+
+
+def estimate_job(job) -> dict:
+    """Durée estimée d'un job, sur les caractéristiques de son entrée (mesurées ou enregistrées à l'ingestion)."""
+    processing_estimator.refresh()
+    if job.conversion_path is not None:
+        size, metadata, conversion_path = job.input_size, job.input_metadata(), job.conversion_path
+    else:
+        video = job.video
+        metadata = video.stored_metadata() or {}
+        conversion_path = plan_conversion(metadata)['path']
+        if video.blob is not None:
+            size = video.blob.size
+        else:
+            path = absolute(_flask_app.config['UPLOAD_FOLDER'], video.filename)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+    backend = backend_for_plan(job.backend, {'path': conversion_path})
+    return dict(processing_estimator.estimate(size, metadata, backend, conversion_path), backend=backend)
+
+
+def _remaining(job, estimate, now):
+    if job.state == TranscodeJob.RUNNING and job.started_at is not None:
+        return max(0.0, estimate['estimated_seconds'] - (now - job.started_at).total_seconds())
+    return estimate['estimated_seconds']
+
+
+def queue_backlog(backend='local', before_job_id=None) -> float:
+    """
+    Secondes de travail en attente sur un backend, réparties sur ses
+    TRANSCODE_WORKERS workers. Les jobs cloud s'exécutent en parallèle chez
+    le fournisseur : ils ne retardent pas les suivants.
+    """
+    if backend != 'local':
+        return 0.0
+    query = TranscodeJob.query.filter(TranscodeJob.state.in_(ACTIVE_STATES))
+    if before_job_id is not None:
+        query = query.filter(TranscodeJob.id < before_job_id)
+    now = datetime.utcnow()
+    total = 0.0
+    for job in query:
+        estimate = estimate_job(job)
+        if estimate['backend'] == backend:
+            total += _remaining(job, estimate, now)
+    return total / max(1, _flask_app.config['TRANSCODE_WORKERS'])
+
+
+def job_eta(job) -> dict:
+    """Estimation du job et délai avant sa fin (attente des jobs précédents comprise)."""
+    estimate = estimate_job(job)
+    if job.is_finished:
+        return dict(estimate, eta_seconds=0)
+    eta = _remaining(job, estimate, datetime.utcnow())
+    if job.state != TranscodeJob.RUNNING:
+        eta += queue_backlog(estimate['backend'], before_job_id=job.id)
+    return dict(estimate, eta_seconds=round(eta))
+
+
+def queue_depth() -> dict:
+    """{(état, backend): nombre} des jobs non terminés, pour metrics.QueueDepthCollector."""
+    rows = (
+        db.session.query(TranscodeJob.state, TranscodeJob.backend, db.func.count())
+        .filter(TranscodeJob.state.in_(ACTIVE_STATES))
+        .group_by(TranscodeJob.state, TranscodeJob.backend)
+        .all()
+    )
+    return {(state, backend): count for state, backend, count in rows}
+
+
+## Suivi des jobs Cloud Transcoder
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def get_transcode_watcher():
+    """Watcher partagé par le processus."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is not None:
+            return _watcher
+        from transcoder import create_async_transcoder_client
+
+        config = _flask_app.config
+        _watcher = TranscodeWatcher(
+            create_async_transcoder_client,
+            on_complete=_cloud_job_succeeded,
+            on_failure=_cloud_job_failed,
+            on_progress=_cloud_job_progress,
+            initial_delay=config['TRANSCODE_POLL_INITIAL_DELAY'],
+            max_delay=config['TRANSCODE_POLL_MAX_DELAY'],
+        )
+        _watcher.start()
+        return _watcher
+
+
+def resume_cloud_jobs(watcher) -> int:
+    """
+    Fait suivre par watcher les jobs cloud en cours (déjà suivis : sans
+    effet). Appelé périodiquement par `flask transcode-watcher`, seul
+    processus à suivre les jobs lancés par les workers.
+    """
+    running = TranscodeJob.query.filter(
+        TranscodeJob.state == TranscodeJob.RUNNING,
+        TranscodeJob.external_id.isnot(None)
+    ).all()
+    for job in running:
+        watcher.watch(job.external_id, job.id)
+    return len(running)
+
+
+def _claim_cloud_job(job_id, job_name):
+    """
+    Réserve la fin d'un job cloud : UPDATE conditionnel qui retire
+    external_id d'un job encore RUNNING sur ce job distant. Un seul appelant
+    obtient la ligne (deux watchers voyant le même job terminé ne le
+    finalisent qu'une fois) ; None si le job a déjà été pris ou n'est plus
+    en cours.
+    """
+    claimed = db.session.execute(
+        update(TranscodeJob)
+        .where(TranscodeJob.id == job_id, TranscodeJob.state == TranscodeJob.RUNNING,
+               TranscodeJob.external_id == job_name)
+        .values(external_id=None)
+    ).rowcount
+    db.session.commit()
+    if claimed != 1:
+        return None
+    return db.session.get(TranscodeJob, job_id)
+
+
+def _cloud_job_succeeded(job_name, remote_job, job_id):
+    with _flask_app.app_context():
+        job = _claim_cloud_job(job_id, job_name)
+        if job is None:
+            return
+        try:
+            backend = get_backend(job.backend, _flask_app.config)
+            output_filename = backend.finish(job.video, job.external_output)
+        except Exception as e:
+            _retry_or_fail(job, e)
+            return
+        complete_transcode(job, output_filename, 'transcode')
+
+
+def _cloud_job_progress(job_name, remote_job, job_id):
+    # Transcoder ne publie pas d'avancement : pourcentage estimé sur le temps écoulé
+    with _flask_app.app_context():
+        job = db.session.get(TranscodeJob, job_id)
+        if job is None or job.is_finished or job.started_at is None:
+            return
+        estimated = estimate_job(job)['estimated_seconds']
+        elapsed = (datetime.utcnow() - job.started_at).total_seconds()
+        publish_progress(job, stage='transcode', percent=min(95.0, 100 * elapsed / max(1, estimated)))
+
+
+def _cloud_job_failed(job_name, remote_job, job_id):
+    with _flask_app.app_context():
+        job = _claim_cloud_job(job_id, job_name)
+        if job is None:
+            return
+        error = getattr(getattr(remote_job, 'error', None), 'message', None)
+        _retry_or_fail(job, error or 'Le job de transcodage a échoué')
+
+
+def _retry_or_fail(job, error):
+    # Même politique que run_transcode_job : 1 essai + max_retries
+    if job.attempts <= run_transcode_job.max_retries:
+        job.state = TranscodeJob.RETRYING
+        job.error = str(error)
+        job.external_id = job.external_output = None
+        db.session.commit()
+        run_transcode_job.apply_async(
+            (job.id,), countdown=run_transcode_job.default_retry_delay * (2 ** (job.attempts - 1))
+        )
+    else:
+        fail_transcode(job, error)
+
+
+@celery.task(bind=True, name='tasks.package_hls_job', max_retries=2, default_retry_delay=60)
+def package_hls_job(self, video_id):
+    """Génère l'échelle de qualités HLS d'une vidéo convertie."""
+    video = db.session.get(Video, video_id)
+    if video is None:
+        return None
+
+    config = _flask_app.config
+    input_path = absolute(config['UPLOAD_FOLDER'], video.filename)
+    output_dir = hls_dir(config['UPLOAD_FOLDER'], video.storage_key)
+    _, threads = plan_local_pool(config.get('LOCAL_TRANSCODE_CONCURRENCY'), config.get('LOCAL_TRANSCODE_THREADS'))
+
+    try:
+        master_path = package_hls(input_path, output_dir, config['HLS_SEGMENT_DURATION'], threads=threads,
+                                  source_size=(video.width, video.height) if video.height else None)
+    except Exception as e:
+        print(f"Erreur lors du packaging HLS de la vidéo {video_id}: {e}")
+        raise self.retry(exc=e)
+
+    hls_playlist = relative(config['UPLOAD_FOLDER'], master_path)
+    for packaged in (video.blob.videos if video.blob is not None else [video]):
+        packaged.hls_playlist = hls_playlist
+    db.session.commit()
+    return hls_playlist
+
+
+## Nettoyage du dossier d'upload (voir reconciler.py)
+@celery.task(name='tasks.purge_file_deletions')
+def purge_file_deletions():
+    """Efface les fichiers des vidéos supprimées, après le commit de leur suppression."""
+    config = _flask_app.config
+    return purge_deletions(config['UPLOAD_FOLDER'], config['RECONCILE_BATCH_SIZE'])
+
+
+@celery.task(name='tasks.reconcile_files')
+def reconcile_files(dry_run=None):
+    """Passage périodique : suppressions en attente et orphelins (effacés si RECONCILE_DELETE_ORPHANS)."""
+    config = _flask_app.config
+    if dry_run is None:
+        dry_run = not config['RECONCILE_DELETE_ORPHANS']
+        # Les suppressions programmées sont sûres : terminées même si les orphelins sont seulement signalés
+        purged = purge_deletions(config['UPLOAD_FOLDER'], config['RECONCILE_BATCH_SIZE'])
+    else:
+        purged = 0
+    report = reconcile(config['UPLOAD_FOLDER'], dry_run=dry_run,
+                       grace_period=config['RECONCILE_GRACE_PERIOD'], batch_size=config['RECONCILE_BATCH_SIZE'])
+    report.purged += purged
+    if report.orphans:
+        print(f"Réconciliation du dossier d'upload : {report.to_dict()}")
+    return report.to_dict()
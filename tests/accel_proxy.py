@@ -0,0 +1,61 @@
+import os
+import time
+from urllib.parse import unquote
+
+from werkzeug.utils import safe_join, send_file
+
+ACCEL_PREFIX = '/_media/'
+
+
+class MockAccelProxy:
+    """
+    Proxy frontal minimal : transmet la requête à l'application et, si la réponse
+    porte X-Accel-Redirect, sert le fichier lui-même (plages et requêtes
+    conditionnelles comprises) en conservant Content-Type et Cache-Control,
+    comme la location nginx `internal`. worker_times reçoit la durée de chaque
+    appel à l'application (utilisé par benchmarks/bench_media.py).
+    """
+
+    def __init__(self, app, root, prefix=ACCEL_PREFIX):
+        self.app = app
+        self.root = root
+        self.prefix = prefix
+        self.worker_times = []
+
+    def _relay(self, body, started):
+        try:
+            yield from body
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+            self.worker_times.append(time.perf_counter() - started)
+
+    def __call__(self, environ, start_response):
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured['status'], captured['headers'] = status, headers
+
+        started = time.perf_counter()
+        body = self.app(environ, capture)
+        headers = dict(captured['headers'])
+        target = headers.get('X-Accel-Redirect')
+        if target is None:
+            # Mode direct : le worker reste occupé jusqu'au dernier octet
+            start_response(captured['status'], captured['headers'])
+            return self._relay(body, started)
+        chunks = list(body)
+        if hasattr(body, 'close'):
+            body.close()
+        self.worker_times.append(time.perf_counter() - started)
+
+        assert not b''.join(chunks), "une réponse X-Accel-Redirect doit être vide"
+        assert target.startswith(self.prefix), target
+        path = safe_join(self.root, unquote(target[len(self.prefix):]))
+        if path is None or not os.path.isfile(path):
+            start_response('404 NOT FOUND', [('Content-Length', '0')])
+            return []
+        response = send_file(path, environ, mimetype=headers.get('Content-Type'), conditional=True, etag=True)
+        if 'Cache-Control' in headers:
+            response.headers['Cache-Control'] = headers['Cache-Control']
+        return response(environ, start_response)
@@ -0,0 +1,80 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+import pytest
+
+# Configuration lue à l'import de app.py : base et broker jetables, Celery en mode eager
+_tmp = tempfile.mkdtemp(prefix='zedtube_tests_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmp, 'tests.db')}")
+os.environ.setdefault('CELERY_BROKER_URL', 'memory://')
+os.environ.setdefault('CELERY_RESULT_BACKEND', 'cache+memory://')
+os.environ.setdefault('CELERY_TASK_ALWAYS_EAGER', '1')
+os.environ.setdefault('TRANSCODE_BACKEND', 'local')
+os.environ.setdefault('HLS_ENABLED', '0')
+os.environ.setdefault('METRICS_ENABLED', '0')
+
+from app import app as flask_app, cache  # noqa: E402
+from models import db, User  # noqa: E402
+from search import install_search_index  # noqa: E402
+from utils import discord_notifier  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Application sur une base vide et un dossier d'upload temporaire."""
+    monkeypatch.setitem(flask_app.config, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setitem(flask_app.config, 'WTF_CSRF_ENABLED', False)
+    monkeypatch.setitem(flask_app.config, 'TESTING', True)
+    os.makedirs(flask_app.config['UPLOAD_FOLDER'])
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        with db.engine.begin() as connection:
+            install_search_index(connection)
+        db.session.remove()
+    cache.clear()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def discord_messages(monkeypatch):
+    """Messages Discord émis pendant le test (jamais envoyés)."""
+    messages = []
+    monkeypatch.setattr(discord_notifier, 'send', lambda message: messages.append(message) or True)
+    return messages
+
+
+@pytest.fixture
+def user(app):
+    with app.app_context():
+        user = User(username='zed', can_upload=True)
+        user.set_password('motdepasse')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def client(app, user, discord_messages):
+    """Client connecté en tant qu'utilisateur autorisé à uploader."""
+    client = app.test_client()
+    client.post('/login', data={'username': 'zed', 'password': 'motdepasse'})
+    return client
+
+
+@pytest.fixture
+def sample_video(tmp_path):
+    """Vidéo de deux secondes (H.264 dans un MKV, à remuxer) générée par ffmpeg."""
+    if shutil.which('ffmpeg') is None:
+        pytest.skip('ffmpeg introuvable')
+    path = tmp_path / 'sample.mkv'
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=duration=2:size=160x120:rate=10',
+         '-f', 'lavfi', '-i', 'sine=duration=2', '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-shortest', str(path)],
+        check=True,
+    )
+    return path
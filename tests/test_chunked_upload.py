@@ -0,0 +1,75 @@
+import pytest
+
+import app as app_module
+from models import db, Video, UploadSession
+
+
+@pytest.fixture
+def uploaded(client):
+    """Session d'upload par morceaux dont tous les octets ont été reçus."""
+    content = b'contenu video ' * 64
+
+    def make():
+        created = client.post('/uploads', json={'filename': 'essai.mp4', 'size': len(content), 'title': 'Essai'})
+        assert created.status_code == 201
+        upload_id = created.get_json()['upload_id']
+        response = client.patch(f"/uploads/{upload_id}", data=content,
+                                headers={'Upload-Offset': '0', 'Content-Type': 'application/offset+octet-stream'})
+        assert response.status_code == 204
+        return upload_id
+    return make
+
+
+def test_commit_creates_video_once(app, client, uploaded):
+    upload_id = uploaded()
+    assert client.post(f"/uploads/{upload_id}/commit").status_code == 201
+    assert client.post(f"/uploads/{upload_id}/commit").status_code == 404
+    with app.app_context():
+        assert Video.query.count() == 1
+
+
+def test_failed_commit_can_be_retried(app, client, uploaded, monkeypatch):
+    upload_id = uploaded()
+    finish_upload = app_module.finish_upload
+    calls = []
+
+    def failing_once(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError('base indisponible')
+        return finish_upload(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, 'finish_upload', failing_once)
+    monkeypatch.setitem(app.config, 'PROPAGATE_EXCEPTIONS', False)
+    assert client.post(f"/uploads/{upload_id}/commit").status_code == 500
+    with app.app_context():
+        assert db.session.get(UploadSession, upload_id).completed_at is None
+
+    assert client.post(f"/uploads/{upload_id}/commit").status_code == 201
+    with app.app_context():
+        assert db.session.get(UploadSession, upload_id).completed_at is not None
+        assert Video.query.count() == 1
+
+
+def test_concurrent_commits_create_one_video(app, client, uploaded, monkeypatch):
+    upload_id = uploaded()
+    current_offset = app_module.current_offset
+    responses = []
+    interleaved = []
+
+    def offset_then_concurrent_commit(path):
+        offset = current_offset(path)
+        if not interleaved:
+            # Une seconde validation arrive pendant que la première a passé les vérifications
+            interleaved.append(True)
+            other = app.test_client()
+            other.post('/login', data={'username': 'zed', 'password': 'motdepasse'})
+            responses.append(other.post(f"/uploads/{upload_id}/commit").status_code)
+        return offset
+
+    monkeypatch.setattr(app_module, 'current_offset', offset_then_concurrent_commit)
+    first = client.post(f"/uploads/{upload_id}/commit")
+    assert responses == [201]
+    assert first.status_code == 409
+    with app.app_context():
+        assert Video.query.count() == 1
@@ -0,0 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import has_app_context
+
+from estimator import processing_estimator
+
+
+def test_refresh_without_app_context_is_a_no_op(app):
+    # Cas du thread ffmpeg de LocalTranscodeBackend : le contexte Flask n'y est pas transmis
+    with app.app_context(), ThreadPoolExecutor(max_workers=1) as runner:
+        assert runner.submit(has_app_context).result() is False
+        assert runner.submit(processing_estimator.refresh, True).result() is None
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import event
+
+from app import cache
+from models import db, Folder, Video
+
+SIZES = [(1, 1), (10, 5), (50, 20), (200, 10)]
+MAX_QUERIES = 3  # utilisateur, dossiers avec leurs aperçus, page de vidéos
+
+
+def seed(user_id, folders, videos_per_folder):
+    """Dossiers (publics ou à l'utilisateur) remplis de vidéos, et autant de vidéos à la racine."""
+    for i in range(folders):
+        folder = Folder(name=f"Dossier {i}", user_id=user_id, is_public=i % 2 == 0)
+        db.session.add(folder)
+        db.session.flush()
+        db.session.add_all([
+            Video(filename=f"f{i}_v{j}.mp4", original_filename=f"v{j}.mp4", user_id=user_id, folder_id=folder.id)
+            for j in range(videos_per_folder)
+        ])
+    db.session.add_all([
+        Video(filename=f"racine_{folders}_{j}.mp4", original_filename=f"r{j}.mp4", user_id=user_id)
+        for j in range(videos_per_folder)
+    ])
+    db.session.commit()
+
+
+def count_queries(app, client, url='/'):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize('logged_in', [True, False], ids=['connecte', 'anonyme'])
+def test_home_query_count_is_constant(app, client, user, logged_in):
+    if not logged_in:
+        client.get('/logout')
+    counts = []
+    for folders, videos_per_folder in SIZES:
+        with app.app_context():
+            seed(user, folders, videos_per_folder)
+        # Base peuplée sans passer par les routes : les entrées en cache sont périmées
+        cache.clear()
+        counts.append(count_queries(app, client))
+
+    assert max(counts) <= MAX_QUERIES, counts
+    assert len(set(counts)) == 1, f"Requêtes par taille de bibliothèque : {dict(zip(SIZES, counts))}"
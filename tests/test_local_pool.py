@@ -0,0 +1,19 @@
+import pytest
+
+from backends import plan_local_pool
+
+
+@pytest.mark.parametrize('concurrency, threads, cpus, expected', [
+    (None, None, 8, (2, 4)),
+    (None, None, 1, (1, 1)),
+    (4, None, 8, (4, 2)),
+    (None, 2, 8, (4, 2)),
+    (2, 8, 8, (2, 4)),
+    # Concurrence demandée au-delà des coeurs : ramenée au nombre de coeurs
+    (16, None, 4, (4, 1)),
+    (16, 2, 4, (4, 1)),
+])
+def test_plan_never_oversubscribes_cores(concurrency, threads, cpus, expected):
+    planned = plan_local_pool(concurrency, threads, cpus)
+    assert planned == expected
+    assert planned[0] * planned[1] <= cpus
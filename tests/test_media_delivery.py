@@ -0,0 +1,103 @@
+import os
+
+import pytest
+from flask import Flask
+from werkzeug.test import Client
+
+from media import send_media, IMMUTABLE_CACHE_CONTROL
+from models import db, Video
+from tests.accel_proxy import MockAccelProxy, ACCEL_PREFIX
+
+SIZE = 256 * 1024
+
+
+@pytest.fixture
+def media_dir(tmp_path):
+    directory = tmp_path / 'media'
+    (directory / 'videos' / 'ab').mkdir(parents=True)
+    (directory / 'videos' / 'ab' / 'film é.mp4').write_bytes(os.urandom(SIZE))
+    (tmp_path / 'secret.mp4').write_bytes(b'hors du dossier servi')
+    return directory
+
+
+def make_app(directory, delivery):
+    app = Flask(__name__)
+    app.config['UPLOAD_FOLDER'] = str(directory)
+    app.config['MEDIA_DELIVERY'] = delivery
+    app.config['MEDIA_ACCEL_PREFIX'] = ACCEL_PREFIX
+
+    @app.route('/media')
+    def media():
+        return send_media(os.path.join(directory, 'videos', 'ab', 'film é.mp4'), mimetype='video/mp4')
+
+    @app.route('/outside')
+    def outside():
+        return send_media(os.path.join(directory, '..', 'secret.mp4'), mimetype='video/mp4')
+
+    return app
+
+
+@pytest.fixture(params=['direct', 'x-accel'])
+def delivered(request, media_dir):
+    """Client vu du navigateur : application seule en mode direct, derrière le proxy en x-accel."""
+    return Client(MockAccelProxy(make_app(media_dir, request.param), str(media_dir)))
+
+
+def test_full_download_keeps_type_and_cache_headers(delivered, media_dir):
+    response = delivered.get('/media')
+    assert response.status_code == 200
+    assert response.data == (media_dir / 'videos' / 'ab' / 'film é.mp4').read_bytes()
+    assert response.headers['Content-Type'] == 'video/mp4'
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_range_and_revalidation(delivered, media_dir):
+    expected = (media_dir / 'videos' / 'ab' / 'film é.mp4').read_bytes()
+    response = delivered.get('/media', headers={'Range': 'bytes=1000-2023'})
+    assert response.status_code == 206
+    assert response.data == expected[1000:2024]
+    assert response.headers['Content-Range'] == f"bytes 1000-2023/{SIZE}"
+
+    etag = response.headers['ETag']
+    assert delivered.get('/media', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_accel_response_is_empty_and_points_inside_prefix(media_dir):
+    client = Client(make_app(media_dir, 'x-accel'))
+    response = client.get('/media')
+    assert response.status_code == 200
+    assert response.data == b''
+    assert response.headers['X-Accel-Redirect'] == f"{ACCEL_PREFIX}videos/ab/film%20%C3%A9.mp4"
+    assert response.headers['Content-Type'] == 'video/mp4'
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_path_outside_root_is_not_offloaded(media_dir):
+    client = Client(make_app(media_dir, 'x-accel'))
+    response = client.get('/outside')
+    assert response.status_code == 404
+    assert 'X-Accel-Redirect' not in response.headers
+
+
+def test_sendfile_gives_absolute_path(media_dir):
+    client = Client(make_app(media_dir, 'x-sendfile'))
+    response = client.get('/media')
+    assert response.data == b''
+    assert response.headers['X-Sendfile'] == str(media_dir / 'videos' / 'ab' / 'film é.mp4')
+    assert response.headers['Content-Type'] == 'video/mp4'
+
+
+def test_video_route_offloads_uploaded_file(app, user, monkeypatch):
+    monkeypatch.setitem(app.config, 'MEDIA_DELIVERY', 'x-accel')
+    with app.app_context():
+        video = Video(filename='videos/12/video.mp4', original_filename='video.mp4', user_id=user)
+        db.session.add(video)
+        db.session.commit()
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'videos', '12'))
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], 'videos', '12', 'video.mp4'), 'wb') as f:
+        f.write(b'\0' * 1024)
+
+    proxy = MockAccelProxy(app, app.config['UPLOAD_FOLDER'], app.config['MEDIA_ACCEL_PREFIX'])
+    response = Client(proxy).get('/video/video.mp4', headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 206
+    assert response.data == b'\0' * 100
@@ -0,0 +1,139 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import notifications
+from notifications import DiscordNotifier, DISCORD_MESSAGE_LIMIT
+
+
+class StubResponse:
+    def __init__(self, status_code=204, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.body = body
+
+    def json(self):
+        if self.body is None:
+            raise ValueError('pas de JSON')
+        return self.body
+
+
+class StubSession:
+    """Session HTTP du webhook : enregistre les envois et répond avec les réponses prévues (204 ensuite)."""
+
+    def __init__(self, responses=(), gate=None):
+        self.responses = list(responses)
+        self.posts = []
+        self.gate = gate
+        self.first_post = threading.Event()
+
+    def post(self, url, json, timeout):
+        self.posts.append(json['content'])
+        self.first_post.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        return self.responses.pop(0) if self.responses else StubResponse()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Attentes demandées par le thread d'envoi (réduites à quelques millisecondes)."""
+    delays = []
+
+    def sleep(seconds):
+        if threading.current_thread().name == 'discord-notifier':
+            delays.append(seconds)
+        time.sleep(min(seconds, 0.005))
+
+    monkeypatch.setattr(notifications, 'time', SimpleNamespace(monotonic=time.monotonic, sleep=sleep))
+    return delays
+
+
+def make_notifier(session, **kwargs):
+    kwargs.setdefault('coalesce_window', 0.2)
+    return DiscordNotifier('https://discord.test/api/webhooks/1/jeton', session=session, **kwargs)
+
+
+def test_messages_are_coalesced_into_one_post(sleeps):
+    session = StubSession()
+    notifier = make_notifier(session)
+    for message in ('un', 'deux', 'trois'):
+        assert notifier.send(message)
+    assert notifier.flush()
+
+    assert session.posts == ['un\ndeux\ntrois']
+    stats = notifier.snapshot()
+    assert (stats['queued'], stats['sent'], stats['batches'], stats['pending']) == (3, 3, 1, 0)
+
+
+def test_batch_is_split_at_discord_message_limit(sleeps):
+    session = StubSession()
+    notifier = make_notifier(session)
+    long_message = 'x' * (DISCORD_MESSAGE_LIMIT // 2 + 100)
+    notifier.send(long_message)
+    notifier.send(long_message)
+    assert notifier.flush()
+
+    assert session.posts == [long_message, long_message]
+    assert notifier.snapshot()['batches'] == 2
+
+
+def test_full_queue_drops_messages(sleeps):
+    gate = threading.Event()
+    session = StubSession(gate=gate)
+    notifier = make_notifier(session, max_queue=2, coalesce_window=0)
+    notifier.send('en cours')
+    # Le thread d'envoi est bloqué sur le premier message : la file se remplit
+    assert session.first_post.wait(5)
+    assert notifier.send('a') and notifier.send('b')
+    assert not notifier.send('abandonné')
+    gate.set()
+    assert notifier.flush()
+
+    assert 'abandonné' not in '\n'.join(session.posts)
+    stats = notifier.snapshot()
+    assert (stats['queued'], stats['dropped'], stats['sent']) == (3, 1, 3)
+
+
+def test_rate_limited_post_waits_retry_after(sleeps):
+    session = StubSession([StubResponse(429, {'Retry-After': '0.75'}), StubResponse(204)])
+    notifier = make_notifier(session)
+    notifier.send('limité')
+    assert notifier.flush()
+
+    assert session.posts == ['limité', 'limité']
+    assert 0.75 in sleeps
+    stats = notifier.snapshot()
+    assert (stats['rate_limited'], stats['retries'], stats['sent'], stats['failed']) == (1, 1, 1, 0)
+
+
+def test_rate_limit_from_json_body(sleeps):
+    session = StubSession([StubResponse(429, body={'retry_after': 1.5}), StubResponse(204)])
+    notifier = make_notifier(session)
+    notifier.send('limité')
+    assert notifier.flush()
+    assert 1.5 in sleeps
+
+
+def test_server_errors_back_off_then_give_up(sleeps):
+    session = StubSession([StubResponse(503)] * 3)
+    notifier = make_notifier(session, max_attempts=3)
+    notifier.send('perdu')
+    assert notifier.flush()
+
+    assert len(session.posts) == 3
+    assert [delay for delay in sleeps if delay >= 1] == [1.0, 2.0, 4.0]
+    stats = notifier.snapshot()
+    assert (stats['failed'], stats['retries'], stats['sent']) == (1, 2, 0)
+
+
+def test_client_error_is_not_retried(sleeps):
+    session = StubSession([StubResponse(404)])
+    notifier = make_notifier(session)
+    notifier.send('webhook supprimé')
+    assert notifier.flush()
+
+    assert len(session.posts) == 1
+    assert notifier.snapshot()['failed'] == 1
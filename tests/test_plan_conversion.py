@@ -0,0 +1,23 @@
+import pytest
+
+from utils import plan_conversion
+
+WEB_VIDEO = {'video_codec': 'h264', 'pix_fmt': 'yuv420p', 'duration': 10.0}
+
+
+@pytest.mark.parametrize('metadata', [None, {}], ids=['none', 'vide'])
+def test_unknown_metadata_reencodes_everything(metadata):
+    assert plan_conversion(metadata) == {'path': 'transcode', 'vcodec': 'libx264', 'acodec': 'aac'}
+
+
+@pytest.mark.parametrize('metadata, expected', [
+    (dict(WEB_VIDEO, audio_codec='aac'), {'path': 'remux', 'vcodec': 'copy', 'acodec': 'copy'}),
+    # Analyse réussie sans piste audio : rien à réencoder côté audio
+    (dict(WEB_VIDEO, audio_codec=None), {'path': 'remux', 'vcodec': 'copy', 'acodec': 'copy'}),
+    (dict(WEB_VIDEO, audio_codec='opus'), {'path': 'audio', 'vcodec': 'copy', 'acodec': 'aac'}),
+    (dict(WEB_VIDEO, video_codec='hevc', audio_codec='aac'), {'path': 'video', 'vcodec': 'libx264', 'acodec': 'copy'}),
+    (dict(WEB_VIDEO, video_codec='vp9', audio_codec=None), {'path': 'transcode', 'vcodec': 'libx264', 'acodec': 'copy'}),
+    (dict(WEB_VIDEO, pix_fmt='yuv444p', audio_codec='opus'), {'path': 'transcode', 'vcodec': 'libx264', 'acodec': 'aac'}),
+])
+def test_only_incompatible_streams_are_reencoded(metadata, expected):
+    assert plan_conversion(metadata) == expected
@@ -0,0 +1,81 @@
+import json
+import socket
+
+import pytest
+
+from progress import MemoryProgressStore, progress_token, read_progress_token
+from progress_stream import ProgressStreamServer
+
+SECRET = 'secret-de-test'
+
+
+@pytest.fixture
+def store():
+    return MemoryProgressStore()
+
+
+@pytest.fixture
+def server(store):
+    server = ProgressStreamServer(store, SECRET, host='127.0.0.1', port=0, heartbeat=0.2, request_timeout=0.3)
+    server.start()
+    yield server
+    server.stop()
+
+
+def request(server, path):
+    """Envoie une requête GET et retourne tout ce que le serveur a écrit avant de fermer."""
+    with socket.create_connection(('127.0.0.1', server.port), timeout=5) as sock:
+        sock.sendall(f"GET {path} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+        chunks = []
+        while chunk := sock.recv(65536):
+            chunks.append(chunk)
+    return b''.join(chunks).decode()
+
+
+def events(response):
+    return [json.loads(line[len('data: '):]) for line in response.splitlines() if line.startswith('data: ')]
+
+
+def test_expired_token_is_accepted_only_while_job_is_active():
+    token = progress_token(SECRET, 7)
+    assert read_progress_token(SECRET, token) == 7
+    assert read_progress_token(SECRET, token, max_age=-1) is None
+    assert read_progress_token(SECRET, token, max_age=-1, is_active=lambda job_id: job_id == 7) == 7
+    assert read_progress_token(SECRET, token, max_age=-1, is_active=lambda job_id: False) is None
+    assert read_progress_token('autre-secret', token, is_active=lambda job_id: True) is None
+
+
+def test_stream_ends_with_terminal_state(server, store):
+    store.publish(3, 'succeeded', stage='done', percent=100)
+    response = request(server, f"/jobs/3/events?token={progress_token(SECRET, 3)}")
+    assert response.startswith('HTTP/1.1 200 OK')
+    assert [update['state'] for update in events(response)] == ['succeeded']
+
+
+def test_expired_token_keeps_stream_of_running_job(server, store):
+    server.token_max_age = -1
+    token = progress_token(SECRET, 4)
+    store.publish(4, 'succeeded')
+    assert request(server, f"/jobs/4/events?token={token}").startswith('HTTP/1.1 403')
+
+    store.publish(5, 'running', stage='transcode', percent=40)
+    with socket.create_connection(('127.0.0.1', server.port), timeout=5) as sock:
+        sock.sendall(f"GET /jobs/5/events?token={progress_token(SECRET, 5)} HTTP/1.1\r\n\r\n".encode())
+        assert sock.recv(65536).startswith(b'HTTP/1.1 200 OK')
+        store.publish(5, 'failed', error='ffmpeg')
+        chunks = []
+        while chunk := sock.recv(65536):
+            chunks.append(chunk)
+    assert events(b''.join(chunks).decode())[-1]['state'] == 'failed'
+
+
+def test_token_for_another_job_is_refused(server, store):
+    assert request(server, f"/jobs/2/events?token={progress_token(SECRET, 1)}").startswith('HTTP/1.1 403')
+
+
+def test_incomplete_request_is_closed_after_timeout(server):
+    with socket.create_connection(('127.0.0.1', server.port), timeout=5) as sock:
+        sock.sendall(b"GET /jobs/1/events HTTP/1.1\r\n")
+        assert sock.recv(1024) == b''
+    # Le serveur continue de servir les connexions suivantes
+    assert request(server, '/jobs/1/events').startswith('HTTP/1.1 403')
@@ -0,0 +1,42 @@
+import os
+
+import app as app_module
+import thumbnails
+from models import db, Video
+from thumbnails import ThumbnailService
+
+
+def test_failure_cache_is_bounded(monkeypatch):
+    def fail(video_path, thumbnail_path):
+        raise RuntimeError('vidéo illisible')
+
+    monkeypatch.setattr(thumbnails, 'generate_thumbnail', fail)
+    service = ThumbnailService(max_workers=1, max_failures=2)
+    try:
+        for name in ('a', 'b', 'c'):
+            assert service.request(f"/videos/{name}.mp4", f"/thumbs/{name}.jpg").result(timeout=5) is False
+        # Le plus ancien échec est oublié, les suivants restent en cache négatif
+        assert not service.is_failed('/videos/a.mp4')
+        assert service.is_failed('/videos/b.mp4') and service.is_failed('/videos/c.mp4')
+        assert service.request('/videos/c.mp4', '/thumbs/c.jpg') is None
+        assert len(service._failures) == 2
+    finally:
+        service.shutdown()
+
+
+def test_only_known_videos_are_regenerated(app, client, monkeypatch):
+    requested = []
+    monkeypatch.setattr(app_module.thumbnail_service, 'request',
+                        lambda video_path, thumbnail_path: requested.append(video_path))
+    upload_folder = app.config['UPLOAD_FOLDER']
+    for name in ('connue.mp4', 'inconnue.mp4'):
+        with open(os.path.join(upload_folder, name), 'wb') as f:
+            f.write(b'\0' * 16)
+    with app.app_context():
+        db.session.add(Video(filename='connue.mp4', original_filename='connue.mp4', user_id=1))
+        db.session.commit()
+
+    assert client.get('/thumbnail/inconnue.mp4').status_code == 200
+    assert requested == []
+    assert client.get('/thumbnail/connue.mp4').status_code == 200
+    assert requested == [os.path.join(upload_folder, 'connue.mp4')]
@@ -0,0 +1,56 @@
+from models import db, Video, TranscodeJob
+
+
+def test_upload_enqueues_job_that_succeeds(app, client, sample_video):
+    with open(sample_video, 'rb') as f:
+        response = client.post('/upload', data={'video': (f, 'sample.mkv'), 'title': 'Essai', 'convert': 'true'},
+                               headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['status'] == 'queued'
+
+    with app.app_context():
+        job = db.session.get(TranscodeJob, body['job_id'])
+        assert job.video_id == body['video_id']
+        assert job.backend == 'local'
+        assert job.state == TranscodeJob.SUCCEEDED
+        assert job.attempts == 1
+        assert job.finished_at is not None
+
+        video = db.session.get(Video, body['video_id'])
+        assert video.is_converted
+        assert video.filename.endswith('.mp4')
+        assert video.conversion_path == 'remux'
+
+    status = client.get(body['status_url']).get_json()
+    assert status['state'] == TranscodeJob.SUCCEEDED
+
+
+def test_upload_without_conversion_creates_no_job(app, client, sample_video):
+    with open(sample_video, 'rb') as f:
+        response = client.post('/upload', data={'video': (f, 'sample.mkv'), 'convert': 'false'},
+                               headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+    assert response.status_code == 201
+    with app.app_context():
+        assert TranscodeJob.query.count() == 0
+
+
+def test_duplicate_upload_reuses_converted_blob(app, client, sample_video):
+    def upload():
+        with open(sample_video, 'rb') as f:
+            return client.post('/upload', data={'video': (f, 'sample.mkv'), 'convert': 'true'},
+                               headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+
+    first = upload().get_json()
+    response = upload()
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['deduplicated']
+
+    with app.app_context():
+        assert TranscodeJob.query.count() == 1
+        original = db.session.get(Video, first['video_id'])
+        duplicate = db.session.get(Video, body['video_id'])
+        assert duplicate.filename == original.filename
+        assert duplicate.conversion_path == original.conversion_path == 'remux'
+        assert duplicate.duration == original.duration
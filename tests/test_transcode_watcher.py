@@ -0,0 +1,148 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import tasks
+import transcode_watcher
+from backends import CloudTranscodeBackend
+from models import db, Video, TranscodeJob
+from storage_layout import absolute
+from transcode_watcher import TranscodeWatcher
+
+
+class FakeTranscoderClient:
+    """Client Transcoder : chaque job parcourt la suite d'états donnée, le dernier est répété."""
+
+    def __init__(self, states, error=None):
+        self.states = {name: list(sequence) for name, sequence in states.items()}
+        self.error = error
+        self.calls = []
+
+    def get_job(self, name):
+        self.calls.append(name)
+        sequence = self.states[name]
+        state = sequence.pop(0) if len(sequence) > 1 else sequence[0]
+        return SimpleNamespace(state=state, error=SimpleNamespace(message=self.error) if self.error else None)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Délais demandés par le watcher entre deux interrogations (sans attendre)."""
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        delays.append(round(delay, 6))
+        await real_sleep(0)
+
+    monkeypatch.setattr(transcode_watcher.asyncio, 'sleep', fake_sleep)
+    return delays
+
+
+@pytest.fixture
+def watcher_for():
+    watchers = []
+
+    def make(client, **kwargs):
+        kwargs.setdefault('on_complete', tasks._cloud_job_succeeded)
+        kwargs.setdefault('on_failure', tasks._cloud_job_failed)
+        watcher = TranscodeWatcher(lambda: client, initial_delay=1, max_delay=4, factor=2, jitter=0, **kwargs)
+        watchers.append(watcher)
+        return watcher
+
+    yield make
+    for watcher in watchers:
+        watcher.stop()
+
+
+@pytest.fixture
+def cloud_job(app, user):
+    """Vidéo en cours de conversion par un job Transcoder ('jobs/1')."""
+    with app.app_context():
+        video = Video(filename='videos/source.mkv', original_filename='source.mkv', title='Cloud', user_id=user,
+                      is_converted=False)
+        db.session.add(video)
+        db.session.flush()
+        job = TranscodeJob(video_id=video.id, backend='cloud', state=TranscodeJob.RUNNING, attempts=1,
+                           external_id='jobs/1', external_output='output/1/')
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+@pytest.fixture
+def finished_outputs(app, monkeypatch):
+    """Remplace le téléchargement de la sortie du job : fichier vide, nom enregistré."""
+    fetched = []
+
+    def finish(self, video, output_folder):
+        output_filename = f"videos/converted_{video.id}.mp4"
+        open(absolute(app.config['UPLOAD_FOLDER'], output_filename, create=True), 'wb').close()
+        fetched.append(output_folder)
+        return output_filename
+
+    monkeypatch.setattr(CloudTranscodeBackend, 'finish', finish)
+    return fetched
+
+
+def test_backoff_grows_while_state_is_unchanged(sleeps, watcher_for):
+    client = FakeTranscoderClient({'jobs/1': ['PENDING', 'PENDING', 'PENDING', 'PENDING', 'RUNNING', 'SUCCEEDED']})
+    completed = []
+    watcher = watcher_for(client, on_complete=lambda name, job, context: completed.append((name, context)),
+                          on_failure=lambda name, job, context: None)
+
+    assert watcher.watch('jobs/1', 'contexte').result(timeout=5) == 'SUCCEEDED'
+    # Doublement jusqu'à max_delay, retour à initial_delay au changement d'état
+    assert sleeps == [1, 2, 4, 4, 1]
+    assert completed == [('jobs/1', 'contexte')]
+    assert watcher.watching() == 0
+
+
+def test_completed_cloud_job_is_finished_once(app, cloud_job, finished_outputs, discord_messages, sleeps, watcher_for):
+    client = FakeTranscoderClient({'jobs/1': ['RUNNING', 'SUCCEEDED']})
+    watcher = watcher_for(client)
+    with app.app_context():
+        assert tasks.resume_cloud_jobs(watcher) == 1
+    assert watcher.watch('jobs/1', cloud_job).result(timeout=5) == 'SUCCEEDED'
+
+    with app.app_context():
+        job = db.session.get(TranscodeJob, cloud_job)
+        assert job.state == TranscodeJob.SUCCEEDED
+        assert job.external_id is None
+        assert job.video.filename == f"videos/converted_{job.video_id}.mp4"
+        assert job.video.is_converted
+        assert job.video.conversion_path == 'transcode'
+        # Un second watcher voyant le même job terminé ne le finalise pas à nouveau
+        tasks._cloud_job_succeeded('jobs/1', None, cloud_job)
+        assert tasks.resume_cloud_jobs(watcher) == 0
+    assert finished_outputs == ['output/1/']
+    assert len(discord_messages) == 1
+
+
+def test_failed_cloud_job_is_retried_then_failed(app, cloud_job, discord_messages, sleeps, watcher_for, monkeypatch):
+    retries = []
+    monkeypatch.setattr(tasks.run_transcode_job, 'apply_async', lambda args, countdown: retries.append((args, countdown)))
+    client = FakeTranscoderClient({'jobs/1': ['FAILED'], 'jobs/2': ['FAILED']}, error='Entrée illisible')
+    watcher = watcher_for(client)
+
+    assert watcher.watch('jobs/1', cloud_job).result(timeout=5) == 'FAILED'
+    with app.app_context():
+        job = db.session.get(TranscodeJob, cloud_job)
+        assert job.state == TranscodeJob.RETRYING
+        assert job.error == 'Entrée illisible'
+        assert retries == [((cloud_job,), tasks.run_transcode_job.default_retry_delay)]
+
+        # Dernier essai : le job échoue définitivement
+        job.state = TranscodeJob.RUNNING
+        job.attempts = tasks.run_transcode_job.max_retries + 1
+        job.external_id = 'jobs/2'
+        db.session.commit()
+
+    assert watcher.watch('jobs/2', cloud_job).result(timeout=5) == 'FAILED'
+    with app.app_context():
+        job = db.session.get(TranscodeJob, cloud_job)
+        assert job.state == TranscodeJob.FAILED
+        assert job.finished_at is not None
+    assert len(retries) == 1
+    assert any('Entrée illisible' in message for message in discord_messages)
@@ -0,0 +1,25 @@
+import time
+from types import SimpleNamespace
+
+import transcoder
+
+
+def test_jobs_started_in_the_same_second_use_distinct_prefixes(tmp_path, monkeypatch):
+    uploads, jobs = [], []
+    monkeypatch.setattr(transcoder, 'upload_to_gcs',
+                        lambda path, bucket, blob_name: uploads.append(blob_name) or f"gs://{bucket}/{blob_name}")
+    monkeypatch.setattr(transcoder, 'create_transcode_job',
+                        lambda input_uri, output_uri, *args: jobs.append((input_uri, output_uri)) or f"jobs/{len(jobs)}")
+    # Horloge figée : les deux jobs démarrent dans la même seconde
+    monkeypatch.setattr(transcoder, 'time', SimpleNamespace(time=lambda: 1_700_000_000.0, sleep=time.sleep))
+    source = tmp_path / 'video.mp4'
+    source.write_bytes(b'\0')
+
+    first = transcoder.start_transcode(str(source), 'projet', 'bucket')
+    second = transcoder.start_transcode(str(source), 'projet', 'bucket')
+
+    assert first[1] != second[1]
+    assert not first[1].startswith(second[1]) and not second[1].startswith(first[1])
+    assert len(set(uploads)) == 2
+    assert all(upload.endswith('/video.mp4') for upload in uploads)
+    assert jobs[0][1] == f"gs://bucket/{first[1]}" and jobs[1][1] == f"gs://bucket/{second[1]}"
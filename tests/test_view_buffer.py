@@ -0,0 +1,50 @@
+import pytest
+
+import view_counter
+from models import db, Video
+from view_counter import ViewBuffer
+
+
+@pytest.fixture
+def buffer(app):
+    # Flush uniquement à la demande pendant le test
+    buffer = ViewBuffer(app, flush_interval=3600, max_pending=10 ** 6, max_buffered=5)
+    yield buffer
+    buffer._take_pending()
+
+
+def test_pending_count_follows_record_and_flush(app, user, buffer):
+    with app.app_context():
+        video = Video(filename='v.mp4', original_filename='v.mp4', user_id=user, views=0)
+        db.session.add(video)
+        db.session.commit()
+        video_id = video.id
+
+    assert buffer.record(video_id, 'a') and buffer.record(video_id, 'b') and buffer.record(video_id + 1, 'a')
+    assert not buffer.record(video_id, 'a')
+    assert (buffer.pending_count(video_id), buffer.pending_count(video_id + 1)) == (2, 1)
+
+    assert buffer.flush() == 2
+    assert buffer.pending_count(video_id) == 0
+    with app.app_context():
+        assert db.session.get(Video, video_id).views == 2
+
+
+def test_buffer_is_bounded_while_database_is_down(buffer, monkeypatch):
+    def database_down(pending):
+        raise RuntimeError('base indisponible')
+
+    monkeypatch.setattr(view_counter, 'write_views', database_down)
+    for fingerprint in range(4):
+        assert buffer.record(1, f"f{fingerprint}")
+    assert buffer.flush() == 0
+    # Le lot échoué est remis en attente, compteurs compris
+    assert buffer.pending_count(1) == 4
+
+    assert buffer.record(2, 'x')
+    assert not buffer.record(2, 'y')
+    assert buffer.dropped == 1
+    for _ in range(3):
+        buffer.flush()
+    assert len(buffer._pending) == 5
+    assert (buffer.pending_count(1), buffer.pending_count(2)) == (4, 1)
@@ -0,0 +1,103 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import ffmpeg
+from metrics import timed_stage
+
+
+@timed_stage('thumbnail')
+def generate_thumbnail(video_path: str, thumbnail_path: str, timestamp='00:00:01') -> None:
+    """Extrait une image de la vidéo ; écrit dans un fichier temporaire puis renomme atomiquement."""
+    base, ext = os.path.splitext(thumbnail_path)
+    tmp_path = f"{base}.{uuid.uuid4().hex}.tmp{ext}"
+    try:
+        (
+            ffmpeg
+            .input(video_path, ss=timestamp)
+            .output(tmp_path, vframes=1)
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+        os.replace(tmp_path, thumbnail_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class ThumbnailService:
+    """
+    Régénération des miniatures manquantes en arrière-plan.
+
+    - une seule génération à la fois par miniature (single-flight) ;
+    - nombre de processus ffmpeg simultanés borné par max_workers ;
+    - cache négatif : une vidéo non décodable n'est pas réessayée avant
+      failure_ttl secondes ; au plus max_failures échecs sont retenus, les
+      plus anciens sont oubliés en premier.
+
+    L'appelant ne demande que des vidéos connues en base (voir serve_thumbnail) :
+    le cache négatif ne grossit pas avec des chemins arbitraires.
+    """
+
+    def __init__(self, max_workers=2, failure_ttl=3600, max_failures=10000):
+        self.failure_ttl = failure_ttl
+        self.max_failures = max_failures
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='thumbnail')
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._failures = OrderedDict()  # video_path -> expiration, du plus ancien au plus récent
+
+    def is_failed(self, video_path: str) -> bool:
+        with self._lock:
+            return self._is_failed(video_path)
+
+    def _is_failed(self, video_path):
+        expires_at = self._failures.get(video_path)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._failures[video_path]
+            return False
+        return True
+
+    def request(self, video_path: str, thumbnail_path: str):
+        """Planifie la génération si nécessaire ; retourne le Future en cours ou None."""
+        with self._lock:
+            future = self._in_flight.get(thumbnail_path)
+            if future is not None:
+                return future
+            if self._is_failed(video_path):
+                return None
+            future = self._executor.submit(self._generate, video_path, thumbnail_path)
+            self._in_flight[thumbnail_path] = future
+        future.add_done_callback(lambda _: self._release(thumbnail_path))
+        return future
+
+    def _release(self, thumbnail_path):
+        with self._lock:
+            self._in_flight.pop(thumbnail_path, None)
+
+    def _generate(self, video_path, thumbnail_path):
+        if os.path.exists(thumbnail_path):
+            return True
+        try:
+            generate_thumbnail(video_path, thumbnail_path)
+            return True
+        except Exception as e:
+            print(f"Erreur regénération thumbnail {thumbnail_path}: {e}")
+            with self._lock:
+                self._failures[video_path] = time.monotonic() + self.failure_ttl
+                self._failures.move_to_end(video_path)
+                while len(self._failures) > self.max_failures:
+                    self._failures.popitem(last=False)
+            return False
+
+    def forget(self, video_path: str) -> None:
+        """Efface l'échec mémorisé (ex: la vidéo a été remplacée)."""
+        with self._lock:
+            self._failures.pop(video_path, None)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,136 @@
+import asyncio
+import inspect
+import random
+import threading
+import time
+from metrics import observe_stage
+
+SUCCEEDED = 'SUCCEEDED'
+FAILED = 'FAILED'
+
+
+def state_name(job) -> str:
+    """Nom de l'état d'un job Transcoder (enum ProcessingState ou chaîne)."""
+    state = getattr(job, 'state', job)
+    return getattr(state, 'name', str(state))
+
+
+class TranscodeWatcher:
+    """
+    Suivi asynchrone des jobs Google Cloud Transcoder.
+
+    Une boucle asyncio dans un thread dédié interroge tous les jobs avec un
+    seul client partagé. L'intervalle entre deux interrogations d'un job
+    grandit tant que son état ne change pas (jusqu'à max_delay) et revient à
+    initial_delay à chaque changement d'état. Il n'y a pas de délai maximal :
+    un job long reste suivi jusqu'à sa fin.
+
+    on_complete(job_name, job, context) et on_failure(job_name, job, context)
+    sont appelés dans un thread (ils peuvent bloquer : téléchargement, base),
+    de même que on_progress(job_name, job, context) après chaque
+    interrogation d'un job non terminé.
+    """
+
+    def __init__(self, client_factory, on_complete, on_failure,
+                 initial_delay=5.0, max_delay=60.0, factor=1.5, jitter=0.1, on_progress=None):
+        self.client_factory = client_factory
+        self.on_complete = on_complete
+        self.on_failure = on_failure
+        self.on_progress = on_progress
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.polls = 0
+        self._client = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._watched = {}
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name='transcode-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        # Hors du verrou : l'annulation des suivis appelle _forget()
+        asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        thread.join()
+
+    async def _cancel_all(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def watch(self, job_name: str, context=None):
+        """Suit un job ; retourne un concurrent.futures.Future résolu avec l'état final."""
+        self.start()
+        with self._lock:
+            future = self._watched.get(job_name)
+            if future is not None:
+                return future
+            future = asyncio.run_coroutine_threadsafe(self._watch(job_name, context), self._loop)
+            self._watched[job_name] = future
+        future.add_done_callback(lambda _: self._forget(job_name))
+        return future
+
+    def watching(self) -> int:
+        with self._lock:
+            return len(self._watched)
+
+    def _forget(self, job_name):
+        with self._lock:
+            self._watched.pop(job_name, None)
+
+    async def _get_job(self, job_name):
+        if self._client is None:
+            # Créé dans la boucle : le client asynchrone de Google y est lié
+            self._client = self.client_factory()
+        self.polls += 1
+        if inspect.iscoroutinefunction(self._client.get_job):
+            return await self._client.get_job(name=job_name)
+        return await asyncio.get_running_loop().run_in_executor(None, lambda: self._client.get_job(name=job_name))
+
+    def _next_delay(self, delay):
+        return min(self.max_delay, delay * self.factor)
+
+    async def _watch(self, job_name, context):
+        started = time.monotonic()
+        delay = self.initial_delay
+        last_state = None
+        while True:
+            try:
+                job = await self._get_job(job_name)
+            except Exception as e:
+                # Erreur passagère de l'API : on réessaie plus tard, sans abandonner le job
+                print(f"Erreur lors du suivi du job {job_name}: {e}")
+                delay = self._next_delay(delay)
+            else:
+                state = state_name(job)
+                if state in (SUCCEEDED, FAILED):
+                    observe_stage('cloud_poll', time.monotonic() - started, 'cloud',
+                                  'success' if state == SUCCEEDED else 'error')
+                    callback = self.on_complete if state == SUCCEEDED else self.on_failure
+                    try:
+                        await asyncio.get_running_loop().run_in_executor(None, callback, job_name, job, context)
+                    except Exception as e:
+                        print(f"Erreur dans le traitement de fin du job {job_name}: {e}")
+                    return state
+                if self.on_progress is not None:
+                    try:
+                        await asyncio.get_running_loop().run_in_executor(None, self.on_progress, job_name, job, context)
+                    except Exception as e:
+                        print(f"Erreur lors de la publication de la progression du job {job_name}: {e}")
+                delay = self.initial_delay if state != last_state else self._next_delay(delay)
+                last_state = state
+            await asyncio.sleep(delay * random.uniform(1 - self.jitter, 1 + self.jitter))
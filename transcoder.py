@@ -1,7 +1,9 @@
 import os
 import time
+import uuid
+import threading
 import ffmpeg
-from google.cloud import storage
+from gcs_transfer import get_storage_client, upload_file, download_file, download_blob, log_progress
 from google.cloud.video import transcoder
 from typing import Dict, Optional
 from google.protobuf import duration_pb2
@@ -10,24 +12,34 @@ class TranscoderError(Exception):
     """Exception personnalisée pour les erreurs de transcodage."""
     pass
 
+_client = None
+_client_lock = threading.Lock()
+
+def get_transcoder_client() -> transcoder.TranscoderServiceClient:
+    """Client Transcoder partagé par le processus (connexion gRPC réutilisée)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = transcoder.TranscoderServiceClient()
+        return _client
+
+def create_async_transcoder_client() -> transcoder.TranscoderServiceAsyncClient:
+    """Client asynchrone, à créer dans la boucle asyncio qui l'utilisera (voir transcode_watcher)."""
+    return transcoder.TranscoderServiceAsyncClient()
+
 def upload_to_gcs(local_file_path: str, bucket_name: str, destination_blob_name: str) -> str:
-    """Upload un fichier vers Google Cloud Storage."""
+    """Upload un fichier vers Google Cloud Storage (composite parallèle pour les gros fichiers)."""
     try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(destination_blob_name)
-        blob.upload_from_filename(local_file_path)
-        return f"gs://{bucket_name}/{destination_blob_name}"
+        return upload_file(local_file_path, bucket_name, destination_blob_name,
+                           progress=log_progress(f"Upload {destination_blob_name}"))
     except Exception as e:
         raise TranscoderError(f"Erreur lors de l'upload vers GCS: {str(e)}")
 
 def download_from_gcs(bucket_name: str, source_blob_name: str, destination_file_path: str) -> None:
-    """Télécharge un fichier depuis Google Cloud Storage."""
+    """Télécharge un fichier depuis Google Cloud Storage (plages parallèles pour les gros fichiers)."""
     try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(source_blob_name)
-        blob.download_to_filename(destination_file_path)
+        download_file(bucket_name, source_blob_name, destination_file_path,
+                      progress=log_progress(f"Téléchargement {source_blob_name}"))
     except Exception as e:
         raise TranscoderError(f"Erreur lors du téléchargement depuis GCS: {str(e)}")
 
@@ -53,7 +65,7 @@ def get_video_info(file_path: str) -> Dict:
 def create_custom_job_template(project_id: str, location: str, template_id: str) -> str:
     """Crée un template de job personnalisé qui préserve les caractéristiques originales de la vidéo."""
     try:
-        client = transcoder.TranscoderServiceClient()
+        client = get_transcoder_client()
         parent = f"projects/{project_id}/locations/{location}"
         
         job_template = transcoder.JobTemplate()
@@ -108,7 +120,7 @@ def create_custom_job_template(project_id: str, location: str, template_id: str)
 def create_transcode_job(input_uri: str, output_uri: str, project_id: str, location: str = "us-central1", local_file_path: str = None) -> str:
     """Crée un job de transcodage avec Google Cloud Transcode."""
     try:
-        client = transcoder.TranscoderServiceClient()
+        client = get_transcoder_client()
         parent = f"projects/{project_id}/locations/{location}"
         
         # Configuration pour 1080p 120fps
@@ -163,62 +175,74 @@ def create_transcode_job(input_uri: str, output_uri: str, project_id: str, locat
 def get_job_status(job_name: str, project_id: str, location: str = "us-central1") -> Optional[str]:
     """Récupère le statut d'un job de transcodage."""
     try:
-        client = transcoder.TranscoderServiceClient()
-        job = client.get_job(name=job_name)
+        job = get_transcoder_client().get_job(name=job_name)
         return job.state
     except Exception as e:
         raise TranscoderError(f"Erreur lors de la récupération du statut: {str(e)}")
 
-def process_video_with_transcode(input_file_path: str, output_file_path: str, project_id: str, bucket_name: str, location: str = "us-central1") -> bool:
-    """Traite une vidéo en utilisant Google Cloud Transcode."""
-    try:
-        if not os.path.exists(input_file_path):
-            raise TranscoderError(f"Fichier d'entrée non trouvé: {input_file_path}")
+def start_transcode(input_file_path: str, project_id: str, bucket_name: str, location: str = "us-central1"):
+    """
+    Envoie la vidéo sur GCS et crée le job de transcodage, sans attendre sa fin.
+    Retourne (nom du job, dossier de sortie dans le bucket).
+    """
+    if not os.path.exists(input_file_path):
+        raise TranscoderError(f"Fichier d'entrée non trouvé: {input_file_path}")
 
-        input_blob_name = f"input/{os.path.basename(input_file_path)}"
-        input_uri = upload_to_gcs(input_file_path, bucket_name, input_blob_name)
-        
-        # Création d'un dossier unique pour la sortie
-        output_folder = f"output/{int(time.time())}/"
-        output_uri = f"gs://{bucket_name}/{output_folder}"
-        
-        # Passer le chemin du fichier local pour l'analyse
-        job_name = create_transcode_job(input_uri, output_uri, project_id, location, input_file_path)
-        print(f"Job créé: {job_name}")  # Pour le débogage
+    # Préfixe propre au job : deux jobs lancés la même seconde, ou deux fichiers
+    # de même nom, ne partagent ni l'entrée ni le dossier de sortie
+    job_prefix = uuid.uuid4().hex
+    input_blob_name = f"input/{job_prefix}/{os.path.basename(input_file_path)}"
+    input_uri = upload_to_gcs(input_file_path, bucket_name, input_blob_name)
+    
+    output_folder = f"output/{job_prefix}/"
+    output_uri = f"gs://{bucket_name}/{output_folder}"
+    
+    # Passer le chemin du fichier local pour l'analyse
+    job_name = create_transcode_job(input_uri, output_uri, project_id, location, input_file_path)
+    print(f"Job créé: {job_name}")  # Pour le débogage
+    return job_name, output_folder
+
+def fetch_transcode_output(bucket_name: str, output_folder: str, output_file_path: str) -> None:
+    """Télécharge le MP4 produit par un job terminé."""
+    bucket = get_storage_client().bucket(bucket_name)
+    blobs = bucket.list_blobs(prefix=output_folder)
+    
+    # Trouver le fichier MP4 généré
+    output_blob = None
+    for blob in blobs:
+        if blob.name.endswith('.mp4'):
+            output_blob = blob
+            break
+    
+    if output_blob is None:
+        raise TranscoderError("Aucun fichier MP4 trouvé dans le dossier de sortie")
+    
+    download_blob(output_blob, output_file_path, progress=log_progress(f"Téléchargement {output_blob.name}"))
+
+def process_video_with_transcode(input_file_path: str, output_file_path: str, project_id: str, bucket_name: str, location: str = "us-central1",
+                                 initial_delay: float = 5, max_delay: float = 60) -> bool:
+    """
+    Traite une vidéo en utilisant Google Cloud Transcode et attend la fin du job
+    (intervalle d'interrogation croissant, sans délai maximal).
+    Le worker Celery utilise plutôt start_transcode + transcode_watcher pour ne pas bloquer.
+    """
+    try:
+        job_name, output_folder = start_transcode(input_file_path, project_id, bucket_name, location)
         
-        max_attempts = 30  # 5 minutes max (10s * 30)
-        attempts = 0
-        while attempts < max_attempts:
+        delay = initial_delay
+        while True:
             status = get_job_status(job_name, project_id, location)
             
             if status == transcoder.Job.ProcessingState.SUCCEEDED:
-                # Lister les fichiers dans le dossier de sortie
-                storage_client = storage.Client()
-                bucket = storage_client.bucket(bucket_name)
-                blobs = bucket.list_blobs(prefix=output_folder)
-                
-                # Trouver le fichier MP4 généré
-                output_blob = None
-                for blob in blobs:
-                    if blob.name.endswith('.mp4'):
-                        output_blob = blob
-                        break
-                
-                if output_blob is None:
-                    raise TranscoderError("Aucun fichier MP4 trouvé dans le dossier de sortie")
-                
-                # Télécharger le fichier
-                output_blob.download_to_filename(output_file_path)
+                fetch_transcode_output(bucket_name, output_folder, output_file_path)
                 return True
             
             if status == transcoder.Job.ProcessingState.FAILED:
                 raise TranscoderError("Le job de transcodage a échoué")
             
-            time.sleep(10)
-            attempts += 1
-        
-        raise TranscoderError("Le job de transcodage a expiré")
+            time.sleep(delay)
+            delay = min(max_delay, delay * 1.5)
     
     except Exception as e:
         print(f"Erreur pendant le transcodage: {str(e)}")
-        return False
\ No newline at end of file
+        return False
@@ -5,10 +5,113 @@ from PIL import Image, ImageDraw, ImageFont
 import math
 import traceback
 import shutil
+from notifications import DiscordNotifier
+from metrics import timed_stage
+from estimator import processing_estimator
+import storage_layout
 
-def estimate_processing_time(input_path):
+DISCORD_WEBHOOK_URL = os.environ.get(
+    'DISCORD_WEBHOOK_URL',
+    "https://canary.discord.com/api/webhooks/1355243140058976306/ixNTypUGOctGnWocxATNxM1SUzfet2pCYc3rATM8Aj-JgoJTEzl96ncoVdyczMwokYju"
+)
+discord_notifier = DiscordNotifier(
+    DISCORD_WEBHOOK_URL,
+    max_queue=int(os.environ.get('DISCORD_QUEUE_SIZE', 1000)),
+    coalesce_window=float(os.environ.get('DISCORD_COALESCE_WINDOW', 1.0)),
+)
+
+def send_discord_log(message: str):
+    """Envoie un log sur Discord via webhook (en arrière-plan, voir notifications.DiscordNotifier)."""
+    discord_notifier.send(message)
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _parse_frame_rate(value):
+    """Convertit un débit d'images ffprobe ('30000/1001') en float"""
+    try:
+        num, _, den = str(value).partition('/')
+        fps = float(num) / float(den or 1)
+        return round(fps, 3) if fps > 0 else None
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+
+def probe_media(input_path):
+    """
+    Analyse un fichier avec ffprobe et retourne ses métadonnées
+    (durée, dimensions, fps, codecs, débits, conteneur), ou None en cas d'erreur.
+    """
+    try:
+        with timed_stage('probe'):
+            probe = ffmpeg.probe(input_path)
+    except Exception as e:
+        print(f"Erreur lors de l'analyse de {input_path} : {e}")
+        return None
+
+    fmt = probe.get('format', {})
+    video_info = next((s for s in probe.get('streams', []) if s.get('codec_type') == 'video'), {})
+    audio_info = next((s for s in probe.get('streams', []) if s.get('codec_type') == 'audio'), {})
+    try:
+        duration = float(fmt.get('duration') or video_info.get('duration'))
+    except (TypeError, ValueError):
+        duration = None
+
+    return {
+        'duration': duration,
+        'width': _to_int(video_info.get('width')),
+        'height': _to_int(video_info.get('height')),
+        'fps': _parse_frame_rate(video_info.get('avg_frame_rate')) or _parse_frame_rate(video_info.get('r_frame_rate')),
+        'video_codec': video_info.get('codec_name'),
+        'pix_fmt': video_info.get('pix_fmt'),
+        'audio_codec': audio_info.get('codec_name'),
+        'bit_rate': _to_int(fmt.get('bit_rate')),
+        'video_bitrate': _to_int(video_info.get('bit_rate')),
+        'audio_bitrate': _to_int(audio_info.get('bit_rate')),
+        'container': fmt.get('format_name'),
+    }
+
+# Flux lisibles tels quels par les navigateurs dans un MP4
+WEB_VIDEO_CODECS = {'h264'}
+WEB_PIX_FMTS = {'yuv420p', 'yuvj420p'}
+WEB_AUDIO_CODECS = {'aac', 'mp3'}
+
+def plan_conversion(metadata):
+    """
+    Choisit, d'après les métadonnées de probe_media, quels flux réencoder :
+    - 'remux' : vidéo et audio copiés, seul le conteneur est réécrit ;
+    - 'audio' / 'video' : seul ce flux est réencodé, l'autre est copié ;
+    - 'transcode' : réencodage complet (ou métadonnées inconnues).
+    Sans métadonnées (analyse échouée), rien n'est copié : un flux de codec
+    inconnu ne doit pas finir tel quel dans le MP4. Un audio_codec None après
+    une analyse réussie signifie seulement qu'il n'y a pas de piste audio.
+    """
+    if not metadata:
+        return {'path': 'transcode', 'vcodec': 'libx264', 'acodec': 'aac'}
+    video_ok = metadata.get('video_codec') in WEB_VIDEO_CODECS and metadata.get('pix_fmt') in WEB_PIX_FMTS
+    audio_codec = metadata.get('audio_codec')
+    audio_ok = audio_codec is None or audio_codec in WEB_AUDIO_CODECS
+
+    if video_ok and audio_ok:
+        path = 'remux'
+    elif video_ok:
+        path = 'audio'
+    elif audio_ok and audio_codec is not None:
+        path = 'video'
+    else:
+        path = 'transcode'
+    return {
+        'path': path,
+        'vcodec': 'copy' if video_ok else 'libx264',
+        'acodec': 'copy' if audio_ok else 'aac',
+    }
+
+def estimate_processing_time(input_path, metadata=None, backend='local', conversion_path=None):
     """
-    Estimate video processing time based on file size with more robust error handling.
+    Estime la durée de traitement d'une vidéo à partir de l'historique des
+    jobs (estimator.processing_estimator), ou d'un débit fixe à défaut.
     """
     try:
         # Vérification explicite de l'existence du fichier
@@ -17,36 +120,38 @@ def estimate_processing_time(input_path):
             return {
                 'file_size_mb': 0,
                 'estimated_seconds': 30,
-                'estimated_human_readable': '30 secondes'
+                'estimated_human_readable': '30 secondes',
+                'source': 'default'
             }
 
-        # Utilisation de os.stat pour plus de sécurité
-        file_stat = os.stat(input_path)
-        file_size_mb = file_stat.st_size / (1024 * 1024)
+        size = os.stat(input_path).st_size
+        metadata = metadata or probe_media(input_path) or {}
+        conversion_path = conversion_path or plan_conversion(metadata)['path']
+        processing_estimator.refresh()
+        estimate = processing_estimator.estimate(size, metadata, backend, conversion_path)
         
-        # Log détaillé
-        print(f"Taille du fichier détectée : {file_size_mb:.2f} Mo")
-        
-        # Calcul du temps de traitement
-        processing_rate = 50  # MB per minute
-        estimated_minutes = max(0.1, file_size_mb / processing_rate)
-        estimated_time = max(10, min(estimated_minutes * 60, 300))  # 10 sec to 5 min
-        
-        return {
-            'file_size_mb': round(file_size_mb, 2),
-            'estimated_seconds': round(estimated_time),
-            'estimated_human_readable': format_time(round(estimated_time))
-        }
+        return dict(
+            estimate,
+            file_size_mb=round(size / (1024 * 1024), 2),
+            estimated_human_readable=format_time(estimate['estimated_seconds'])
+        )
     except Exception as e:
         print(f"Erreur lors de l'estimation du temps de traitement : {e}")
         traceback.print_exc()
         return {
             'file_size_mb': 0,
             'estimated_seconds': 30,
-            'estimated_human_readable': '30 secondes'
+            'estimated_human_readable': '30 secondes',
+            'source': 'default'
         }
 
-def process_video(input_path, output_dir, convert=True):
+def process_video(input_path, output_dir, convert=True, threads=None, plan=None, progress_path=None):
+    """
+    Convertit la vidéo en MP4 H.264/AAC et génère sa miniature.
+    threads limite le nombre de threads de l'encodeur libx264 (None = ffmpeg décide).
+    plan (voir plan_conversion) indique les flux à copier ; calculé ici s'il est absent.
+    progress_path reçoit l'avancement de ffmpeg (-progress), lu par progress.FfmpegProgressReader.
+    """
     try:
         # Vérification explicite de l'existence du fichier
         if not os.path.exists(input_path):
@@ -56,19 +161,24 @@ def process_video(input_path, output_dir, convert=True):
         # Génération de noms de fichiers uniques
         filename = str(uuid.uuid4())
         
-        # Estimation avant le traitement
-        processing_estimate = estimate_processing_time(input_path)
-        print("Détails d'estimation de traitement :", processing_estimate)
-        
         # Determine output path based on conversion flag
         if convert:
             output_path = os.path.join(output_dir, f"{filename}.mp4")
+            metadata = None if plan else probe_media(input_path)
+            plan = plan or plan_conversion(metadata)
+            print("Conversion :", plan['path'])
+            processing_estimate = estimate_processing_time(input_path, metadata, conversion_path=plan['path'])
+            print("Détails d'estimation de traitement :", processing_estimate)
             try:
-                # Conversion vidéo avec gestion des erreurs
+                # Seuls les flux incompatibles sont réencodés ; moov en tête pour la lecture progressive
                 stream = ffmpeg.input(input_path)
-                stream = ffmpeg.output(stream, output_path, 
-                                       vcodec='libx264', 
-                                       acodec='aac')
+                output_options = {'vcodec': plan['vcodec'], 'acodec': plan['acodec'],
+                                  'movflags': '+faststart', 'sn': None}
+                if threads and plan['vcodec'] != 'copy':
+                    output_options['threads'] = threads
+                stream = ffmpeg.output(stream, output_path, **output_options)
+                if progress_path:
+                    stream = stream.global_args('-progress', progress_path)
                 ffmpeg.run(stream, overwrite_output=True)
             except ffmpeg.Error as e:
                 print("Erreur FFmpeg lors de la conversion :")
@@ -77,22 +187,25 @@ def process_video(input_path, output_dir, convert=True):
             # Raw upload: just copy the file
             output_path = os.path.join(output_dir, f"{filename}{os.path.splitext(input_path)[1]}")
             shutil.copy2(input_path, output_path)
+            processing_estimate = None
 
         # Génération de la miniature (toujours générer, même pour raw upload)
-        thumbnail_path = os.path.join(output_dir, f"{filename}_thumb.jpg")
+        thumbnail_path = storage_layout.thumbnail_path(output_path)
+        video_info = {}
         try:
             # Utiliser le fichier converti ou original pour la miniature
             probe_path = output_path if convert else input_path
             probe = ffmpeg.probe(probe_path)
             video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
             
-            (
-                ffmpeg
-                .input(probe_path, ss=1)
-                .output(thumbnail_path, vframes=1)
-                .overwrite_output()
-                .run(capture_stdout=True, capture_stderr=True)
-            )
+            with timed_stage('thumbnail'):
+                (
+                    ffmpeg
+                    .input(probe_path, ss=1)
+                    .output(thumbnail_path, vframes=1)
+                    .overwrite_output()
+                    .run(capture_stdout=True, capture_stderr=True)
+                )
         except Exception as thumbnail_error:
             print(f"Erreur lors de la génération de la miniature : {thumbnail_error}")
             # On continue même si la miniature échoue
@@ -102,6 +215,7 @@ def process_video(input_path, output_dir, convert=True):
             'thumbnail_path': thumbnail_path,
             'width': int(video_info['width']) if 'width' in video_info else 0,
             'height': int(video_info['height']) if 'height' in video_info else 0,
+            'conversion_path': plan['path'] if convert else None,
             'processing_estimate': processing_estimate
         }
     except Exception as e:
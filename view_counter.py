@@ -0,0 +1,227 @@
+import atexit
+import threading
+from collections import OrderedDict, Counter
+from sqlalchemy import insert, update, tuple_
+from models import db, Video, VideoView
+
+
+class ViewBuffer:
+    """
+    Tampon d'écriture des vues (write-behind).
+
+    La page vidéo ne fait qu'enregistrer la vue en mémoire ; un thread
+    écrit périodiquement les VideoView et les incréments de Video.views
+    en une seule transaction. Le tampon est borné à max_buffered vues : si
+    la base reste indisponible, les vues suivantes sont abandonnées (et
+    comptées dans dropped) plutôt que d'occuper la mémoire sans limite.
+    """
+
+    def __init__(self, app=None, flush_interval=5.0, max_pending=1000, seen_capacity=100000, max_buffered=100000):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.seen_capacity = seen_capacity
+        self.max_buffered = max_buffered
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._counts = Counter()  # vues en attente par vidéo, tenues à jour avec _pending
+        self._seen = OrderedDict()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    # Enregistrement (chemin de la requête, sans accès base)
+
+    def record(self, video_id, fingerprint, user_id=None) -> bool:
+        """Enregistre une vue ; retourne False si elle est déjà connue ou si le tampon est plein."""
+        key = (video_id, fingerprint)
+        with self._lock:
+            if key in self._seen or key in self._pending:
+                return False
+            if len(self._pending) >= self.max_buffered:
+                self.dropped += 1
+                return False
+            self._pending[key] = user_id
+            self._counts[video_id] += 1
+            full = len(self._pending) >= self.max_pending
+        self._ensure_started()
+        if full:
+            self._wakeup.set()
+        return True
+
+    def pending_count(self, video_id) -> int:
+        with self._lock:
+            return self._counts[video_id]
+
+    def _take_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._counts = Counter()
+        return pending
+
+    def _restore_pending(self, pending):
+        # Les vues du lot échoué passent avant celles arrivées pendant l'écriture, dans la limite du tampon
+        with self._lock:
+            arrived, self._pending = self._pending, {}
+            self._counts = Counter()
+            for key, user_id in list(pending.items()) + list(arrived.items()):
+                if key in self._pending:
+                    continue
+                if len(self._pending) >= self.max_buffered:
+                    self.dropped += 1
+                    continue
+                self._pending[key] = user_id
+                self._counts[key[0]] += 1
+
+    def _mark_seen(self, keys):
+        with self._lock:
+            for key in keys:
+                self._seen[key] = True
+                self._seen.move_to_end(key)
+            while len(self._seen) > self.seen_capacity:
+                self._seen.popitem(last=False)
+
+    # Écriture groupée
+
+    def flush(self) -> int:
+        """Écrit les vues en attente ; retourne le nombre de vues ajoutées."""
+        with self._flush_lock:
+            pending = self._take_pending()
+            if not pending:
+                return 0
+            try:
+                with self.app.app_context():
+                    written = write_views(pending)
+            except Exception as e:
+                print(f"Erreur lors de l'écriture des vues : {e}")
+                self._restore_pending(pending)
+                return 0
+            self._mark_seen(pending.keys())
+            return written
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='view-buffer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def write_views(pending) -> int:
+    """Insère les vues nouvelles et incrémente les compteurs dans une transaction."""
+    video_ids = {video_id for video_id, _ in pending}
+    existing_videos = {
+        row[0] for row in db.session.query(Video.id).filter(Video.id.in_(video_ids))
+    }
+    candidates = {key: user_id for key, user_id in pending.items() if key[0] in existing_videos}
+    if not candidates:
+        return 0
+
+    already_counted = set(
+        db.session.query(VideoView.video_id, VideoView.fingerprint)
+        .filter(tuple_(VideoView.video_id, VideoView.fingerprint).in_(list(candidates)))
+        .all()
+    )
+    rows = [
+        {'video_id': video_id, 'fingerprint': fingerprint, 'user_id': user_id}
+        for (video_id, fingerprint), user_id in candidates.items()
+        if (video_id, fingerprint) not in already_counted
+    ]
+    if not rows:
+        return 0
+
+    db.session.execute(insert(VideoView), rows)
+    increments = Counter(row['video_id'] for row in rows)
+    for video_id, count in increments.items():
+        db.session.execute(
+            update(Video).where(Video.id == video_id).values(views=Video.views + count)
+        )
+    db.session.commit()
+    return len(rows)
+
+
+class RedisViewBuffer(ViewBuffer):
+    """
+    Variante partagée entre plusieurs processus : la déduplication et la file
+    d'attente vivent dans Redis, n'importe quel processus peut vider la file.
+    """
+    PENDING_KEY = 'zedtube:views:pending'
+    COUNTS_KEY = 'zedtube:views:pending_counts'
+    SEEN_PREFIX = 'zedtube:views:seen:'
+
+    def __init__(self, app=None, redis_url='redis://localhost:6379/0', seen_ttl=86400, **kwargs):
+        super().__init__(app, **kwargs)
+        import redis
+        self.redis = redis.Redis.from_url(redis_url)
+        self.seen_ttl = seen_ttl
+
+    def record(self, video_id, fingerprint, user_id=None) -> bool:
+        # SET NX : une seule requête (tous processus confondus) place la vue en file
+        if not self.redis.set(f"{self.SEEN_PREFIX}{video_id}:{fingerprint}", 1, nx=True, ex=self.seen_ttl):
+            return False
+        if self.redis.llen(self.PENDING_KEY) >= self.max_buffered:
+            # Base indisponible depuis longtemps : la file Redis ne grossit plus
+            self.dropped += 1
+            return False
+        pipe = self.redis.pipeline()
+        pipe.rpush(self.PENDING_KEY, f"{video_id}|{fingerprint}|{user_id or ''}")
+        pipe.hincrby(self.COUNTS_KEY, video_id, 1)
+        length, _ = pipe.execute()
+        self._ensure_started()
+        if length >= self.max_pending:
+            self._wakeup.set()
+        return True
+
+    def pending_count(self, video_id) -> int:
+        return int(self.redis.hget(self.COUNTS_KEY, video_id) or 0)
+
+    def _take_pending(self):
+        pipe = self.redis.pipeline()
+        pipe.lrange(self.PENDING_KEY, 0, self.max_pending - 1)
+        pipe.ltrim(self.PENDING_KEY, self.max_pending, -1)
+        entries, _ = pipe.execute()
+        pending = {}
+        for entry in entries:
+            video_id, fingerprint, user_id = entry.decode().split('|')
+            pending[(int(video_id), fingerprint)] = int(user_id) if user_id else None
+        if pending:
+            pipe = self.redis.pipeline()
+            for video_id, count in Counter(video_id for video_id, _ in pending).items():
+                pipe.hincrby(self.COUNTS_KEY, video_id, -count)
+            pipe.execute()
+        return pending
+
+    def _restore_pending(self, pending):
+        room = max(0, self.max_buffered - self.redis.llen(self.PENDING_KEY))
+        restored = list(pending.items())[:room]
+        self.dropped += len(pending) - len(restored)
+        pipe = self.redis.pipeline()
+        for (video_id, fingerprint), user_id in restored:
+            pipe.rpush(self.PENDING_KEY, f"{video_id}|{fingerprint}|{user_id or ''}")
+            pipe.hincrby(self.COUNTS_KEY, video_id, 1)
+        pipe.execute()
+
+    def _mark_seen(self, keys):
+        # Les clés SET NX posées dans record() servent déjà de cache de déduplication
+        pass
+
+
+def make_view_buffer(app):
+    """Construit le tampon de vues selon VIEW_BUFFER_BACKEND ('memory' ou 'redis')."""
+    options = {
+        'flush_interval': app.config['VIEW_FLUSH_INTERVAL'],
+        'max_pending': app.config['VIEW_FLUSH_MAX_PENDING'],
+        'max_buffered': app.config['VIEW_BUFFER_MAX'],
+    }
+    if app.config['VIEW_BUFFER_BACKEND'] == 'redis':
+        return RedisViewBuffer(app, redis_url=app.config['REDIS_URL'], **options)
+    return ViewBuffer(app, **options)